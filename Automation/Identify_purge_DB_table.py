@@ -1,58 +1,83 @@
 # To Process partitions: python3 database_maintenance.py identify_partitions_to_purge --csv ILM_Tables_Quickwins.csv
 # To validate partitions: python3 database_maintenance.py verify_data_status_for_purging --csv ILM_Tables_Quickwins.csv
 # To validate the table: python3 database_maintenance.py objects_validation 
-# To create a backup: python3 database_maintenance.py create_backup --csv ILM_Tables_Quickwins.csv --backup-dir /backup_directory
-# To purge partitions: python3 database_maintenance.py purge_partitions --csv ILM_Tables_Quickwins.csv
+# To rebuild unusable index partitions: python3 database_maintenance.py rebuild_unusable_indexes [--rebuild_sessions 2] [--rebuild_parallel 25]
+# To create a backup: python3 database_maintenance.py create_backup --csv ILM_Tables_Quickwins.csv --backup-dir /backup_directory [--backup_method export|exchange|both] [--backup_tablespace BACKUP_TS]
+# To purge partitions: python3 database_maintenance.py purge_partitions --csv ILM_Tables_Quickwins.csv [--drop_mode table] [--index_maintenance async]
+# To reuse an identification: python3 database_maintenance.py identify_partitions_to_purge --csv ILM_Tables_Quickwins.csv --plan purge_plan.json
+#                             python3 database_maintenance.py purge_partitions --plan purge_plan.json
+# Connection options: --db_dsn <dsn> --db_username <user> --db_password <password> [--db_driver oracledb|memory|package.module:Class] [--db_sessions 4]
 
-import subprocess
 import pandas as pd
 import datetime
 import os
+import re
+import threading
+import time
 import argparse
-import tempfile
 import csv
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Function to execute a SQL query using SQL*Plus
-def execute_sqlplus_query(username, password, dsn, query):
-    # Escape special characters in the password
-    escaped_password = password.replace("(", "\\(").replace(")", "\\)").replace("&", "\\&").replace("{", "\\{").replace("}", "\\}")
-    
-    # Modify the SQLPlus command to use the escaped password
-    sqlplus_command = f'sqlplus -s "{username}/{escaped_password}@{dsn}"'
-    
-    # Prepare the command to be executed with the query
-    full_query = f"""
-    SPOOL {dsn}_purge.log;
-    {query}
-    SPOOL OFF;
-    """
-    
-    # Execute the SQLPlus command and pass the query through a pipe
-    process = subprocess.Popen(sqlplus_command, shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-    
-    stdout, stderr = process.communicate(input=full_query)
-    
-    if process.returncode != 0:
-        print("Error:", stderr)
-        return False
-    return stdout.strip()
-
-# Function to get the instance name
-def get_instance_name(username, password, dsn):
-    instance_name_query = "SELECT INSTANCE_NAME FROM V$INSTANCE;"
-    instance_name_result = execute_sqlplus_query(username, password, dsn, instance_name_query)
-    if instance_name_result:
-        instance_name = instance_name_result.splitlines()[-1].strip()
+from db_access import Database, get_driver
+from partition_backup import ThroughputLimiter, backup_partition, get_backup_store, get_staging_table, write_manifest
+from purge_plan import PurgeJournal, read_plan, write_plan
+
+# Schema that owns the ILM tables listed in the CSV
+TABLE_OWNER = 'CISADM'
+# Oracle allows at most 1000 expressions in an IN list
+CATALOG_BATCH_SIZE = 1000
+# Tablespaces that are never dropped, and whose partitions are left in place
+BLOCKED_TABLESPACES = {'CISTS_01', 'SYSAUX', 'SYSTEM', 'USERS'}
+# Seconds between checks while waiting for global index cleanup
+INDEX_POLL_SECONDS = 30
+
+# Function to get the instance name and the database date in one round trip
+def get_instance_details(db):
+    try:
+        row = db.query("SELECT instance_name, TO_CHAR(SYSDATE, 'YYYY-MM-DD') FROM v$instance")
+    except Exception as e:
+        print("Error:", e)
+        row = None
+    if row:
+        instance_name, database_date = row[0]
         print(f"Instance Name: {instance_name}")
-        return instance_name
+        return instance_name, datetime.datetime.strptime(database_date, '%Y-%m-%d').date()
     else:
         print("Failed to retrieve the instance name.")
-        return None
+        return None, None
 
-def extract_partition_names(query_result):
-    lines = query_result.splitlines()
-    partition_names = [line.strip() for line in lines if line and not line.startswith('PARTITION_NAME') and not line.startswith('-')and 'rows selected' not in line]
-    return partition_names
+# Function to read the partitions of all listed tables with one catalog query per 1000 tables.
+# Returns {table_name: [{owner, partition_name, high_value, tablespace_name, bytes}, ...]}
+def get_partition_catalog(db, table_names, owner=TABLE_OWNER):
+    catalog = {table_name: [] for table_name in table_names}
+    for start in range(0, len(table_names), CATALOG_BATCH_SIZE):
+        batch = table_names[start:start + CATALOG_BATCH_SIZE]
+        binds = {f"t{i}": table_name for i, table_name in enumerate(batch)}
+        catalog_query = f"""
+        SELECT p.table_owner, p.table_name, p.partition_name, p.high_value, p.tablespace_name, NVL(s.bytes, 0)
+        FROM dba_tab_partitions p
+        LEFT JOIN (SELECT owner, segment_name, partition_name, SUM(bytes) AS bytes
+                   FROM dba_segments
+                   WHERE owner = :owner AND segment_type LIKE 'TABLE%PARTITION'
+                   GROUP BY owner, segment_name, partition_name) s
+          ON s.owner = p.table_owner AND s.segment_name = p.table_name AND s.partition_name = p.partition_name
+        WHERE p.table_owner = :owner
+        AND p.table_name IN ({', '.join(':' + name for name in binds)})
+        """
+        for table_owner, table_name, partition_name, high_value, tablespace_name, size in db.query(catalog_query, owner=owner, **binds):
+            catalog[table_name].append({
+                'owner': table_owner,
+                'partition_name': partition_name,
+                'high_value': high_value,
+                'tablespace_name': tablespace_name,
+                'bytes': int(size)
+            })
+    return catalog
+
+# Function to compute the (year, month) of the newest partition that is past retention
+def retention_cutoff(database_date, retain_period):
+    retention_date = database_date - datetime.timedelta(days=int(retain_period) + 30)
+    return retention_date, (retention_date.year, retention_date.month)
 
 # Function to parse partition names and sort by year and month
 def parse_partition_name(name):
@@ -75,155 +100,333 @@ def write_to_text_file(data, filename):
     with open(filename, mode='w') as file:
         file.write(data)
 
-def write_partitions_to_file(partition_data,instance_details, filename):
+def write_partitions_to_file(partition_data,instance_details, filename, partition_details=None):
     """Write the partition data to a text file."""
+    partition_details = partition_details or {}
     with open(filename, 'w') as file:
         file.write(f"Instance Details: {instance_details}\n\n")
         for table_name, partitions in partition_data.items():
             file.write(f"Table: {table_name}\n")
             file.write("Partitions to purge:\n")
             for partition in partitions:
-                file.write(f" - {partition}\n")
+                details = partition_details.get((table_name, partition))
+                if details:
+                    file.write(f" - {partition} (tablespace {details['tablespace_name']}, {details['bytes'] / 1024 ** 2:.1f} MB)\n")
+                else:
+                    file.write(f" - {partition}\n")
             file.write("\n")
 
 # Function to handle partition operations
-def identify_partitions_to_purge(df, username, password, dsn):
+def identify_partitions_to_purge(df, db, plan_file=None):
     partition_results = ""
     partition_data ={}
-    instance_name = get_instance_name(username, password, dsn)
+    partition_details = {}
+    plan_tables = {}
+    instance_name, database_date = get_instance_details(db)
     if not instance_name:
         print("Cannot proceed without instance name.")
         return partition_data
 
     instance_details = f"Instance: {instance_name}"
+    retention_periods = {}
     for index, row in df.iterrows():
         table_name = row['Table_name']
-        retain_period = row['Retention Period (Data Partition Purge After)']
-        
+        try:
+            retention_periods[table_name] = int(row['Retention Period (Data Partition Purge After)'])
+        except (TypeError, ValueError):
+            print(f"Failed to retrieve retention date for table: {table_name}")
+
+    # Fetch all partitions for every table in one set-based catalog query
+    try:
+        catalog = get_partition_catalog(db, sorted({table_name.upper() for table_name in retention_periods}))
+    except Exception as e:
+        print("Error:", e)
+        catalog = {}
+
+    for table_name, retain_period in retention_periods.items():
         # Calculate retention date
-        retention_date_query = f"SELECT TO_CHAR(SYSDATE - {retain_period + 30}, 'YYYY-MM-DD') AS retention_date FROM DUAL;"
-        retention_date_result = execute_sqlplus_query(username, password, dsn, retention_date_query)
-        if retention_date_result:
-            retention_date = retention_date_result.splitlines()[-1].strip()
-            print(f"Retention Date for {table_name}: {retention_date}")
-            partition_results += f"Retention Date for {table_name}: {retention_date}\n"
-            
-            # Calculate retention month and year
-            retention_year = retention_date[:4]
-            retention_month = retention_date[5:7]
-            retention_month_name = {
-                '01': 'JAN', '02': 'FEB', '03': 'MAR', '04': 'APR', '05': 'MAY', '06': 'JUN',
-                '07': 'JUL', '08': 'AUG', '09': 'SEP', '10': 'OCT', '11': 'NOV', '12': 'DEC'
-            }[retention_month]
-            
-            # Fetch all partitions for the table
-            all_partitions_query = f"""
-            SELECT partition_name
-            FROM dba_tab_partitions
-            WHERE table_name = '{table_name.upper()}'
-            ORDER BY partition_name;
-            """
-            all_partitions_query_result = execute_sqlplus_query(username, password, dsn, all_partitions_query)
-            if all_partitions_query_result:
-                all_partitions = extract_partition_names(all_partitions_query_result)
-                sorted_partitions = sort_partitions(all_partitions)
-                retention_cutoff = f'P{retention_year}{retention_month_name}'
-                partition_results += f"Retention Cutoff: {retention_cutoff}\n"
-                
-                # Filter partitions to purge
-                filtered_partitions = [p for p in sorted_partitions 
-                                       if 'MAX' not in p and parse_partition_name(p) <= 
-                                       (int(retention_year), 
-                                        list({
-                                            'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
-                                            'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12
-                                        }.values()).index(parse_partition_name(retention_cutoff)[1]) + 1)]
-                print(f"Partitions identified to purge for {table_name}: {filtered_partitions}")
-                partition_data[table_name] = filtered_partitions
-                # Return filtered partitions for further processing
-            
-            else:
-                print(f"Failed to retrieve partitions for table: {table_name}")
-                #return [], table_name
+        retention_date, (retention_year, retention_month) = retention_cutoff(database_date, retain_period)
+        print(f"Retention Date for {table_name}: {retention_date}")
+        partition_results += f"Retention Date for {table_name}: {retention_date}\n"
+
+        partitions = catalog.get(table_name.upper())
+        if partitions:
+            sorted_partitions = sort_partitions([partition['partition_name'] for partition in partitions])
+            retention_cutoff_name = f"P{retention_year}{retention_date.strftime('%b').upper()}"
+            partition_results += f"Retention Cutoff: {retention_cutoff_name}\n"
+
+            # Filter partitions to purge
+            filtered_partitions = [p for p in sorted_partitions
+                                   if 'MAX' not in p and parse_partition_name(p) <= (retention_year, retention_month)]
+            print(f"Partitions identified to purge for {table_name}: {filtered_partitions}")
+            partition_data[table_name] = filtered_partitions
+            for partition in partitions:
+                partition_details[(table_name, partition['partition_name'])] = partition
+            plan_tables[table_name] = {
+                'retention_date': retention_date.isoformat(),
+                'partitions': [partition_details[(table_name, p)] for p in filtered_partitions]
+            }
         else:
-            print(f"Failed to retrieve retention date for table: {table_name}")
-           #return [], table_name
+            print(f"Failed to retrieve partitions for table: {table_name}")
     date_suffix = datetime.datetime.now().strftime('%Y_%m-%d')
     filename = f"partition_results_{date_suffix}.txt"
-    write_partitions_to_file(partition_data,instance_details, filename)
+    write_partitions_to_file(partition_data,instance_details, filename, partition_details)
+    plan_file = write_plan(plan_file or f"purge_plan_{date_suffix}.json", instance_name, TABLE_OWNER, plan_tables)
+    print(f"Purge plan has been written to '{plan_file}'.")
     return partition_data
 
-# Function to validate partitions
-def verify_data_status_for_purging(partition_data, username, password, dsn):
+# Function to check whether a partition still holds unarchived rows.
+# Stops at the first matching row instead of counting the whole partition. After an exchange backup the
+# partition is empty and its rows are in the staging table, so the staging table is checked as well.
+def has_unarchived_rows(db, table_name, partition):
+    sources = [f"{TABLE_OWNER}.{table_name.upper()} PARTITION ({partition})"]
+    staging_table = get_staging_table(db, TABLE_OWNER, table_name, partition)
+    if staging_table:
+        sources.append(f"{TABLE_OWNER}.{staging_table}")
+    for source in sources:
+        existence_query = f"""
+        SELECT 1
+        FROM {source}
+        WHERE ILM_ARCH_SW = 'N'
+        AND ROWNUM = 1
+        """
+        if db.query(existence_query):
+            return True
+    return False
+
+# Function to validate partitions concurrently, streaming each result to the report as it finishes.
+# Returns {(table_name, partition): True if the partition has no unarchived rows, None if the check failed}
+def verify_data_status_for_purging(partition_data, db, max_workers=None):
     date_suffix = datetime.datetime.now().strftime('%Y_%m-%d')
     filename = f'partition_validation_{date_suffix}.txt'
-    validation_results= ""
-    for table_name, partition_names in partition_data.items():
-        validation_results += f"Partition Validation Results for Table: {table_name}\n"
-        validation_results += "Partitions:\n"
-    
-        for partition in partition_names:
-            validation_results += f" - {partition}\n"
-    
-        main_partitions = [partition for partition in partition_names if '_S' not in partition]
-    
-        for partition in main_partitions:
-            partition = partition.strip("'")
-        
-            validation_query = f"""
-            SELECT /*+ parallel 15 */ COUNT(1)
-            FROM CISADM.{table_name.upper()} PARTITION ({partition})
-            WHERE ILM_ARCH_SW = 'N';
-            """
-            validation_result = execute_sqlplus_query(username, password, dsn, validation_query)
-            print(f"validating partitions in table {table_name.upper()}")
-            if "rows selected" in validation_result.lower():
-                continue
-            count = int(validation_result.split('\n')[-1].strip())
-            if count == 0:
-                validation_results += f"Partition {partition}: Validated successfully with result {count}.\n"
-            else:
-                validation_results += f"Partition {partition}: Validation failed with result {count}.\n"
-        
-    write_to_text_file(validation_results, filename)
+    results = {}
+    with open(filename, 'w') as report:
+        checks = []
+        for table_name, partition_names in partition_data.items():
+            report.write(f"Partition Validation Results for Table: {table_name}\n")
+            report.write("Partitions:\n")
+            for partition in partition_names:
+                report.write(f" - {partition}\n")
+            checks.extend((table_name, partition.strip("'")) for partition in partition_names if '_S' not in partition)
+        report.write("\nValidation Results:\n")
+        report.flush()
+
+        # Each check borrows its own pooled session, so the session cap bounds the concurrency
+        with ThreadPoolExecutor(max_workers=min(max_workers or db.max_sessions, db.max_sessions)) as executor:
+            futures = {executor.submit(has_unarchived_rows, db, table_name, partition): (table_name, partition)
+                       for table_name, partition in checks}
+            print(f"validating {len(futures)} partitions in {len(partition_data)} tables")
+            for future in as_completed(futures):
+                table_name, partition = futures[future]
+                try:
+                    unarchived = future.result()
+                except Exception as e:
+                    results[(table_name, partition)] = None
+                    report.write(f"Table {table_name} Partition {partition}: Validation could not run: {e}\n")
+                else:
+                    results[(table_name, partition)] = not unarchived
+                    if unarchived:
+                        report.write(f"Table {table_name} Partition {partition}: Validation failed, unarchived rows exist.\n")
+                    else:
+                        report.write(f"Table {table_name} Partition {partition}: Validated successfully, no unarchived rows.\n")
+                report.flush()
+
     print(f"Partition validation results have been written to '{filename}'.")
+    return results
 
-# Function to validate the table for invalid objects and unusable indexes
-def objects_validation(username, password, dsn):
+# Function to validate the table for invalid objects and unusable indexes.
+# Rows are streamed from the catalog straight into the report, so memory use does not grow with the result.
+def objects_validation(db):
     date_suffix = datetime.datetime.now().strftime('%Y_%m-%d')
     filename = f'invalid_objects_{date_suffix}.txt'
     invalid_objects_query = """
-    SELECT object_name, status
+    SELECT owner, object_name, object_type, status
     FROM dba_objects
-    WHERE status <> 'VALID';
+    WHERE status <> 'VALID'
     """
     unusable_indexes_query = """
-    SELECT 'ALTER INDEX CISADM.' || index_name || ' REBUILD PARTITION ' || PARTITION_NAME || ' ONLINE PARALLEL 25;'
+    SELECT index_name, partition_name
     FROM dba_ind_partitions
-    WHERE index_owner = 'CISADM' AND status = 'UNUSABLE';
+    WHERE index_owner = :owner AND status = 'UNUSABLE'
     """
-    invalid_objects_result = execute_sqlplus_query(username, password, dsn, invalid_objects_query)
-    unusable_indexes_result = execute_sqlplus_query(username, password, dsn, unusable_indexes_query)
-    # Handle query failures
-    if not invalid_objects_result:
-        invalid_objects_result = "Error retrieving invalid objects."
-    
-    if not unusable_indexes_result:
-        unusable_indexes_result = "Error retrieving unusable indexes."
-    
-    combined_result = f"Invalid Objects:\n{invalid_objects_result}\n\nUnusable Indexes:\n{unusable_indexes_result}"
-    write_to_text_file(combined_result, filename)
+    with open(filename, 'w') as report:
+        report.write("Invalid Objects:\n")
+        # Handle query failures
+        try:
+            with db.stream(invalid_objects_query) as rows:
+                for row in rows:
+                    report.write(f"{row.owner}.{row.object_name} {row.object_type} {row.status}\n")
+        except Exception as e:
+            print("Error:", e)
+            report.write("Error retrieving invalid objects.\n")
+
+        report.write("\nUnusable Indexes:\n")
+        try:
+            with db.stream(unusable_indexes_query, owner=TABLE_OWNER) as rows:
+                for row in rows:
+                    report.write(f"ALTER INDEX {TABLE_OWNER}.{row.index_name} REBUILD PARTITION {row.partition_name} ONLINE PARALLEL 25;\n")
+        except Exception as e:
+            print("Error:", e)
+            report.write("Error retrieving unusable indexes.\n")
     print(f"Results have been written to '{filename}'.")
 
-def purge_partitions(username, password, dsn, partition_data):
+# Function to list the UNUSABLE index partitions as {index_name: [partition_name, ...]}
+def get_unusable_index_partitions(db, owner=TABLE_OWNER):
+    unusable_query = """
+    SELECT index_name, partition_name
+    FROM dba_ind_partitions
+    WHERE index_owner = :owner AND status = 'UNUSABLE'
+    ORDER BY index_name, partition_position
+    """
+    unusable = {}
+    for index_name, partition_name in db.query(unusable_query, owner=owner):
+        unusable.setdefault(index_name, []).append(partition_name)
+    return unusable
+
+def index_partition_status(db, index_name, partition_name, owner=TABLE_OWNER):
+    status_query = """
+    SELECT status
+    FROM dba_ind_partitions
+    WHERE index_owner = :owner AND index_name = :index_name AND partition_name = :partition_name
+    """
+    return db.query_value(status_query, owner=owner, index_name=index_name, partition_name=partition_name)
+
+# Function to rebuild the unusable partitions of one index, one at a time, re-checking each status around the rebuild
+def rebuild_index(db, index_name, partition_names, parallel_degree, report, report_lock):
+    results = []
+    for partition in partition_names:
+        started = time.monotonic()
+        try:
+            status = index_partition_status(db, index_name, partition)
+            if status != 'UNUSABLE':
+                message = f"skipped, status is already {status}"
+            else:
+                db.execute(f"ALTER INDEX {TABLE_OWNER}.{index_name} REBUILD PARTITION {partition} ONLINE PARALLEL {parallel_degree}")
+                status = index_partition_status(db, index_name, partition)
+                message = f"rebuilt, status {status}"
+        except Exception as e:
+            status = None
+            message = f"rebuild failed: {str(e)}"
+        seconds = time.monotonic() - started
+        results.append((index_name, partition, status, seconds))
+        with report_lock:
+            report.write(f"{index_name} partition {partition}: {message} ({seconds:.1f} seconds)\n")
+            report.flush()
+    return results
+
+# Function to rebuild all UNUSABLE index partitions online. Each index is rebuilt by a single worker, so no two
+# rebuilds contend for the same index, and up to max_workers indexes are rebuilt at the same time.
+def rebuild_unusable_indexes(db, max_workers=2, parallel_degree=25):
+    date_suffix = datetime.datetime.now().strftime('%Y_%m-%d')
+    filename = f'index_rebuild_{date_suffix}.txt'
+    try:
+        unusable = get_unusable_index_partitions(db)
+    except Exception as e:
+        print("Error retrieving unusable indexes:", e)
+        return None
+    total = sum(len(partitions) for partitions in unusable.values())
+    print(f"Rebuilding {total} unusable partitions of {len(unusable)} indexes.")
+
+    started = time.monotonic()
+    report_lock = threading.Lock()
+    results = []
+    with open(filename, 'w') as report:
+        report.write(f"Index Rebuild Results ({total} unusable partitions in {len(unusable)} indexes):\n")
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers or db.max_sessions, db.max_sessions))) as executor:
+            futures = {executor.submit(rebuild_index, db, index_name, partitions, parallel_degree, report, report_lock): index_name
+                       for index_name, partitions in unusable.items()}
+            for future in as_completed(futures):
+                index_results = future.result()
+                results.extend(index_results)
+                print(f"Index {futures[future]}: {len(index_results)} partitions in {sum(r[3] for r in index_results):.1f} seconds.")
+
+        remaining = get_unusable_index_partitions(db)
+        remaining_count = sum(len(partitions) for partitions in remaining.values())
+        report.write(f"\nFinished in {time.monotonic() - started:.1f} seconds. Unusable partitions remaining: {remaining_count}\n")
+        for index_name, partitions in remaining.items():
+            report.write(f" - {index_name}: {', '.join(partitions)}\n")
+    print(f"Index rebuild finished with {remaining_count} unusable partitions remaining. Results have been written to '{filename}'.")
+    return results
+
+# Function to drop a tablespace once no segments are left in it
+def drop_tablespace_if_empty(db, tablespace_name, table_name, dropped_file, skipped_file, journal=None):
+    verify_tablespace_query = "SELECT segment_name FROM dba_segments WHERE tablespace_name = :tablespace_name FETCH FIRST 1 ROWS ONLY"
+    verify_result = db.query(verify_tablespace_query, tablespace_name=tablespace_name)
+
+    if not verify_result:
+        drop_tablespace_query = f"DROP TABLESPACE {tablespace_name} INCLUDING CONTENTS AND DATAFILES"
+        db.execute(drop_tablespace_query)
+        if journal:
+            journal.record_tablespace_drop(tablespace_name, table_name)
+        dropped_file.write(f"Tablespace {tablespace_name} for table {table_name} was dropped successfully.\n")
+        print(f"Tablespace {tablespace_name} dropped for {table_name}.")
+    else:
+        skipped_file.write(f"Tablespace {tablespace_name} for table {table_name} was not dropped. Segments still exist.\n")
+        print(f"Tablespace {tablespace_name} not dropped for {table_name} due to existing segments.")
+
+# Function to schedule DBMS_PART.CLEANUP_GIDX for a table as a one-off scheduler job
+def schedule_index_cleanup(db, table_name, owner=TABLE_OWNER):
+    job_name = f"PURGE_GIDX_{table_name.upper()}"[:128]
+    db.execute("""
+    BEGIN
+        DBMS_SCHEDULER.CREATE_JOB(job_name => :job_name, job_type => 'PLSQL_BLOCK', job_action => :job_action,
+                                  enabled => TRUE, auto_drop => TRUE);
+    END;
+    """, job_name=job_name, job_action=f"BEGIN DBMS_PART.CLEANUP_GIDX('{owner}', '{table_name.upper()}'); END;")
+    return job_name
+
+# Function to list the global indexes of the tables that still have orphaned entries or unusable partitions,
+# with one catalog query per 1000 tables
+def pending_index_maintenance(db, table_names, owner=TABLE_OWNER):
+    pending = []
+    for start in range(0, len(table_names), CATALOG_BATCH_SIZE):
+        batch = table_names[start:start + CATALOG_BATCH_SIZE]
+        binds = {f"t{i}": table_name.upper() for i, table_name in enumerate(batch)}
+        pending_query = f"""
+        SELECT i.table_name, i.index_name,
+               CASE WHEN i.orphaned_entries = 'YES' THEN 'ORPHANED ENTRIES' ELSE 'UNUSABLE' END
+        FROM dba_indexes i
+        WHERE i.owner = :owner
+        AND i.table_name IN ({', '.join(':' + name for name in binds)})
+        AND (i.orphaned_entries = 'YES'
+             OR i.status = 'UNUSABLE'
+             OR EXISTS (SELECT 1 FROM dba_ind_partitions p
+                        WHERE p.index_owner = i.owner AND p.index_name = i.index_name AND p.status = 'UNUSABLE'))
+        """
+        pending.extend(db.query(pending_query, owner=owner, **binds))
+    return pending
+
+# Function to wait until the global indexes of the tables are clean and usable again
+def wait_for_index_maintenance(db, table_names, log_file, timeout_minutes=60):
+    started = time.monotonic()
+    while True:
+        pending = pending_index_maintenance(db, table_names)
+        elapsed = int(time.monotonic() - started)
+        if not pending:
+            log_file.write(f"{elapsed}s: all global indexes are usable with no orphaned entries.\n")
+            print(f"Global index maintenance finished after {elapsed} seconds.")
+            return True
+        for table_name, index_name, state in pending:
+            log_file.write(f"{elapsed}s: {table_name} index {index_name}: {state}\n")
+        log_file.flush()
+        if elapsed >= timeout_minutes * 60:
+            print(f"Global index maintenance still pending on {len(pending)} indexes after {timeout_minutes} minutes. See {log_file.name}.")
+            return False
+        time.sleep(INDEX_POLL_SECONDS)
+
+# Function to drop the purge partitions, per partition or with one multi-partition DDL per table.
+# On 12c and later UPDATE GLOBAL INDEXES only marks global index entries as orphaned, and Oracle cleans
+# them up in its nightly maintenance job. With async index maintenance a DBMS_PART.CLEANUP_GIDX job per
+# table is scheduled right after the drops and the indexes are tracked until they are clean and usable.
+# Drops already recorded in the journal by an earlier run are skipped.
+def purge_partitions(db, partition_data, drop_mode='partition', index_maintenance='sync', index_wait_minutes=60, journal=None):
     log_dir = f"purge_partition/{datetime.datetime.now().strftime('%d-%m-%Y')}"
     os.makedirs(log_dir, exist_ok=True)
     tablespace_csv_file = f"{log_dir}/tablespace_info.csv"
     dropped_log = f"{log_dir}/dropped_tablespaces.log"
     skipped_log = f"{log_dir}/skipped_tablespaces.log"
-
-    # List of tablespaces to block from being dropped
-    blocked_tablespaces = {'CISTS_01', 'SYSAUX', 'SYSTEM', 'USERS'}
+    index_log = f"{log_dir}/index_maintenance.log"
+    purged_tables = []
 
     with open(tablespace_csv_file, 'w', newline='') as csvfile, \
          open(dropped_log, 'w') as dropped_file, \
@@ -233,89 +436,247 @@ def purge_partitions(username, password, dsn, partition_data):
         csv_writer.writerow(['table_name', 'partition_name', 'tablespace_name'])
 
         for table_name, partition_names in partition_data.items():
+            if journal:
+                completed = journal.dropped_partitions(table_name)
+                for partition in partition_names:
+                    if partition in completed:
+                        print(f"Skipping partition {partition} of {table_name}, already dropped in a previous run.")
+                partition_names = [partition for partition in partition_names if partition not in completed]
+            if not partition_names:
+                continue
+            try:
+                tablespace_query = """
+                SELECT partition_name, tablespace_name
+                FROM DBA_TAB_PARTITIONS 
+                WHERE table_owner = :owner
+                AND table_name = :table_name
+                """
+                tablespaces = dict(db.query(tablespace_query, owner=TABLE_OWNER, table_name=table_name.upper()))
+            except Exception as e:
+                print(f"Error in reading tablespaces for table {table_name}: {str(e)}")
+                continue
+
+            droppable = []
             for partition in partition_names:
+                tablespace_name = tablespaces.get(partition)
+                # Check if the tablespace is in the blocked list
+                if tablespace_name in BLOCKED_TABLESPACES:
+                    skipped_file.write(f"Tablespace {tablespace_name} for table {table_name} is blocked from being dropped.\n")
+                    print(f"Skipping drop for blocked tablespace {tablespace_name}.")
+                    continue
+                csv_writer.writerow([table_name, partition, tablespace_name])
+                droppable.append(partition)
+            if not droppable:
+                continue
+
+            # One DDL per partition, or all of the table's partitions in one DDL so global indexes are maintained once
+            batches = [droppable] if drop_mode == 'table' else [[partition] for partition in droppable]
+            for batch in batches:
                 try:
-                    spool_file = f"{log_dir}/{table_name}_{partition}_purge.log"
-                    tablespace_query = f"""
-                    SELECT tablespace_name
-                    FROM DBA_TAB_PARTITIONS 
-                    WHERE table_name = '{table_name.upper()}'
-                    AND partition_name = '{partition}';
-                    """
-                    tablespace_name_result = execute_sqlplus_query(username, password, dsn, tablespace_query)
-                    tablespace_name = tablespace_name_result.splitlines()[-1].strip()
-                    
-                    # Check if the tablespace is in the blocked list
-                    if tablespace_name in blocked_tablespaces:
-                        skipped_file.write(f"Tablespace {tablespace_name} for table {table_name} is blocked from being dropped.\n")
-                        print(f"Skipping drop for blocked tablespace {tablespace_name}.")
-                        continue
-                    
-                    csv_writer.writerow([table_name, partition, tablespace_name])
-                    drop_partition_query = f"ALTER TABLE CISADM.{table_name.upper()} DROP PARTITION {partition} UPDATE GLOBAL INDEXES;"
-                    drop_result = execute_sqlplus_query(username, password, dsn, drop_partition_query)
-                    
-                    verify_tablespace_query = f"SELECT segment_name FROM dba_segments WHERE tablespace_name = '{tablespace_name}';"
-                    verify_result = execute_sqlplus_query(username, password, dsn, verify_tablespace_query)
-
-                    if 'no rows selected' in verify_result.lower():
-                        drop_tablespace_query = f"DROP TABLESPACE {tablespace_name} INCLUDING CONTENTS AND DATAFILES;"
-                        drop_ts_result = execute_sqlplus_query(username, password, dsn, drop_tablespace_query)
-                        dropped_file.write(f"Tablespace {tablespace_name} for table {table_name} was dropped successfully.\n")
-                        print(f"Tablespace {tablespace_name} dropped for {table_name}.")
-                    else:
-                        skipped_file.write(f"Tablespace {tablespace_name} for table {table_name} was not dropped. Segments still exist.\n")
-                        print(f"Tablespace {tablespace_name} not dropped for {table_name} due to existing segments.")
-                
+                    drop_partition_query = f"ALTER TABLE {TABLE_OWNER}.{table_name.upper()} DROP PARTITION {', '.join(batch)} UPDATE GLOBAL INDEXES"
+                    started = time.monotonic()
+                    db.execute(drop_partition_query)
+                    if journal:
+                        journal.record_partition_drops(table_name, batch)
+                    print(f"Dropped partitions {', '.join(batch)} of {table_name} in {time.monotonic() - started:.1f} seconds.")
+                    if table_name not in purged_tables:
+                        purged_tables.append(table_name)
+
+                    for tablespace_name in dict.fromkeys(tablespaces.get(partition) for partition in batch):
+                        if not tablespace_name or (journal and journal.tablespace_dropped(tablespace_name)):
+                            continue
+                        try:
+                            drop_tablespace_if_empty(db, tablespace_name, table_name, dropped_file, skipped_file, journal)
+                        except Exception as e:
+                            print(f"Error in processing tablespace {tablespace_name} for table {table_name}: {str(e)}")
+
                 except Exception as e:
-                    print(f"Error in processing tablespace {tablespace_name} for table {table_name}, partition {partition}: {str(e)}")
+                    print(f"Error in dropping partitions {', '.join(batch)} of table {table_name}: {str(e)}")
     print(f"Tablespace information saved to {tablespace_csv_file}.")
     print(f"Dropped tablespaces log saved to {dropped_log}.")
     print(f"Skipped tablespaces log saved to {skipped_log}.")
 
+    if index_maintenance == 'async' and purged_tables:
+        with open(index_log, 'w') as index_file:
+            for table_name in purged_tables:
+                try:
+                    job_name = schedule_index_cleanup(db, table_name)
+                    index_file.write(f"Scheduled global index cleanup job {job_name} for table {table_name}.\n")
+                    print(f"Scheduled global index cleanup job {job_name} for {table_name}.")
+                except Exception as e:
+                    index_file.write(f"Failed to schedule global index cleanup for table {table_name}: {str(e)}\n")
+                    print(f"Failed to schedule global index cleanup for {table_name}: {str(e)}")
+            if index_wait_minutes:
+                wait_for_index_maintenance(db, purged_tables, index_file, index_wait_minutes)
+        print(f"Index maintenance log saved to {index_log}.")
+
+# Function to archive the purge partitions concurrently before they are dropped.
+# Returns partition_data reduced to the partitions that are backed up, now or in an earlier journaled run.
+def create_backup(db, partition_data, backup_dir, method='export', max_workers=None, max_mb_per_second=0, journal=None,
+                  backup_tablespace=None):
+    store = get_backup_store(backup_dir)
+    limiter = ThroughputLimiter(max_mb_per_second)
+    backed_up = {table_name: [] for table_name in partition_data}
+    tasks = []
+    for table_name, partition_names in partition_data.items():
+        completed = journal.backed_up_partitions(table_name) | journal.dropped_partitions(table_name) if journal else set()
+        for partition in partition_names:
+            if partition in completed:
+                print(f"Skipping backup of partition {partition} of {table_name}, already archived or dropped in a previous run.")
+                backed_up[table_name].append(partition)
+            else:
+                tasks.append((table_name, partition))
+
+    entries = []
+    # Each backup borrows its own pooled session, so the session cap bounds the concurrency
+    with ThreadPoolExecutor(max_workers=min(max_workers or db.max_sessions, db.max_sessions)) as executor:
+        futures = {executor.submit(backup_partition, db, TABLE_OWNER, table_name, partition, store, limiter, method, backup_tablespace): (table_name, partition)
+                   for table_name, partition in tasks}
+        print(f"Backing up {len(futures)} partitions to {backup_dir} using {method}.")
+        for future in as_completed(futures):
+            table_name, partition = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                print(f"Backup failed for table {table_name}, partition {partition}: {str(e)}")
+                continue
+            entries.append(entry)
+            backed_up[table_name].append(partition)
+            if journal:
+                journal.record_backup(table_name, partition, method, entry.get('location'), entry.get('sha256'))
+            if 'location' in entry:
+                print(f"Backed up {table_name} partition {partition}: {entry['rows']} rows, {entry['bytes'] / 1024 ** 2:.1f} MB "
+                      f"in {entry['seconds']} seconds to {entry['location']} (sha256 {entry['sha256']}).")
+            else:
+                print(f"Backed up {table_name} partition {partition} into staging table {entry['staging_table']} in {entry['seconds']} seconds.")
+
+    if entries:
+        print(f"Backup manifest saved to {write_manifest(store, entries)}.")
+    # Keep plan order so the drops run in the same order as without a backup
+    return {table_name: [partition for partition in partition_names if partition in backed_up[table_name]]
+            for table_name, partition_names in partition_data.items()}
+
 # Main function to parse arguments and call appropriate function
 def main():
     parser = argparse.ArgumentParser(description="Run database maintenance tasks.")
-    parser.add_argument('function', choices=['identify_partitions_to_purge', 'verify_data_status_for_purging', 'objects_validation', 'purge_partitions'],
+    parser.add_argument('function', choices=['identify_partitions_to_purge', 'verify_data_status_for_purging', 'objects_validation',
+                                             'create_backup', 'purge_partitions', 'rebuild_unusable_indexes'],
                         help="The function to execute.")
     parser.add_argument('--csv', type=str, help="Path to the CSV file for processing partitions.")
-    parser.add_argument('--backup-dir', type=str, help="Directory path for backups.")
+    parser.add_argument('--backup-dir', type=str,
+                        help="Directory path or oci://<bucket>/<prefix> for backups. purge_partitions backs up each partition first when set.")
+    parser.add_argument('--backup_method', choices=['export', 'exchange', 'both'], default='export',
+                        help="Export rows to checksummed gzip CSV files, exchange partitions into staging tables, or both.")
+    parser.add_argument('--backup_tablespace', type=str,
+                        help="Tablespace that keeps the staging tables of exchanged partitions (required with exchange and both).")
+    parser.add_argument('--backup_sessions', type=int, help="Concurrent partition backups (default: --db_sessions).")
+    parser.add_argument('--backup_max_mb_per_second', type=float, default=0,
+                        help="Combined write throughput cap for backup exports in MB/s (0 for no cap).")
     parser.add_argument('--db_dsn', type=str, help="Database Name.")
     parser.add_argument('--db_username', type=str, help="Database username.")
     parser.add_argument('--db_password', type=str, help="Database password.")
+    parser.add_argument('--db_driver', type=str, default=os.environ.get('DB_DRIVER', 'oracledb'),
+                        help="Database driver: 'oracledb' (python-oracledb thin mode), 'memory' (in-memory stand-in) or 'package.module:Class'.")
+    parser.add_argument('--db_sessions', type=int, default=4, help="Maximum pooled database sessions.")
+    parser.add_argument('--validation_sessions', type=int, help="Concurrent partition validations (default: --db_sessions).")
+    parser.add_argument('--plan', type=str,
+                        help="Purge plan file. identify writes it; verify and purge read it instead of identifying again.")
+    parser.add_argument('--journal', type=str,
+                        help="SQLite journal of completed drops, used to resume a purge (default: <dsn>_purge_journal.sqlite).")
+    parser.add_argument('--rebuild_sessions', type=int, default=2, help="Indexes rebuilt at the same time.")
+    parser.add_argument('--rebuild_parallel', type=int, default=25, help="PARALLEL degree of each online index partition rebuild.")
+    parser.add_argument('--drop_mode', choices=['partition', 'table'], default='partition',
+                        help="Drop each partition separately, or all of a table's partitions in one DDL.")
+    parser.add_argument('--index_maintenance', choices=['sync', 'async'], default='sync',
+                        help="Leave orphaned global index entries to the nightly cleanup, or schedule DBMS_PART.CLEANUP_GIDX and track it.")
+    parser.add_argument('--index_wait_minutes', type=int, default=60,
+                        help="Minutes to track async index cleanup until indexes are usable again (0 to not wait).")
 
     args = parser.parse_args()
     dsn = args.db_dsn
     username = args.db_username
     password = args.db_password
-    
-    if args.function in ['identify_partitions_to_purge', 'verify_data_status_for_purging', 'purge_partitions']:
+    # Every statement of the run shares one session pool; executed statements are logged like the old spool file
+    file_prefix = re.sub(r'[^A-Za-z0-9_.-]', '_', dsn or 'db')
+    args.journal = args.journal or f"{file_prefix}_purge_journal.sqlite"
+    db = Database(get_driver(args.db_driver), username, password, dsn, max_sessions=args.db_sessions,
+                  log_file=f"{file_prefix}_purge.log")
+    try:
+        run_function(args, db)
+    finally:
+        db.close()
+
+# Function to load the purge plan, or identify the partitions again when no plan is given
+def get_partition_data(args, df, db):
+    if args.plan and args.function != 'identify_partitions_to_purge':
+        instance_name, _ = get_instance_details(db)
+        try:
+            partition_data = read_plan(args.plan, instance_name)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Cannot use purge plan '{args.plan}': {e}")
+            return None
+        print(f"Using purge plan '{args.plan}' with {sum(len(p) for p in partition_data.values())} partitions.")
+        return partition_data
+    return identify_partitions_to_purge(df, db, args.plan)
+
+def run_function(args, db):
+
+    df = None
+    if args.function in ['identify_partitions_to_purge', 'verify_data_status_for_purging', 'create_backup', 'purge_partitions'] and not (
+            args.plan and args.function != 'identify_partitions_to_purge'):
         if not args.csv:
             print("CSV file path is required for this function.")
             return
         df = pd.read_csv(args.csv)
     if args.function == 'identify_partitions_to_purge':
-        if not args.csv:
-            print("CSV file path is required for processing partitions.")
-            return
-        partition_data=identify_partitions_to_purge(df, username, password, dsn)
+        partition_data=get_partition_data(args, df, db)
 
     elif args.function == 'verify_data_status_for_purging':
-        if not args.csv:
-            print("CSV file path is required for validating partitions.")
+        partition_data=get_partition_data(args, df, db)
+        if partition_data is None:
             return
-        partition_data=identify_partitions_to_purge(df, username, password, dsn)
-        verify_data_status_for_purging(partition_data, username, password, dsn)
+        verify_data_status_for_purging(partition_data, db, args.validation_sessions)
     
     elif args.function == 'objects_validation':
-        objects_validation(username, password, dsn)
+        objects_validation(db)
+
+    elif args.function == 'rebuild_unusable_indexes':
+        rebuild_unusable_indexes(db, args.rebuild_sessions, args.rebuild_parallel)
     
+    elif args.function == 'create_backup':
+        if not args.backup_dir:
+            print("Backup directory is required for creating a backup.")
+            return
+        if args.backup_method != 'export' and not args.backup_tablespace:
+            print("Backup tablespace is required for exchange backups.")
+            return
+        partition_data=get_partition_data(args, df, db)
+        if partition_data is None:
+            return
+        journal = PurgeJournal(args.journal)
+        try:
+            create_backup(db, partition_data, args.backup_dir, args.backup_method, args.backup_sessions,
+                          args.backup_max_mb_per_second, journal, args.backup_tablespace)
+        finally:
+            journal.close()
+
     elif args.function == 'purge_partitions':
-        if not args.csv:
-            print("CSV file path is required for purging partitions.")
+        if args.backup_dir and args.backup_method != 'export' and not args.backup_tablespace:
+            print("Backup tablespace is required for exchange backups.")
+            return
+        partition_data=get_partition_data(args, df, db)
+        if partition_data is None:
             return
-        partition_data=identify_partitions_to_purge(df, username, password, dsn)
-        purge_partitions(username, password, dsn, partition_data)
+        journal = PurgeJournal(args.journal)
+        try:
+            # Only partitions with a completed backup are dropped
+            if args.backup_dir:
+                partition_data = create_backup(db, partition_data, args.backup_dir, args.backup_method, args.backup_sessions,
+                                               args.backup_max_mb_per_second, journal, args.backup_tablespace)
+            purge_partitions(db, partition_data, args.drop_mode, args.index_maintenance, args.index_wait_minutes, journal)
+        finally:
+            journal.close()
+        print(f"Purge journal saved to {args.journal}.")
 
 if __name__ == "__main__":
     main()
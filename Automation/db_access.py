@@ -0,0 +1,218 @@
+import datetime
+import importlib
+import re
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+# Database access layer for the Automation scripts.
+# Statements run on a pool of native driver sessions opened once per run, instead of one sqlplus process and
+# login per statement. The driver is pluggable: "oracledb" (python-oracledb thin mode, no Oracle Client needed),
+# "memory" (an in-memory stand-in that records the statements instead of running them) or "package.module:Class"
+# for any class with the same create_pool() method.
+
+
+class OracledbDriver:
+    # python-oracledb in thin mode. Imported on first use so a stand-in driver does not need it installed
+    def create_pool(self, username, password, dsn, min_sessions, max_sessions):
+        import oracledb
+        return oracledb.create_pool(user=username, password=password, dsn=dsn,
+                                    min=min_sessions, max=max_sessions, increment=1)
+
+
+class MemoryDriver:
+    # In-memory stand-in for local dry runs and tests; no database is involved. Queries are answered from the
+    # responses registered with respond(), other statements return no rows, and every statement run is kept
+    # in statements as (sql, binds) with its whitespace collapsed.
+    def __init__(self):
+        self.responses = []
+        self.statements = []
+        self.lock = threading.Lock()
+
+    def respond(self, pattern, rows, columns=None):
+        # Answers statements matching the regular expression pattern with rows, a list of tuples or a
+        # callable taking the binds. columns names the rows' columns for Database.stream
+        self.responses.append((re.compile(pattern, re.IGNORECASE), rows, columns))
+
+    def executed(self, pattern):
+        # Returns the recorded statements matching the regular expression pattern
+        regex = re.compile(pattern, re.IGNORECASE)
+        return [(sql, binds) for sql, binds in self.statements if regex.search(sql)]
+
+    def run(self, sql, binds):
+        sql = " ".join(sql.split())
+        with self.lock:
+            self.statements.append((sql, dict(binds)))
+        for regex, rows, columns in self.responses:
+            if regex.search(sql):
+                rows = list(rows(binds) if callable(rows) else rows)
+                return rows, columns or [f"COLUMN{i}" for i in range(len(rows[0]) if rows else 0)]
+        return [], []
+
+    def create_pool(self, username, password, dsn, min_sessions, max_sessions):
+        return MemoryPool(self)
+
+
+class MemoryPool:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def acquire(self):
+        return MemoryConnection(self.driver)
+
+    def release(self, connection):
+        pass
+
+    def close(self):
+        pass
+
+
+class MemoryConnection:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def cursor(self):
+        return MemoryCursor(self.driver)
+
+    def commit(self):
+        pass
+
+
+class MemoryCursor:
+    def __init__(self, driver):
+        self.driver = driver
+        self.arraysize = 100
+        self.description = None
+        self.rows = []
+
+    def execute(self, sql, binds=None):
+        self.rows, columns = self.driver.run(sql, binds or {})
+        self.description = [(column,) for column in columns]
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchmany(self):
+        rows, self.rows = self.rows[:self.arraysize], self.rows[self.arraysize:]
+        return rows
+
+    def close(self):
+        pass
+
+
+DRIVERS = {"oracledb": OracledbDriver, "memory": MemoryDriver}
+# Rows fetched per round trip by Database.stream
+STREAM_ARRAY_SIZE = 1000
+
+
+def get_driver(name="oracledb"):
+    # Returns a driver instance by registered name or "package.module:Class" path
+    if name in DRIVERS:
+        return DRIVERS[name]()
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown database driver '{name}'. Use one of {sorted(DRIVERS)} or 'package.module:Class'.")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class Database:
+    # Pooled access to one database. Safe to share between threads; each statement borrows a session.
+    def __init__(self, driver, username, password, dsn, min_sessions=1, max_sessions=4, log_file=None):
+        self.dsn = dsn
+        self.max_sessions = max_sessions
+        self.pool = driver.create_pool(username, password, dsn, min_sessions, max_sessions)
+        self.log_file = log_file
+        self._log_lock = threading.Lock()
+
+    @contextmanager
+    def session(self):
+        # Borrows a pooled session for several statements that must share it
+        connection = self.pool.acquire()
+        try:
+            yield connection
+        finally:
+            self.pool.release(connection)
+
+    def query(self, sql, **binds):
+        # Returns all rows of a query as tuples
+        with self.session() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(sql, binds)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+    def stream(self, sql, arraysize=STREAM_ARRAY_SIZE, **binds):
+        # Returns the query's rows as a RowStream, for results too large to hold in memory
+        return RowStream(self, sql, binds, arraysize)
+
+    def query_value(self, sql, **binds):
+        # Returns the first column of the first row, or None when the query returns no rows
+        rows = self.query(sql, **binds)
+        return rows[0][0] if rows else None
+
+    def execute(self, sql, **binds):
+        # Runs a DML or DDL statement and records it in the statement log
+        self.log(f"{sql} {binds}" if binds else sql)
+        with self.session() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(sql, binds)
+                connection.commit()
+            finally:
+                cursor.close()
+
+    def log(self, message):
+        if not self.log_file:
+            return
+        with self._log_lock, open(self.log_file, 'a') as file:
+            file.write(f"{datetime.datetime.now().isoformat(timespec='seconds')} {message}\n")
+
+    def close(self):
+        self.pool.close()
+
+
+class RowStream:
+    # Rows of one query as named tuples with lower-case column names, fetched arraysize rows per round trip.
+    # Holds a pooled session until the rows are exhausted or the stream is closed; use it as a context manager.
+    def __init__(self, db, sql, binds, arraysize):
+        self.pool = db.pool
+        self.connection = self.pool.acquire()
+        try:
+            self.cursor = self.connection.cursor()
+            self.cursor.arraysize = arraysize
+            self.cursor.execute(sql, binds)
+        except Exception:
+            self.pool.release(self.connection)
+            raise
+        self.columns = [column[0].lower() for column in self.cursor.description]
+        self.row_type = namedtuple("Row", self.columns, rename=True)
+        self.closed = False
+
+    def __iter__(self):
+        try:
+            while True:
+                batch = self.cursor.fetchmany()
+                if not batch:
+                    break
+                for row in batch:
+                    yield self.row_type._make(row)
+        finally:
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.cursor.close()
+        finally:
+            self.pool.release(self.connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
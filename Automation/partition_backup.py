@@ -0,0 +1,214 @@
+import csv
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Partition archive stage for Identify_purge_DB_table.py.
+# Each partition is archived before it is dropped, by one or both of:
+#   exchange: ALTER TABLE ... EXCHANGE PARTITION into a staging table, which keeps the rows in the database
+#             in a dedicated backup tablespace
+#   export  : rows streamed from the partition (or its staging table) into a gzip CSV in the backup store
+# Exports are checksummed (sha256 of the stored bytes) and written through a shared throughput cap.
+
+class ThroughputLimiter:
+    # Caps the combined write rate of all export threads. 0 disables the cap.
+    def __init__(self, mb_per_second=0):
+        self.bytes_per_second = mb_per_second * 1024 * 1024
+        self._lock = threading.Lock()
+        self._next_free = time.monotonic()
+
+    def consume(self, nbytes):
+        if not self.bytes_per_second:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_free)
+            self._next_free = start + nbytes / self.bytes_per_second
+            wait = start - now
+        if wait > 0:
+            time.sleep(wait)
+
+
+class HashingWriter(io.RawIOBase):
+    # Binary stream that checksums, counts and rate limits everything written to the underlying file
+    def __init__(self, file, limiter):
+        self.file = file
+        self.limiter = limiter
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.limiter.consume(len(data))
+        self.sha256.update(data)
+        self.bytes += len(data)
+        return self.file.write(data)
+
+
+class DirectoryBackupStore:
+    # Archives written under a local or mounted directory as <table>/<partition>.csv.gz
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def location(self, name):
+        return os.path.join(self.root, name)
+
+    def open(self, name):
+        path = self.location(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return open(path + '.part', 'wb')
+
+    def commit(self, name, file, sha256):
+        # Moves a finished archive into place, with a sha256sum-compatible checksum file next to it
+        file.close()
+        path = self.location(name)
+        os.replace(path + '.part', path)
+        with open(path + '.sha256', 'w') as checksum_file:
+            checksum_file.write(f"{sha256}  {os.path.basename(path)}\n")
+        return path
+
+    def put_text(self, name, text):
+        with open(self.location(name), 'w') as file:
+            file.write(text)
+
+
+class ObjectStorageBackupStore:
+    # Archives uploaded to an OCI Object Storage bucket (oci://<bucket>/<prefix>). Each archive is spooled to a
+    # temporary file and sent with a parallel multipart upload, so memory use does not grow with partition size.
+    def __init__(self, bucket, prefix='', config_file=None, profile=None):
+        import oci
+        config = oci.config.from_file(config_file or oci.config.DEFAULT_LOCATION, profile or oci.config.DEFAULT_PROFILE)
+        self.client = oci.object_storage.ObjectStorageClient(config)
+        self.namespace = os.environ.get('BACKUP_NAMESPACE') or self.client.get_namespace().data
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.upload_manager = oci.object_storage.UploadManager(self.client, allow_parallel_uploads=True)
+
+    def object_name(self, name):
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def location(self, name):
+        return f"oci://{self.bucket}/{self.object_name(name)}"
+
+    def open(self, name):
+        return tempfile.NamedTemporaryFile(suffix='.csv.gz', delete=False)
+
+    def commit(self, name, file, sha256):
+        file.close()
+        try:
+            self.upload_manager.upload_file(self.namespace, self.bucket, self.object_name(name), file.name,
+                                            metadata={'sha256': sha256})
+        finally:
+            os.remove(file.name)
+        return self.location(name)
+
+    def put_text(self, name, text):
+        self.client.put_object(self.namespace, self.bucket, self.object_name(name), text.encode())
+
+
+def get_backup_store(target):
+    # oci://<bucket>/<prefix> selects Object Storage, anything else is a directory
+    if target.startswith('oci://'):
+        bucket, _, prefix = target[len('oci://'):].partition('/')
+        return ObjectStorageBackupStore(bucket, prefix)
+    return DirectoryBackupStore(target)
+
+
+def staging_table_name(table_name, partition):
+    return f"BKP_{table_name.upper()}_{partition}"[:128]
+
+
+def get_staging_table(db, owner, table_name, partition):
+    # Returns the partition's staging table if an exchange backup created one, or None
+    staging_table = staging_table_name(table_name, partition)
+    if db.query("SELECT 1 FROM dba_tables WHERE owner = :owner AND table_name = :table_name",
+                owner=owner, table_name=staging_table):
+        return staging_table
+    return None
+
+
+def exchange_partition(db, owner, table_name, partition, tablespace=None):
+    # Swaps the partition's segment into an empty staging table. The rows stay in the database under the
+    # staging table, and the partition left behind is empty, so dropping it later is a metadata operation.
+    # An exchange swaps segments without moving them, so the staging table is then moved into the backup
+    # tablespace; otherwise it would keep the partition's tablespace from being dropped after the purge.
+    # A staging table left by an interrupted run is reused, and the exchange is skipped if it already happened.
+    staging_table = get_staging_table(db, owner, table_name, partition)
+    if not staging_table:
+        staging_table = staging_table_name(table_name, partition)
+        tablespace_clause = f" TABLESPACE {tablespace}" if tablespace else ""
+        db.execute(f"CREATE TABLE {owner}.{staging_table}{tablespace_clause} FOR EXCHANGE WITH TABLE {owner}.{table_name.upper()}")
+        exchanged = False
+    else:
+        exchanged = not db.query(f"SELECT 1 FROM {owner}.{table_name.upper()} PARTITION ({partition}) WHERE ROWNUM = 1")
+    if not exchanged:
+        db.execute(f"ALTER TABLE {owner}.{table_name.upper()} EXCHANGE PARTITION {partition} WITH TABLE {owner}.{staging_table} "
+                   "WITHOUT VALIDATION UPDATE GLOBAL INDEXES")
+    if tablespace and db.query("SELECT 1 FROM dba_segments WHERE owner = :owner AND segment_name = :segment_name AND tablespace_name <> :tablespace_name",
+                               owner=owner, segment_name=staging_table, tablespace_name=tablespace):
+        db.execute(f"ALTER TABLE {owner}.{staging_table} MOVE TABLESPACE {tablespace}")
+    return staging_table
+
+
+def export_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'read'):
+        value = value.read()
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def export_rows(db, source_query, store, name, limiter):
+    # Streams the query result into a gzip CSV in the store without holding more than one fetch in memory
+    file = store.open(name)
+    writer = HashingWriter(file, limiter)
+    rows = 0
+    try:
+        with db.stream(source_query) as result, \
+                gzip.GzipFile(fileobj=writer, mode='wb') as compressed, \
+                io.TextIOWrapper(compressed, encoding='utf-8', newline='') as text:
+            csv_writer = csv.writer(text)
+            csv_writer.writerow([column.upper() for column in result.columns])
+            for row in result:
+                csv_writer.writerow([export_value(value) for value in row])
+                rows += 1
+    except Exception:
+        file.close()
+        if os.path.exists(file.name):
+            os.remove(file.name)
+        raise
+    location = store.commit(name, file, writer.sha256.hexdigest())
+    return {'location': location, 'rows': rows, 'bytes': writer.bytes, 'sha256': writer.sha256.hexdigest()}
+
+
+def backup_partition(db, owner, table_name, partition, store, limiter, method='export', tablespace=None):
+    # Archives one partition and returns its manifest entry. tablespace is where exchanged rows are kept
+    started = time.monotonic()
+    entry = {'table_name': table_name, 'partition_name': partition, 'method': method}
+    source = f"{owner}.{table_name.upper()} PARTITION ({partition})"
+    if method in ('exchange', 'both'):
+        entry['staging_table'] = exchange_partition(db, owner, table_name, partition, tablespace)
+        source = f"{owner}.{entry['staging_table']}"
+    if method in ('export', 'both'):
+        entry.update(export_rows(db, f"SELECT * FROM {source}", store, f"{table_name.upper()}/{partition}.csv.gz", limiter))
+    entry['seconds'] = round(time.monotonic() - started, 1)
+    return entry
+
+
+def write_manifest(store, entries):
+    name = f"backup_manifest_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    store.put_text(name, json.dumps(entries, indent=2))
+    return store.location(name)
@@ -0,0 +1,98 @@
+import datetime
+import json
+import sqlite3
+
+# Purge plan and journal for Identify_purge_DB_table.py.
+# identify_partitions_to_purge writes a versioned plan file that verify and purge runs consume instead of
+# querying the catalog again. Purge runs record every completed partition and tablespace drop in a local
+# SQLite journal, so a rerun after a failure skips the work that already finished. Partition backups are
+# journaled the same way, with their archive location and checksum.
+
+PLAN_VERSION = 1
+
+
+def write_plan(filename, instance_name, owner, tables):
+    # tables: {table_name: {"retention_date": "YYYY-MM-DD", "partitions": [{partition_name, tablespace_name, bytes, high_value}]}}
+    plan = {
+        "version": PLAN_VERSION,
+        "created_at": datetime.datetime.now().isoformat(timespec='seconds'),
+        "instance": instance_name,
+        "owner": owner,
+        "tables": tables
+    }
+    with open(filename, 'w') as file:
+        json.dump(plan, file, indent=2)
+    return filename
+
+
+def read_plan(filename, instance_name=None):
+    # Returns {table_name: [partition_name, ...]} in plan order
+    with open(filename) as file:
+        plan = json.load(file)
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError(f"Plan {filename} has version {plan.get('version')}, expected {PLAN_VERSION}. Run identify_partitions_to_purge again.")
+    if instance_name and plan.get("instance") != instance_name:
+        raise ValueError(f"Plan {filename} was created on instance {plan.get('instance')}, not {instance_name}.")
+    return {table_name: [partition["partition_name"] for partition in table["partitions"]]
+            for table_name, table in plan["tables"].items()}
+
+
+class PurgeJournal:
+    # Completed partition backups, partition drops and tablespace drops, committed as each one finishes
+    def __init__(self, filename):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.executescript("""
+        CREATE TABLE IF NOT EXISTS dropped_partitions (
+            table_name TEXT NOT NULL,
+            partition_name TEXT NOT NULL,
+            dropped_at TEXT NOT NULL,
+            PRIMARY KEY (table_name, partition_name)
+        );
+        CREATE TABLE IF NOT EXISTS partition_backups (
+            table_name TEXT NOT NULL,
+            partition_name TEXT NOT NULL,
+            method TEXT NOT NULL,
+            location TEXT,
+            sha256 TEXT,
+            backed_up_at TEXT NOT NULL,
+            PRIMARY KEY (table_name, partition_name)
+        );
+        CREATE TABLE IF NOT EXISTS dropped_tablespaces (
+            tablespace_name TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            dropped_at TEXT NOT NULL
+        );
+        """)
+
+    def dropped_partitions(self, table_name):
+        rows = self.connection.execute("SELECT partition_name FROM dropped_partitions WHERE table_name = ?", (table_name.upper(),))
+        return {partition_name for (partition_name,) in rows}
+
+    def backed_up_partitions(self, table_name):
+        rows = self.connection.execute("SELECT partition_name FROM partition_backups WHERE table_name = ?", (table_name.upper(),))
+        return {partition_name for (partition_name,) in rows}
+
+    def tablespace_dropped(self, tablespace_name):
+        row = self.connection.execute("SELECT 1 FROM dropped_tablespaces WHERE tablespace_name = ?", (tablespace_name,)).fetchone()
+        return row is not None
+
+    def record_partition_drops(self, table_name, partition_names):
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO dropped_partitions VALUES (?, ?, ?)",
+                                        [(table_name.upper(), partition_name, now) for partition_name in partition_names])
+
+    def record_backup(self, table_name, partition_name, method, location=None, sha256=None):
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO partition_backups VALUES (?, ?, ?, ?, ?, ?)",
+                                    (table_name.upper(), partition_name, method, location, sha256, now))
+
+    def record_tablespace_drop(self, tablespace_name, table_name):
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO dropped_tablespaces VALUES (?, ?, ?)", (tablespace_name, table_name.upper(), now))
+
+    def close(self):
+        self.connection.close()
@@ -1,6 +1,10 @@
 import oci
+import os
 import time
 
+import inventory_snapshot
+from pagination import list_all
+
 source_region = 'us-phoenix-1'
 target_region = 'us-ashburn-1'
 
@@ -9,31 +13,40 @@ config = oci.config.from_file("~/.oci/config")
 core_client = oci.core.ComputeClient(config)
 source_client = oci.core.BlockstorageClient(config)
 target_client = oci.core.BlockstorageClient(config, region=target_region)
-list_instances_response=[]
 list_boot_volume_attachments_response=[]
-# Get the list of instances in the source region
-list_instances_response = core_client.list_instances(
-    compartment_id="ocid1.compartment.oc1..aaaaaaaagxzb3ytnmfjiggqby36pjhrcn35kcp5eea4xlgtwv26e73b7rl2q"
-    )
-for item in list_instances_response.data:
+# Get the list of instances in the source region from the shared inventory snapshot, or a live list_instances
+# sweep when no snapshot newer than INVENTORY_MAX_AGE_SECONDS is stored. The sweep is not written back.
+compartment_id = "ocid1.compartment.oc1..aaaaaaaagxzb3ytnmfjiggqby36pjhrcn35kcp5eea4xlgtwv26e73b7rl2q"
+snapshot_store = None
+if inventory_snapshot.snapshot_configured():
+    snapshot_store = inventory_snapshot.SnapshotStore(oci.object_storage.ObjectStorageClient(config))
+instances = inventory_snapshot.get_section(
+    compartment_id, "instances",
+    lambda previous: inventory_snapshot.refresh_instances(core_client, None, compartment_id, resolve_ips=False),
+    snapshot_store, ttl=int(os.environ.get("INVENTORY_MAX_AGE_SECONDS", "3600")), save=False
+    )["instances"]
+for instance_id, item in instances.items():
     # Get the list of boot volume attachments for the instance
-    boot_volume_attachments_response = core_client.list_boot_volume_attachments(
-        availability_domain=item.availability_domain,
-        compartment_id=item.compartment_id,
-        instance_id= item.id
+    boot_volume_attachments = list_all(
+        core_client.list_boot_volume_attachments,
+        availability_domain=item["availability_domain"],
+        compartment_id=item["compartment_id"],
+        instance_id= instance_id
     )
-    list_boot_volume_attachments_response.append(boot_volume_attachments_response.data[0])
+    boot_volume_attachment = next(boot_volume_attachments, None)
+    if boot_volume_attachment:
+        list_boot_volume_attachments_response.append(boot_volume_attachment)
 
 # Get the latest boot volume backup for the VM
 backup_details=[]
 for item in list_boot_volume_attachments_response:
-    backups = source_client.list_boot_volume_backups(compartment_id=item.compartment_id,boot_volume_id=item.boot_volume_id,sort_by='TIMECREATED',sort_order='DESC')
-    if backups.data:
-        for backup in backups.data:
-            if backup.type == "FULL":
-                backup_details.append(backup)
-                # Since we are interested in the latest FULL backup, we break the loop
-                break
+    # Backups are streamed newest first, so later pages are only fetched until a FULL backup is found
+    backups = list_all(source_client.list_boot_volume_backups, compartment_id=item.compartment_id,boot_volume_id=item.boot_volume_id,sort_by='TIMECREATED',sort_order='DESC')
+    for backup in backups:
+        if backup.type == "FULL":
+            backup_details.append(backup)
+            # Since we are interested in the latest FULL backup, we break the loop
+            break
 # Create the copy request
 copy_details = oci.core.models.CopyBootVolumeBackupDetails(destination_region=target_region)
 for item in backup_details:
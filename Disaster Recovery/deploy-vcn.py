@@ -1,6 +1,8 @@
 import oci
 import json
 
+from pagination import list_all
+
 # Authenticate to the OCI using an API signing key
 config = oci.config.from_file(
     file_location="~/.oci/config",
@@ -21,19 +23,19 @@ source_internet_gateways= []
 source_drgs=[]
 source_nat_gateways=[]
 source_service_gateways=[]
-for source_security_list in source_network_client.list_security_lists(compartment_id=vcn_compartment_id,vcn_id=vcn_id).data:
+for source_security_list in list_all(source_network_client.list_security_lists, compartment_id=vcn_compartment_id,vcn_id=vcn_id):
     source_security_lists.append(source_security_list)
-for source_subnet in source_network_client.list_subnets(compartment_id=vcn_compartment_id,vcn_id=vcn_id).data:
+for source_subnet in list_all(source_network_client.list_subnets, compartment_id=vcn_compartment_id,vcn_id=vcn_id):
     source_subnets.append(source_subnet)
-for source_route_table in source_network_client.list_route_tables(compartment_id=vcn_compartment_id,vcn_id=vcn_id).data:
+for source_route_table in list_all(source_network_client.list_route_tables, compartment_id=vcn_compartment_id,vcn_id=vcn_id):
     source_route_tables.append(source_route_table)
-for source_internet_gateway in source_network_client.list_internet_gateways(compartment_id=vcn_compartment_id,vcn_id=vcn_id).data:
+for source_internet_gateway in list_all(source_network_client.list_internet_gateways, compartment_id=vcn_compartment_id,vcn_id=vcn_id):
     source_internet_gateways.append(source_internet_gateway)
-for source_drg in source_network_client.list_drgs(compartment_id=vcn_compartment_id).data:
+for source_drg in list_all(source_network_client.list_drgs, compartment_id=vcn_compartment_id):
     source_drgs.append(source_drg)
-for source_nat_gateway in source_network_client.list_nat_gateways(compartment_id=vcn_compartment_id,vcn_id=vcn_id).data:
+for source_nat_gateway in list_all(source_network_client.list_nat_gateways, compartment_id=vcn_compartment_id,vcn_id=vcn_id):
     source_nat_gateways.append(source_nat_gateway)
-for source_service_gateway in source_network_client.list_service_gateways(compartment_id=vcn_compartment_id,vcn_id=vcn_id).data:
+for source_service_gateway in list_all(source_network_client.list_service_gateways, compartment_id=vcn_compartment_id,vcn_id=vcn_id):
     source_service_gateways.append(source_service_gateway)
 
 
@@ -178,7 +180,7 @@ for service_gateway in source_service_gateways:
                 compartment_id=new_vcn.compartment_id,
                 vcn_id=new_vcn.id,
                 display_name=service_gateway.display_name,
-                services=service_gateway.service_id
+                services=service_gateway.service_id,
                 route_table_id=service_gateway.route_table_id
             )
         ).data
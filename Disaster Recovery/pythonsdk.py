@@ -7,6 +7,8 @@
 from datetime import datetime
 import oci
 
+from pagination import list_all
+
 # Create a default config using DEFAULT profile in default location
 # Refer to
 # https://docs.cloud.oracle.com/en-us/iaas/Content/API/Concepts/sdkconfig.htm#SDK_and_CLI_Configuration_File
@@ -28,7 +30,7 @@ core_client = oci.core.ComputeClient(config)
 #             is_monitoring_disabled=True,
 #             is_management_disabled=True)
 #    )
-instances= oci.core_client.ComputeClient.list_instances(compartment_id="ocid1.compartment.oc1..aaaaaaaal4bxhzyfx7srmxl2s6p7nyqvxi5wwg42lq23i3ue3utj5aumevqq")
+instances= list(list_all(core_client.list_instances, compartment_id="ocid1.compartment.oc1..aaaaaaaal4bxhzyfx7srmxl2s6p7nyqvxi5wwg42lq23i3ue3utj5aumevqq"))
 update_instance_response = core_client.update_instance(
     instance_id="ocid1.instance.oc1.phx.anyhqljsbzarz4ycbxqifr2rlsa5pbujwx2mxl2cosjr27u73tlh5xjmaopa",
     update_instance_details=oci.core.models.UpdateInstanceDetails(
@@ -11,20 +11,46 @@
 
 import io
 import json
-import oci
+import importlib
 import logging
 import os
 from datetime import datetime, timedelta 
 import base64
-import requests
-from oci.resource_scheduler import ScheduleClient
 import time
 from concurrent.futures import ThreadPoolExecutor
 from fdk import response
 
+import inventory_snapshot
+import notification_digest
+from pagination import list_all
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
+# Keep oci/__init__ from importing every service package; LazyModule imports the ones a code path uses
+os.environ.setdefault("OCI_PYTHON_SDK_NO_SERVICE_IMPORTS", "true")
+
+class LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access.
+    Sub-packages that the parent does not import itself (e.g. oci.core) are imported on first use,
+    so a cold start only loads the SDK service modules the invoked code path needs.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        try:
+            return getattr(self._module, attr)
+        except AttributeError:
+            return importlib.import_module(f"{self._name}.{attr}")
+
+oci = LazyModule("oci")
+requests = LazyModule("requests")
+
 def log_it(msg, log_type="INFO", context=""):
     """
     Centralized logging function with consistent formatting.
@@ -54,10 +80,16 @@ def log_it(msg, log_type="INFO", context=""):
     if log_type != "DEBUG":
         print(formatted_msg)
 
+signer = None
+
 def get_signer():
     """
     Get OCI signer for authentication.
+    The signer is created on first use and reused by warm invocations, so importing the function stays cheap.
     """
+    global signer
+    if signer is not None:
+        return signer
     try:
         signer = oci.auth.signers.get_resource_principals_signer()
         #signer = oci.auth.signers.InstancePrincipalsSecurityTokenSigner() # for local in jenkins
@@ -68,8 +100,24 @@ def get_signer():
         log_it(f"Failed to initialize OCI signer: {str(e)}", "ERROR", "AUTH")
         raise
 
+private_ip_cache = {}  # Warm invocations reuse the IPs resolved outside the inventory snapshot
+
+def get_instance_inventory(compartment_id, max_age_seconds=None):
+    """
+    Returns the instances section of the inventory for a compartment (see inventory_snapshot.py).
+    With INVENTORY_BUCKET the section is shared with the other functions and carries VNIC IPs.
+    Without it only list_instances runs, and get_private_ip resolves IPs for the instances it is asked about.
+    """
+    store = None
+    if inventory_snapshot.snapshot_configured():
+        store = inventory_snapshot.SnapshotStore(oci.object_storage.ObjectStorageClient(config={}, signer=get_signer()))
+
+    def refresh(previous):
+        compute_client = oci.core.ComputeClient(config={}, signer=get_signer())
+        network_client = oci.core.VirtualNetworkClient(config={}, signer=get_signer())
+        return inventory_snapshot.refresh_instances(compute_client, network_client, compartment_id, previous, resolve_ips=store is not None)
 
-signer=get_signer()
+    return inventory_snapshot.get_section(compartment_id, "instances", refresh, store, max_age_seconds)
 
 def get_private_ip(instance_id, compartment_id_instance):
     """
@@ -79,15 +127,23 @@ def get_private_ip(instance_id, compartment_id_instance):
     :return: Private IP address of the instance
     """
     try:
+        # Serve the IP from the inventory snapshot; only instances it does not cover need the API
+        private_ip = inventory_snapshot.get_primary_ip(get_instance_inventory(compartment_id_instance)["instances"].get(instance_id))
+        if private_ip:
+            return private_ip
+        if instance_id in private_ip_cache:
+            return private_ip_cache[instance_id]
+
         # Instantiate the necessary OCI clients
-        compute_client = oci.core.ComputeClient(config={},signer=signer)
-        network_client = oci.core.VirtualNetworkClient(config={},signer=signer)
+        compute_client = oci.core.ComputeClient(config={},signer=get_signer())
+        network_client = oci.core.VirtualNetworkClient(config={},signer=get_signer())
         
         # List the VNIC attachments to get the VNIC ID of the instance
-        attachments = compute_client.list_vnic_attachments(
+        attachments = list(list_all(
+            compute_client.list_vnic_attachments,
             compartment_id=compartment_id_instance,
             instance_id=instance_id
-        ).data
+        ))
         
         # Handle case if no VNICs are found
         if not attachments:
@@ -95,6 +151,7 @@ def get_private_ip(instance_id, compartment_id_instance):
         
         # Fetch the private IP of the instance from its VNIC
         vnic = network_client.get_vnic(attachments[0].vnic_id).data
+        private_ip_cache[instance_id] = vnic.private_ip
         return vnic.private_ip
     
     except oci.exceptions.ServiceError as e:
@@ -138,7 +195,7 @@ def add_instance_to_lb(lb_id, backend_set_name, instance_id, compartment_id_inst
     
     try:
         # Initialize the Load Balancer client
-        lb_client = oci.load_balancer.LoadBalancerClient(config={},signer=signer)
+        lb_client = oci.load_balancer.LoadBalancerClient(config={},signer=get_signer())
         # Get the instance's private IP using the correct compartment ID for the instance
         private_ip = get_private_ip(instance_id, compartment_id_instance)
         # Check if the instance is already added to the backend set
@@ -173,16 +230,15 @@ def add_instance_to_lb(lb_id, backend_set_name, instance_id, compartment_id_inst
 def get_vm_names_and_ids_by_tags(comp_id, freeform_tag_filters={}):
     """Returns VM names and OCIDs for VMs matching the provided tags."""
     try:
-        compute_client = oci.core.ComputeClient(config={},signer=signer)
         matched = []
-        instances = compute_client.list_instances(compartment_id=comp_id).data
-        for instance in instances:
-            freeform_tags = instance.freeform_tags or {}
+        instances = get_instance_inventory(comp_id)["instances"]
+        for instance_id, instance in instances.items():
+            freeform_tags = instance.get("tags") or {}
             # Check if the instance matches the tag filters
             if all(freeform_tags.get(k) == v or v == "*" for k, v in freeform_tag_filters.items()):
                 matched.append({
-                    "name": instance.display_name,
-                    "ocid": instance.id,
+                    "name": instance["name"],
+                    "ocid": instance_id,
                     "port": freeform_tags.get("auto-scale-port"),
                     "backend": freeform_tags.get("auto-scale-backend"),
                     "lb_ocid": freeform_tags.get("auto-scale-lb-ocid"),
@@ -203,7 +259,7 @@ def start_stop_vm(instance_id, instance_name, action):
     """
     action = action.upper()
     try:
-        compute_client = oci.core.ComputeClient(config={}, signer=signer)
+        compute_client = oci.core.ComputeClient(config={}, signer=get_signer())
         instance = compute_client.get_instance(instance_id).data
         pre_status = instance.lifecycle_state
         if action == "START" and pre_status != "RUNNING":
@@ -303,6 +359,25 @@ def send_email(signer, topic_id, email_body=None, subject=""):
     except Exception as ex:
         log_it(f"Failed to send email notification: {str(ex)}", "ERROR", "EMAIL")
 
+def notify(signer, topic_id, environment, email_body, subject, critical=False):
+    """
+    Publishes a report through the notification digest (see notification_digest.py).
+    Critical reports are sent immediately. Other reports are grouped per environment in the NoSQL table
+    named by NOTIFICATION_TABLE_NAME into NOTIFICATION_DIGEST_MINUTES windows, so alarm storms do not hit
+    ONS throttling. Without a notification table every report is sent immediately.
+    """
+    table_name = os.environ.get("NOTIFICATION_TABLE_NAME")
+    compartment_id = os.environ.get("NOTIFICATION_TABLE_COMPARTMENT_OCID", os.environ.get("TABLE_COMPARTMENT_OCID"))
+
+    def send(body, title):
+        send_email(signer=signer, topic_id=topic_id, email_body=body, subject=title)
+
+    if critical or not table_name or not compartment_id:
+        send(email_body, subject)
+        return
+    nosql_client = oci.nosql.NosqlClient(config={}, signer=signer)
+    notification_digest.notify(nosql_client, table_name, compartment_id, environment, email_body, subject, send)
+
 def get_secret(secret_id):
     """
     Retrieves a secret from OCI Vault.
@@ -313,7 +388,7 @@ def get_secret(secret_id):
         if not secret_id:
             raise ValueError("Secret ID cannot be empty")
         
-        secrets_client = oci.secrets.SecretsClient(config={}, signer=signer)
+        secrets_client = oci.secrets.SecretsClient(config={}, signer=get_signer())
         secret_bundle = secrets_client.get_secret_bundle(secret_id).data
         secret_content = base64.b64decode(secret_bundle.secret_bundle_content.content).decode("utf-8")
         return secret_content
@@ -392,29 +467,57 @@ def check_existing_schedule(resource_scheduler_client, schedule_id):
         log_it(f"Failed to check schedule {schedule_id}: {str(e)}", "ERROR", "SCHEDULER")
         return False
 
-def schedule_follow_up(auto_scale_env, lb_id, compartment_id, function_id, schedule_id=None):
+def schedule_follow_up(auto_scale_env, lb_id, compartment_id, function_id, schedule_id=None, backends=None):
     """
-    Schedule a one-time follow-up function to check the load balancer's health after 15 minutes.
+    Schedule a one-time follow-up function that watches the load balancer until the new backends are healthy.
+    The check starts HEALTH_WATCH_DELAY_MINUTES after scale-up (default 2) in watch mode, so it stops as soon as
+    every new backend is OK and escalates if any backend stays unhealthy past its deadline.
     If schedule_id is provided, updates the existing schedule; otherwise creates a new one.
+    :param backends: Backend names (ip:port) added by this scale-up; the watch covers all backends when omitted
     """
     try:
         # Initialize the Resource Scheduler client
-        resource_scheduler_client = oci.resource_scheduler.ScheduleClient(config={}, signer=signer)
-        # Calculate the time 15 minutes from now
+        resource_scheduler_client = oci.resource_scheduler.ScheduleClient(config={}, signer=get_signer())
+        # Calculate the time the watch starts
         current_time = datetime.utcnow()
-        scheduled_time = current_time + timedelta(minutes=15)
+        scheduled_time = current_time + timedelta(minutes=float(os.environ.get("HEALTH_WATCH_DELAY_MINUTES", "2")))
+        follow_up_body = {
+            "auto_scale_env": auto_scale_env,
+            "lb_id": lb_id,
+            "compartment_id": compartment_id,
+            "mode": "watch",
+            "backends": backends or [],
+            "scaled_at": current_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+        }
+        resources = [
+            oci.resource_scheduler.models.Resource(
+                id=function_id, 
+                metadata={
+                    "auto_scale_env": auto_scale_env,
+                    "lb_id": lb_id,
+                    "compartment_id": compartment_id
+                },
+                parameters=[
+                    oci.resource_scheduler.models.BodyParameter(
+                        parameter_type="BODY",
+                        value=json.dumps(follow_up_body)
+                    )
+                ],
+            )
+        ]
         # Check if we should update an existing schedule or create a new one
         if schedule_id and check_existing_schedule(resource_scheduler_client, schedule_id):
-            # Update existing schedule
+            # Update existing schedule, including the payload so the watch covers this scale-up's backends
             log_it(f"Updating existing schedule {schedule_id} with new schedule time", "INFO", "SCHEDULER")
             update_schedule_response = resource_scheduler_client.update_schedule(
                 schedule_id=schedule_id,
                 update_schedule_details=oci.resource_scheduler.models.UpdateScheduleDetails(
                     display_name="Check Load Balancer Health",
-                    description="Follow-up to check the health of the load balancer",
+                    description="Follow-up to watch the health of the load balancer",
                     action="START_RESOURCE",
                     recurrence_details="FREQ=DAILY;COUNT=1",
                     recurrence_type="ICAL",
+                    resources=resources,
                     time_starts=scheduled_time.strftime("%Y-%m-%dT%H:%M:%SZ")
                 )
             )
@@ -428,27 +531,8 @@ def schedule_follow_up(auto_scale_env, lb_id, compartment_id, function_id, sched
                 recurrence_type="ICAL",  # Use ICAL for iCalendar format
                 recurrence_details="FREQ=DAILY;COUNT=1",  # One-time schedule
                 display_name="Check Load Balancer Health",
-                description="Follow-up to check the health of the load balancer",
-                resources=[
-                    oci.resource_scheduler.models.Resource(
-                        id=function_id, 
-                        metadata={
-                            "auto_scale_env": auto_scale_env,
-                            "lb_id": lb_id,
-                            "compartment_id": compartment_id
-                        },
-                        parameters=[
-                            oci.resource_scheduler.models.BodyParameter(
-                                parameter_type="BODY",
-                                value=json.dumps({
-                                    "auto_scale_env": auto_scale_env,
-                                    "lb_id": lb_id,
-                                    "compartment_id": compartment_id,
-                                })
-                            )
-                        ],
-                    )
-                ],
+                description="Follow-up to watch the health of the load balancer",
+                resources=resources,
                 time_starts=scheduled_time.strftime("%Y-%m-%dT%H:%M:%SZ")
             )   
             # Create the schedule
@@ -612,7 +696,7 @@ def run_command_on_vm(instance_id, compartment_id, command_content, timeout=240,
     :return: True if the command executes successfully, False otherwise
     """
     try:
-        compute_instance_agent_client = oci.compute_instance_agent.ComputeInstanceAgentClient(config={}, signer=signer)
+        compute_instance_agent_client = oci.compute_instance_agent.ComputeInstanceAgentClient(config={}, signer=get_signer())
         create_instance_agent_command_response = compute_instance_agent_client.create_instance_agent_command(
             create_instance_agent_command_details=oci.compute_instance_agent.models.CreateInstanceAgentCommandDetails(
                 compartment_id=compartment_id,
@@ -664,8 +748,8 @@ def scale_down_vm(vm, compartment_id):
             error_msg = f"VM missing required properties: {', '.join(missing_props)}"
             return {"vm_name": vm.get('name', 'Unknown'), "status": "failure", "reason": error_msg}
         
-        lb_client = oci.load_balancer.LoadBalancerClient(config={}, signer=signer)
-        compute_client = oci.core.ComputeClient(config={}, signer=signer)
+        lb_client = oci.load_balancer.LoadBalancerClient(config={}, signer=get_signer())
+        compute_client = oci.core.ComputeClient(config={}, signer=get_signer())
         # Check VM state
         instance = compute_client.get_instance(vm['ocid']).data
         if instance.lifecycle_state == "STOPPED":
@@ -767,19 +851,602 @@ def get_last_scale_action(nosql_client, table_name, environment, stage, compartm
         log_it(f"Failed to query last scale action: {str(e)}", "ERROR", "NOSQL")
         return None
 
-def handler(ctx, data: io.BytesIO = None):
-    logs = []
+def parse_stage_thresholds(env_name, default=""):
+    """
+    Parses a comma separated list of per-stage thresholds from an environment variable.
+    The n-th threshold is the metric level at which stage n is required (see stage_for_value).
+    :param env_name: Name of the environment variable
+    :param default: Value used when the environment variable is not set
+    :return: List of thresholds as floats, in ascending order
+    """
+    raw_value = os.environ.get(env_name, default) or ""
+    thresholds = []
+    for item in raw_value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            thresholds.append(float(item))
+        except ValueError:
+            log_it(f"Ignoring invalid threshold '{item}' in {env_name}", "WARN", "STAGE_SELECTION")
+    return sorted(thresholds)
+
+def stage_for_value(value, thresholds):
+    """
+    Maps a metric value to the stage it requires, i.e. the number of thresholds it reaches:
+    below the first threshold is stage 0, at or above the n-th threshold is stage n.
+    """
+    if value is None or not thresholds:
+        return 0
+    return sum(1 for threshold in thresholds if value >= threshold)
+
+def get_alarm_metric_peak(alarm_payload):
+    """
+    Returns the highest metric value reported in the alarm payload, or None if the payload carries no metric values.
+    """
+    peak = None
+    if not alarm_payload:
+        return peak
+    for alarm_meta in alarm_payload.get("alarmMetaData") or []:
+        for metric_value in alarm_meta.get("metricValues") or []:
+            for value in metric_value.values():
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    continue
+                peak = value if peak is None else max(peak, value)
+    return peak
+
+def get_lb_metric_peak(lb_id, compartment_id, metric_name, window_minutes=5):
+    """
+    Returns the highest one-minute mean of a load balancer metric over the last window_minutes, or None.
+    :param lb_id: OCID of the load balancer
+    :param compartment_id: OCID of the compartment containing the load balancer
+    :param metric_name: Metric in the oci_lbaas namespace (e.g. ActiveConnections, HttpRequests)
+    :param window_minutes: Look-back window in minutes
+    """
+    try:
+        if not all([lb_id, compartment_id, metric_name]):
+            return None
+        monitoring_client = oci.monitoring.MonitoringClient(config={}, signer=get_signer())
+        end_time = datetime.utcnow()
+        start_time = end_time - timedelta(minutes=window_minutes)
+        metric_data = monitoring_client.summarize_metrics_data(
+            compartment_id=compartment_id,
+            summarize_metrics_data_details=oci.monitoring.models.SummarizeMetricsDataDetails(
+                namespace="oci_lbaas",
+                query=f'{metric_name}[1m]{{resourceId = "{lb_id}"}}.mean()',
+                start_time=start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                end_time=end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+            )
+        ).data
+        values = [point.value for metric in metric_data for point in metric.aggregated_datapoints or []]
+        return max(values) if values else None
+    except oci.exceptions.ServiceError as e:
+        log_it(f"OCI Service Error while reading {metric_name} for load balancer {lb_id}: {str(e)}", "ERROR", "STAGE_SELECTION")
+        return None
+    except Exception as e:
+        log_it(f"Failed to read {metric_name} for load balancer {lb_id}: {str(e)}", "ERROR", "STAGE_SELECTION")
+        return None
+
+def get_weblogic_pending_requests(weblogic_host, username, password):
+    """
+    Returns the average number of pending user requests per RUNNING WebLogic server, or None.
+    Uses a single bulk search on the domain runtime instead of one call per server.
+    """
+    try:
+        if not all([weblogic_host, username, password]):
+            return None
+        url = f"https://{weblogic_host}/management/weblogic/latest/domainRuntime/search"
+        headers = {
+            "Authorization": "Basic " + base64.b64encode(f"{username}:{password}".encode()).decode(),
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+            "X-Requested-By": "auto-scale"
+        }
+        query = {
+            "links": [],
+            "fields": [],
+            "children": {
+                "serverRuntimes": {
+                    "links": [],
+                    "fields": ["name", "state"],
+                    "children": {
+                        "threadPoolRuntime": {"links": [], "fields": ["pendingUserRequestCount"]}
+                    }
+                }
+            }
+        }
+        response = requests.post(url, headers=headers, json=query, timeout=10, verify=False)
+        if response.status_code != 200:
+            log_it(f"Failed to fetch WebLogic thread pool metrics. HTTP Status: {response.status_code}", "ERROR", "STAGE_SELECTION")
+            return None
+        pending = [
+            (server.get("threadPoolRuntime") or {}).get("pendingUserRequestCount", 0)
+            for server in response.json().get("serverRuntimes", {}).get("items", [])
+            if str(server.get("state", "")).upper() == "RUNNING"
+        ]
+        return sum(pending) / len(pending) if pending else None
+    except requests.exceptions.RequestException as e:
+        log_it(f"Network error while reading WebLogic thread pool metrics: {str(e)}", "ERROR", "STAGE_SELECTION")
+        return None
+    except Exception as e:
+        log_it(f"Exception occurred while reading WebLogic thread pool metrics: {str(e)}", "ERROR", "STAGE_SELECTION")
+        return None
+
+def select_target_stage(alarm_payload, action, requested_stage, max_stages, auto_scale_env, compartment_id, weblogic_host, username, password):
+    """
+    Computes the stage the environment should be at from the alarm payload plus recent LB and WebLogic metrics.
+    Every signal is mapped to a stage through its thresholds and the highest stage wins, so a sudden surge
+    jumps straight to the stage it needs instead of stepping up one alarm at a time.
+    :return: (target_stage, signals) where signals holds the observed values and the stage each one asked for
+    """
+    window_minutes = int(os.environ.get("STAGE_METRIC_WINDOW_MINUTES", "5"))
+    lb_metric_name = os.environ.get("STAGE_LB_METRIC", "ActiveConnections")
+    lb_id = os.environ.get("AUTO_SCALE_LB_OCID")
+    if not lb_id:
+        # Fall back to the load balancer the base stage VMs are tagged with
+        base_vms = get_vm_names_and_ids_by_tags(compartment_id, {"auto-scale": "enabled", "auto-scale-env": auto_scale_env, "auto-scale-stage": "1"})
+        lb_id = next((vm["lb_ocid"] for vm in base_vms if vm.get("lb_ocid")), None)
+    lb_compartment_id = os.environ.get("AUTO_SCALE_LB_COMPARTMENT_OCID", compartment_id)
+
+    signals = {
+        "alarm": get_alarm_metric_peak(alarm_payload),
+        "lb": get_lb_metric_peak(lb_id, lb_compartment_id, lb_metric_name, window_minutes),
+        "weblogic": get_weblogic_pending_requests(weblogic_host, username, password)
+    }
+    thresholds = {
+        "alarm": parse_stage_thresholds("STAGE_ALARM_THRESHOLDS", "60,75,90"),
+        "lb": parse_stage_thresholds("STAGE_LB_THRESHOLDS"),
+        "weblogic": parse_stage_thresholds("STAGE_WEBLOGIC_PENDING_THRESHOLDS")
+    }
+    stages = {name: stage_for_value(value, thresholds[name]) for name, value in signals.items()}
+    target_stage = max(stages.values())
+
+    if action == "START":
+        # Scale-up never lands below the stage the payload asked for
+        target_stage = max(target_stage, requested_stage, 1)
+        target_stage = min(target_stage, max_stages)
+    else:
+        # Scale-down never keeps the stage the payload asked to stop, but may stop further stages.
+        # The base stage 1 is only stopped when the payload explicitly asked to stop stage 1.
+        lowest_stage = 0 if requested_stage == 1 else 1
+        target_stage = max(lowest_stage, min(target_stage, requested_stage - 1, max_stages))
+
+    log_it(f"Stage selection signals={signals} stages={stages} -> target stage {target_stage}", "INFO", "STAGE_SELECTION")
+    return target_stage, {"values": signals, "stages": stages}
+
+def plan_stages(action, target_stage, max_stages):
+    """
+    Returns the ordered list of stages to process to reach target_stage.
+    START brings up every stage from 1 to target in ascending order so each stage finds its
+    predecessor started; STOP tears down from max_stages down to target + 1 so higher stages
+    are always stopped before lower ones.
+    """
+    if action == "START":
+        return [str(stage) for stage in range(1, target_stage + 1)]
+    return [str(stage) for stage in range(max_stages, target_stage, -1)]
+
+def scale_stage(action, stage, auto_scale_env, compartment_id, table_name, table_compartment_id, function_id, schedule_id, alarm_payload, logs, follow_up=None):
+    """
+    Runs the START or STOP operation for a single stage of an environment.
+    Progress is appended to logs. Returns (result, proceed) where result is the response body for the stage
+    and proceed tells the caller whether the next stage of a multi-stage plan may run.
+    :param follow_up: When a dict, the backends added by this stage are collected into it as {lb_id: [backend, ...]}
+                      and the caller schedules the follow-up; otherwise the follow-up is scheduled here
+    """
     output = []
     success_vms_state = []  # VMs successfully started/stopped
     success_vms_lb = []  # VMs successfully added/removed from the Load Balancer
+    new_backends = []  # Backend names (ip:port) added to the Load Balancer, watched by the follow-up
     failed_vms = []  # Track failed VMs
     no_op_vms = {
         "already_running": [],  # VMs already in the RUNNING state
         "already_stopped": [],  # VMs already in the STOPPED state
     }
     no_op_lb = []  # Track No-Op Load Balancer details
+
+    # Define tag filters
+    freeform_tag_filters = {
+        "auto-scale": "enabled",
+        "auto-scale-env": auto_scale_env,
+        "auto-scale-stage": str(stage),
+        "auto-scale-backend": "*",
+        "auto-scale-lb-ocid": "*",
+        "auto-scale-port": "*"
+    }
+
+    # Initialize NoSQL client for checking last action status
+    nosql_client = oci.nosql.NosqlClient(config={}, signer=get_signer())
+    
+    # Check if last action for this stage and environment resulted in "No Operation"
+    # If so, skip execution as desired state is already achieved
+    last_record = get_last_scale_action(nosql_client, table_name, auto_scale_env, stage, table_compartment_id)
+    if last_record:
+        last_action = last_record.get("Action")
+        last_status = last_record.get("Overall_Status") 
+        last_timestamp = last_record.get("Timestamp")
+        
+        # If last action was the same as current action and resulted in "Success" or "No Operation"
+        # then desired state is already achieved - skip execution
+        if last_action == action and last_status in ["Success", "No Operation"]:
+            if last_status == "No Operation":
+                skip_reason = f"Last {action} action for Stage {stage} resulted in 'No Operation' status. Desired state already achieved."
+            else:
+                skip_reason = f"Last {action} action for Stage {stage} was successful. VMs are already in desired state."
+            logs.append(f"[INFO] {skip_reason}")
+            log_it(skip_reason, "INFO", "OPTIMIZATION")
+            
+            # Return early with no-op response
+            return {
+                "logs": logs, 
+                "output": [f"Skipped execution: {skip_reason}"],
+                "optimization": "no_operation_skip"
+            }, True
+
+    # Fetch VMs matching the tags
+    vm_list = get_vm_names_and_ids_by_tags(compartment_id, freeform_tag_filters)
+    log_it(f"Found {len(vm_list)} VMs for processing", "INFO", "HANDLER")
+    
+    if not vm_list:
+        logs.append(f"[INFO] No VMs found matching the auto-scale tags for environment {auto_scale_env}, stage {stage}")
+        return {"logs": logs, "output": []}, True
+
+    if action == "STOP":
+        # Initialize NoSQL client and table variables if not already done
+        nosql_client = oci.nosql.NosqlClient(config={}, signer=get_signer())
+        
+        # Check stage dependency for STOP: Higher stages must be stopped before lower stages
+        # For example, Stage 1 can only be stopped if Stage 2 has already been stopped
+        if int(stage) == 1:  # Stage 1 is the base/core stage
+            # Check if any higher stages are still running
+            higher_stages_running = []
+            max_stage_to_check = int(os.environ.get("MAX_SCALE_STAGES", "2"))  # Configurable max stages
+            
+            for check_stage in range(2, max_stage_to_check + 1):
+                higher_stage_record = get_last_scale_action(nosql_client, table_name, auto_scale_env, str(check_stage), table_compartment_id)
+                # Only consider as "running" if the last action was START (regardless of success level)
+                if (higher_stage_record and higher_stage_record.get("Action") == "START"):
+                    higher_stages_running.append(str(check_stage))
+            
+            if higher_stages_running:
+                logs.append(f"[ERROR] Stage {stage} cannot be stopped. Higher stages {higher_stages_running} have been started and should be stopped first.")
+                log_it(f"Stage {stage} cannot be stopped. Higher stages {higher_stages_running} should be stopped first", "ERROR", "STAGE_VALIDATION")
+                return {
+                    "error": f"Stage dependency not met. Stages {higher_stages_running} should be stopped before Stage {stage}",
+                    "logs": logs, 
+                    "output": []
+                }, False
+
+            logs.append(f"[INFO] Stage dependency validated for STOP. No higher stages need to be stopped first. Proceeding with Stage {stage} shutdown.")
+            log_it(f"Stage dependency validated for STOP. Proceeding with Stage {stage} shutdown", "INFO", "STAGE_VALIDATION")
+
+        # Check minimum time gap between START and STOP (only if there was a recent START)
+        last_record = get_last_scale_action(nosql_client, table_name, auto_scale_env, stage, table_compartment_id)
+        if last_record and last_record.get("Action") == "START":
+            last_timestamp = last_record.get("Timestamp")
+            try:
+                # Try parsing with fractional seconds; adjust format as needed
+                parsed_ts = datetime.strptime(last_timestamp, "%Y-%m-%dT%H:%M:%S.%fZ")
+            except ValueError:
+                parsed_ts = datetime.strptime(last_timestamp, "%Y-%m-%dT%H:%M:%SZ")
+            
+            min_runtime_hours = int(os.environ.get("MIN_STAGE_RUNTIME_HOURS", "1"))  # Configurable minimum runtime (default: 1 hour)
+            if (datetime.utcnow() - parsed_ts) < timedelta(hours=min_runtime_hours):
+                log_it(f"Stage {stage} START action was performed within the last {min_runtime_hours} hour(s). Skipping STOP to allow sufficient runtime", "INFO", "STAGE_VALIDATION")
+                logs.append(f"[INFO] Stage {stage} START action was performed within the last {min_runtime_hours} hour(s). Skipping STOP to allow sufficient runtime.")
+                return {"logs": logs, "output": []}, False
+        
+        # Proceed with STOP operations
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            results = executor.map(lambda vm: scale_down_vm(vm, compartment_id), vm_list)
+            for vm_action_result in results:
+                output.append(vm_action_result)
+                if vm_action_result["status"] == "success":
+                    logs.append(f"[INFO] VM {vm_action_result['vm_name']} scaled down successfully.")
+                    success_vms_state.append(vm_action_result["vm_name"])
+                elif vm_action_result["status"] == "no-op":
+                    logs.append(f"[INFO] VM {vm_action_result['vm_name']} is already in desired state. Reason: {vm_action_result['reason']}")
+                    if "already stopped" in vm_action_result["reason"].lower():
+                        no_op_vms["already_stopped"].append(f"{vm_action_result['vm_name']} (Status: STOPPED)")
+                    else:
+                        no_op_vms["already_stopped"].append(f"{vm_action_result['vm_name']} ({vm_action_result['reason']})")
+                else:
+                    logs.append(f"[WARN] Failed to scale down VM {vm_action_result['vm_name']}. Reason: {vm_action_result['reason']}")
+                    failed_vms.append({"vm_name": vm_action_result["vm_name"], "reason": vm_action_result["reason"]})
+                    
+    elif action == "START":
+        # Initialize NoSQL client and table variables for START actions
+        nosql_client = oci.nosql.NosqlClient(config={}, signer=get_signer())
+        
+        # Check stage dependency: Stage 2+ can only run if previous stage was started
+        if int(stage) > 1:
+            previous_stage = str(int(stage) - 1)
+            previous_stage_record = get_last_scale_action(nosql_client, table_name, auto_scale_env, previous_stage, table_compartment_id)
+            
+            if not previous_stage_record or previous_stage_record.get("Action") != "START":
+                logs.append(f"[ERROR] Stage {stage} cannot be triggered. Previous stage {previous_stage} has not been started yet.")
+                log_it(f"Stage {stage} cannot be triggered. Previous stage {previous_stage} has not been started yet", "ERROR", "STAGE_VALIDATION")
+                return {
+                    "error": f"Stage dependency not met. Stage {previous_stage} must be started before Stage {stage}",
+                    "logs": logs, 
+                    "output": []
+                }, False
+
+            logs.append(f"[INFO] Stage dependency validated. Previous stage {previous_stage} was started. Proceeding with Stage {stage}.")
+            log_it(f"Stage dependency validated. Previous stage {previous_stage} was started. Proceeding with Stage {stage}", "INFO", "STAGE_VALIDATION")
+        
+        # Check for recent START operations for the current stage to prevent concurrent operations
+        last_record = get_last_scale_action(nosql_client, table_name, auto_scale_env, stage, table_compartment_id)
+        last_action = last_record.get("Action") if last_record else None
+        last_timestamp = last_record.get("Timestamp") if last_record else None
+        
+        if last_action == "START" and last_timestamp:
+            try:
+                # Try parsing with fractional seconds; adjust format as needed
+                parsed_ts = datetime.strptime(last_timestamp, "%Y-%m-%dT%H:%M:%S.%fZ")
+            except ValueError:
+                parsed_ts = datetime.strptime(last_timestamp, "%Y-%m-%dT%H:%M:%SZ")
+            
+            # Check if START was performed within the last hour to prevent concurrent operations
+            concurrent_prevention_hours = float(os.environ.get("CONCURRENT_PREVENTION_HOURS", "1"))  # Configurable prevention window
+            if (datetime.utcnow() - parsed_ts) < timedelta(hours=concurrent_prevention_hours):
+                logs.append(f"[INFO] Recent START action for Stage {stage} was performed within the last {concurrent_prevention_hours} hour(s). Skipping to avoid concurrent operations.")
+                log_it(f"Recent START action for Stage {stage} was performed within the last {concurrent_prevention_hours} hour(s). Skipping to avoid concurrent operations", "INFO", "STAGE_VALIDATION")
+                return {"logs": logs, "output": []}, True
+        
+        # Process each VM for scale-up if no recent START action was recorded
+        for vm in vm_list:
+            try:
+                # Validate VM properties
+                required_vm_props = ['ocid', 'name', 'lb_ocid', 'backend', 'port']
+                missing_props = [prop for prop in required_vm_props if not vm.get(prop)]
+                if missing_props:
+                    error_msg = f"VM {vm.get('name', 'Unknown')} missing required properties: {', '.join(missing_props)}"
+                    failed_vms.append({"vm_name": vm.get('name', 'Unknown'), "reason": error_msg})
+                    logs.append(f"[ERROR] {error_msg}")
+                    continue
+                
+                # Perform the start operation
+                vm_action_result = start_stop_vm(vm['ocid'], vm['name'], action)
+                output.append(vm_action_result)
+                
+                pre_status = vm_action_result.get("pre_status", "").upper()
+                post_status = vm_action_result.get("post_status", "").upper()
+                status_message = vm_action_result.get("status", "").lower()
+                error_message = vm_action_result.get("error")
+                
+                vm_needs_lb_operation = False
+                
+                if error_message:
+                    # VM operation failed due to error
+                    failed_vms.append({"vm_name": vm['name'], "reason": error_message})
+                    logs.append(f"[WARN] Failed to start VM {vm['name']}. Error: {error_message}")
+                    continue  # Skip adding to the load balancer if start fails
+                elif action == "START" and pre_status == "RUNNING":
+                    # VM was already running - still need to check LB status
+                    logs.append(f"[INFO] VM {vm['name']} is already running. Checking Load Balancer status.")
+                    no_op_vms["already_running"].append(f"{vm['name']} (Status: {post_status})")
+                    vm_needs_lb_operation = True
+                elif "successfully" in status_message:
+                    # VM was started successfully - definitely needs LB operation
+                    logs.append(f"[INFO] VM {vm['name']} started successfully.")
+                    success_vms_state.append(vm['name'])
+                    vm_needs_lb_operation = True
+                elif "already" in status_message and "running" in status_message:
+                    # Additional check for "already running" message from start_stop_vm
+                    logs.append(f"[INFO] VM {vm['name']} is already in desired state. Checking Load Balancer status.")
+                    no_op_vms["already_running"].append(f"{vm['name']} (Status: {post_status})")
+                    vm_needs_lb_operation = True
+                else:
+                    # Unexpected status - treat as failure
+                    failed_vms.append({"vm_name": vm['name'], "reason": f"Unexpected status: {status_message}"})
+                    logs.append(f"[WARN] Failed to start VM {vm['name']}. Unexpected status: {status_message}")
+                    continue  # Skip adding to the load balancer if start fails
+                    
+                # Add instance to Load Balancer only if VM is running (successfully started or already running)
+                if vm_needs_lb_operation:
+                    out_lb_add = add_instance_to_lb(vm['lb_ocid'], vm['backend'], vm['ocid'], compartment_id, vm['port'])
+                    output.append(out_lb_add)
+                    if "success" in out_lb_add.lower():
+                        logs.append(f"[INFO] VM {vm['name']} added to Load Balancer successfully.")
+                        success_vms_lb.append(f"{vm['name']} (LB: {vm['backend']}, Port: {vm['port']})")
+                        new_backends.append(f"{get_private_ip(vm['ocid'], compartment_id)}:{vm['port']}")
+                    elif "already in the backend set" in out_lb_add.lower():
+                        logs.append(f"[INFO] VM {vm['name']} is already part of the Load Balancer.")
+                        no_op_lb.append(f"{vm['name']} (LB: {vm['backend']}, Port: {vm['port']})")
+                    else:
+                        # LB operation failed - this should be treated as a partial failure
+                        failed_vms.append({"vm_name": vm['name'], "reason": f"VM started but LB operation failed: {out_lb_add}"})
+                        logs.append(f"[WARN] VM {vm['name']} started successfully but failed to add to Load Balancer: {out_lb_add}")
+            except Exception as vm_error:
+                failed_vms.append({"vm_name": vm['name'], "reason": str(vm_error)})
+                logs.append(f"[ERROR] Failed to process VM {vm['name']}. Error: {str(vm_error)}")
+
+    # Schedule follow-up function
+    if success_vms_lb and vm_list and vm_list[0].get('lb_ocid'):
+        if follow_up is not None:
+            follow_up.setdefault(vm_list[0]['lb_ocid'], []).extend(new_backends)
+        else:
+            schedule_follow_up(auto_scale_env, vm_list[0]['lb_ocid'], compartment_id, function_id, schedule_id, new_backends)
+
+    # After processing all VMs
+    total_vms = len(vm_list)
+    success_count = len(success_vms_state)
+    no_op_count = len(no_op_vms["already_running"]) + len(no_op_vms["already_stopped"]) + len(no_op_lb)
+    
+    # Get names of VMs that are in no-op state
+    no_op_vm_names = set()
+    no_op_vm_names.update([vm.split(" (")[0] for vm in no_op_vms["already_running"]])  # Extract VM name from "VM (Status: ...)"
+    no_op_vm_names.update([vm.split(" (")[0] for vm in no_op_vms["already_stopped"]])  # Extract VM name from "VM (Status: ...)"
+    no_op_vm_names.update([vm.split(" (")[0] for vm in no_op_lb])  # Extract VM name from "VM (LB: ...)"
+    
+    # Count only actual failures (exclude no-op VMs from failed_vms)
+    actual_failures = [vm for vm in failed_vms if vm["vm_name"] not in no_op_vm_names]
+    failure_count = len(actual_failures)
+
+    # Enhanced overall status determination with better logic
+    effective_no_op_count = no_op_count
+    effective_failure_count = failure_count
+    
+    # For START actions, consider load balancer results in overall status
+    if action == "START":
+        # If all VMs are already running AND already in LB, it's truly "No Operation"
+        vm_count = len(no_op_vms["already_running"])
+        lb_count = len(no_op_lb)
+        
+        # Determine overall status for START action
+        if effective_failure_count == 0 and success_count == 0 and vm_count > 0 and lb_count > 0 and vm_count == lb_count == total_vms:
+            # Perfect no-op: all VMs already running and already in LB
+            overall_status = "No Operation"
+        elif effective_failure_count == 0 and (success_count > 0 or len(success_vms_lb) > 0):
+            # Some actual work was done successfully
+            overall_status = "Success"
+        elif effective_failure_count > 0 and (success_count > 0 or len(success_vms_lb) > 0 or effective_no_op_count > 0):
+            # Mixed results
+            overall_status = "Partial Success"
+        elif effective_failure_count == total_vms:
+            # All operations failed
+            overall_status = "Failure"
+        elif effective_failure_count == 0 and success_count == 0 and effective_no_op_count > 0:
+            # Some no-ops but not perfect alignment (e.g., VM running but not in LB)
+            overall_status = "No Operation"
+        else:
+            overall_status = "Failure"  # Fallback
+    else:
+        # For STOP actions, use simpler logic
+        if effective_no_op_count == total_vms and effective_failure_count == 0:
+            overall_status = "No Operation"
+        elif effective_failure_count == 0 and success_count > 0:
+            overall_status = "Success"
+        elif effective_failure_count > 0 and (success_count > 0 or effective_no_op_count > 0):
+            overall_status = "Partial Success"
+        elif effective_failure_count == total_vms:
+            overall_status = "Failure"
+        else:
+            overall_status = "No Operation" if effective_no_op_count > 0 else "Failure"
+
+    # Enhanced logging with detailed metrics
+    operation_metrics = {
+        "total_vms": total_vms,
+        "vm_successes": success_count,
+        "vm_failures": len([vm for vm in failed_vms if vm["vm_name"] not in no_op_vm_names]),
+        "vm_no_ops": len(no_op_vms["already_running"]) + len(no_op_vms["already_stopped"]),
+        "lb_successes": len(success_vms_lb),
+        "lb_no_ops": len(no_op_lb),
+        "lb_failures": len([vm for vm in failed_vms if "LB operation failed" in vm.get("reason", "")]),
+        "overall_status": overall_status,
+        "optimization_applied": False
+    }
+    
+    log_it(f"Operation completed - Metrics: {operation_metrics}", "INFO", "METRICS")
+    
+    # Log ALL operations to NoSQL for complete audit trail
+    # This includes successes, failures, and no-operations for tracking and debugging
+    log_summary_to_nosql(
+        nosql_client,
+        table_name,
+        table_compartment_id,
+        action=action,
+        environment=auto_scale_env,
+        stage=stage,
+        total_vms=total_vms,
+        success_count=success_count,
+        failure_count=failure_count,
+        no_op_count=no_op_count,
+        overall_status=overall_status
+    )
+    log_it(f"NoSQL operation logged for {action} with status: {overall_status}", "INFO", "NOSQL")
+
+    # Construct email content
+    notification_topic_id = os.environ.get("wlsc_email_notification_topic_id")
+    if notification_topic_id:
+        # Only send email if there are actual operations performed or failures occurred
+        # Skip email for cases where function was optimized/skipped entirely
+        if success_vms_state or success_vms_lb or failed_vms:
+            subject = f"Auto Scale {action} - Stage {stage} - {auto_scale_env} - {overall_status}"
+            
+            # Generate enhanced email content with better formatting
+            email_body = email_message(
+                alarm_payload=alarm_payload,
+                environment=auto_scale_env,
+                stage=stage,
+                action=action,
+                total_vms=total_vms,
+                success_count=success_count,
+                failure_count=failure_count,
+                no_op_count=no_op_count,
+                overall_status=overall_status
+            )
+            
+            # Add execution summary
+            email_body += f"\n\n=== EXECUTION SUMMARY ==="
+            email_body += f"\nVM Operations: {success_count} successful, {failure_count} failed, {len(no_op_vms['already_running']) + len(no_op_vms['already_stopped'])} no-op"
+            if action == "START":
+                email_body += f"\nLoad Balancer Operations: {len(success_vms_lb)} successful, {len(no_op_lb)} no-op"
+            
+            # Add detailed operation breakdown
+            if success_vms_state or success_vms_lb:
+                email_body += "\n\n=== SUCCESSFUL OPERATIONS ==="
+                if success_vms_state:
+                    email_body += f"\nVM State Changes ({len(success_vms_state)}):"
+                    for i, vm_name in enumerate(success_vms_state, 1):
+                        email_body += f"\n  {i}. {vm_name} - {action}ED successfully"
+                
+                if success_vms_lb:
+                    email_body += f"\nLoad Balancer Operations ({len(success_vms_lb)}):"
+                    for i, vm_info in enumerate(success_vms_lb, 1):
+                        email_body += f"\n  {i}. {vm_info} - Added to Load Balancer"
+            
+            # Include no-op details only when there are also actual operations (for context)
+            if no_op_vms["already_running"] or no_op_vms["already_stopped"] or no_op_lb:
+                email_body += "\n\n=== NO-OPERATION (ALREADY IN DESIRED STATE) ==="
+                if no_op_vms["already_running"]:
+                    email_body += f"\nVMs Already Running ({len(no_op_vms['already_running'])}):"
+                    for i, vm_info in enumerate(no_op_vms["already_running"], 1):
+                        email_body += f"\n  {i}. {vm_info}"
+                
+                if no_op_vms["already_stopped"]:
+                    email_body += f"\nVMs Already Stopped ({len(no_op_vms['already_stopped'])}):"
+                    for i, vm_info in enumerate(no_op_vms["already_stopped"], 1):
+                        email_body += f"\n  {i}. {vm_info}"
+                
+                if no_op_lb:
+                    email_body += f"\nVMs Already in Load Balancer ({len(no_op_lb)}):"
+                    for i, vm_info in enumerate(no_op_lb, 1):
+                        email_body += f"\n  {i}. {vm_info}"
+            
+            if failed_vms:
+                email_body += "\n\n=== FAILED OPERATIONS ==="
+                email_body += f"\nFailed Operations ({len(failed_vms)}):"
+                for i, failure in enumerate(failed_vms, 1):
+                    vm_name = failure.get('vm_name', 'Unknown')
+                    reason = failure.get('reason', 'No specific reason provided')
+                    # Truncate very long error messages for email readability
+                    if len(reason) > 200:
+                        reason = reason[:200] + "... (truncated)"
+                    email_body += f"\n  {i}. {vm_name}: {reason}"
+                
+                email_body += "\n\nACTION REQUIRED:"
+                email_body += "\n• Check Oracle Functions logs for detailed error information"
+                email_body += "\n• Verify VM and Load Balancer accessibility"
+                email_body += "\n• Consider manual intervention if errors persist"
+            
+            # Failed operations go out immediately; everything else is coalesced into a digest
+            notify(
+                signer=get_signer(),
+                topic_id=notification_topic_id,
+                environment=auto_scale_env,
+                email_body=email_body,
+                subject=subject,
+                critical=overall_status in ["Failure", "Partial Success"]
+            )
+
+    return {"output": output, "logs": logs}, overall_status != "Failure"
+
+def handler(ctx, data: io.BytesIO = None):
+    logs = []
     auto_scale_env = ""
-    alarm_payload = None  # Initialize alarm_payload
 
     try:
         # Parse input data
@@ -827,6 +1494,9 @@ def handler(ctx, data: io.BytesIO = None):
         function_id = os.environ.get("CHECK_LOAD_BALANCER_HEALTH_OCID")
         schedule_id = os.environ.get("HEALTH_CHECK_SCHEDULE_OCID")  # Optional: Existing schedule ID to update
         stage = str(parsed_body.get("auto-scale-stage", "1"))  # Ensure stage is always a string
+        max_stages = int(os.environ.get("MAX_SCALE_STAGES", "2"))  # Configurable max stages
+        # Automatic stage selection is requested per alarm with auto-scale-stage=auto or enabled for the whole function
+        auto_stage = stage.lower() == "auto" or os.environ.get("AUTO_STAGE_SELECTION", "false").lower() == "true"
 
         password = get_secret(password_secret_id)
 
@@ -836,399 +1506,47 @@ def handler(ctx, data: io.BytesIO = None):
                 logs.append("[ERROR] WebLogic Admin Server is not running. Aborting operations.")
                 return response.Response(ctx, response_data=json.dumps({"error": "WebLogic Admin Server is not running", "logs": logs}), headers={"Content-Type": "application/json"})
 
+        if auto_stage:
+            if stage.isdigit():
+                requested_stage = int(stage)
+            else:
+                # No explicit stage: START from the base stage, STOP from above the highest stage
+                requested_stage = 1 if action == "START" else max_stages + 1
+            target_stage, signals = select_target_stage(body, action, requested_stage, max_stages, auto_scale_env, compartment_id, weblogic_host, username, password)
+            stages = plan_stages(action, target_stage, max_stages)
+            stage = str(target_stage)
+            logs.append(f"[INFO] Automatic stage selection: target stage {target_stage}, stages to process {stages}. Signals: {signals['values']}")
+        else:
+            stages = [stage]
+
         logs.append(f"auto_scale_env={auto_scale_env}, action={action}, stage={stage}")
         log_it(f"Processing scale operation: env={auto_scale_env}, action={action}, stage={stage}", "INFO", "HANDLER")
 
-        # Define tag filters
-        freeform_tag_filters = {
-            "auto-scale": "enabled",
-            "auto-scale-env": auto_scale_env,
-            "auto-scale-stage": str(stage),
-            "auto-scale-backend": "*",
-            "auto-scale-lb-ocid": "*",
-            "auto-scale-port": "*"
-        }
-
-        # Initialize NoSQL client for checking last action status
-        nosql_client = oci.nosql.NosqlClient(config={}, signer=signer)
-        
-        # Check if last action for this stage and environment resulted in "No Operation"
-        # If so, skip execution as desired state is already achieved
-        last_record = get_last_scale_action(nosql_client, table_name, auto_scale_env, stage, table_compartment_id)
-        if last_record:
-            last_action = last_record.get("Action")
-            last_status = last_record.get("Overall_Status") 
-            last_timestamp = last_record.get("Timestamp")
-            
-            # If last action was the same as current action and resulted in "Success" or "No Operation"
-            # then desired state is already achieved - skip execution
-            if last_action == action and last_status in ["Success", "No Operation"]:
-                if last_status == "No Operation":
-                    skip_reason = f"Last {action} action for Stage {stage} resulted in 'No Operation' status. Desired state already achieved."
-                else:
-                    skip_reason = f"Last {action} action for Stage {stage} was successful. VMs are already in desired state."
-                logs.append(f"[INFO] {skip_reason}")
-                log_it(skip_reason, "INFO", "OPTIMIZATION")
-                
-                # Return early with no-op response
-                return response.Response(ctx, response_data=json.dumps({
-                    "logs": logs, 
-                    "output": [f"Skipped execution: {skip_reason}"],
-                    "optimization": "no_operation_skip"
-                }), headers={"Content-Type": "application/json"})
-
-        # Fetch VMs matching the tags
-        vm_list = get_vm_names_and_ids_by_tags(compartment_id, freeform_tag_filters)
-        log_it(f"Found {len(vm_list)} VMs for processing", "INFO", "HANDLER")
-        
-        if not vm_list:
-            logs.append(f"[INFO] No VMs found matching the auto-scale tags for environment {auto_scale_env}, stage {stage}")
-            return response.Response(ctx, response_data=json.dumps({"logs": logs, "output": []}), headers={"Content-Type": "application/json"})
+        if not auto_stage:
+            result, _ = scale_stage(action, stage, auto_scale_env, compartment_id, table_name, table_compartment_id, function_id, schedule_id, body, logs)
+            return response.Response(ctx, response_data=json.dumps(result), headers={"Content-Type": "application/json"})
 
-        if action == "STOP":
-            # Initialize NoSQL client and table variables if not already done
-            nosql_client = oci.nosql.NosqlClient(config={}, signer=signer)
-            
-            # Check stage dependency for STOP: Higher stages must be stopped before lower stages
-            # For example, Stage 1 can only be stopped if Stage 2 has already been stopped
-            if int(stage) == 1:  # Stage 1 is the base/core stage
-                # Check if any higher stages are still running
-                higher_stages_running = []
-                max_stage_to_check = int(os.environ.get("MAX_SCALE_STAGES", "2"))  # Configurable max stages
-                
-                for check_stage in range(2, max_stage_to_check + 1):
-                    higher_stage_record = get_last_scale_action(nosql_client, table_name, auto_scale_env, str(check_stage), table_compartment_id)
-                    # Only consider as "running" if the last action was START (regardless of success level)
-                    if (higher_stage_record and higher_stage_record.get("Action") == "START"):
-                        higher_stages_running.append(str(check_stage))
-                
-                if higher_stages_running:
-                    logs.append(f"[ERROR] Stage {stage} cannot be stopped. Higher stages {higher_stages_running} have been started and should be stopped first.")
-                    log_it(f"Stage {stage} cannot be stopped. Higher stages {higher_stages_running} should be stopped first", "ERROR", "STAGE_VALIDATION")
-                    return response.Response(ctx, response_data=json.dumps({
-                        "error": f"Stage dependency not met. Stages {higher_stages_running} should be stopped before Stage {stage}",
-                        "logs": logs, 
-                        "output": []
-                    }), headers={"Content-Type": "application/json"})
-
-                logs.append(f"[INFO] Stage dependency validated for STOP. No higher stages need to be stopped first. Proceeding with Stage {stage} shutdown.")
-                log_it(f"Stage dependency validated for STOP. Proceeding with Stage {stage} shutdown", "INFO", "STAGE_VALIDATION")
-
-            # Check minimum time gap between START and STOP (only if there was a recent START)
-            last_record = get_last_scale_action(nosql_client, table_name, auto_scale_env, stage, table_compartment_id)
-            if last_record and last_record.get("Action") == "START":
-                last_timestamp = last_record.get("Timestamp")
-                try:
-                    # Try parsing with fractional seconds; adjust format as needed
-                    parsed_ts = datetime.strptime(last_timestamp, "%Y-%m-%dT%H:%M:%S.%fZ")
-                except ValueError:
-                    parsed_ts = datetime.strptime(last_timestamp, "%Y-%m-%dT%H:%M:%SZ")
-                
-                min_runtime_hours = int(os.environ.get("MIN_STAGE_RUNTIME_HOURS", "1"))  # Configurable minimum runtime (default: 1 hour)
-                if (datetime.utcnow() - parsed_ts) < timedelta(hours=min_runtime_hours):
-                    log_it(f"Stage {stage} START action was performed within the last {min_runtime_hours} hour(s). Skipping STOP to allow sufficient runtime", "INFO", "STAGE_VALIDATION")
-                    logs.append(f"[INFO] Stage {stage} START action was performed within the last {min_runtime_hours} hour(s). Skipping STOP to allow sufficient runtime.")
-                    return response.Response(ctx, response_data=json.dumps({"logs": logs, "output": []}), headers={"Content-Type": "application/json"})
-            
-            # Proceed with STOP operations
-            with ThreadPoolExecutor(max_workers=5) as executor:
-                results = executor.map(lambda vm: scale_down_vm(vm, compartment_id), vm_list)
-                for vm_action_result in results:
-                    output.append(vm_action_result)
-                    if vm_action_result["status"] == "success":
-                        logs.append(f"[INFO] VM {vm_action_result['vm_name']} scaled down successfully.")
-                        success_vms_state.append(vm_action_result["vm_name"])
-                    elif vm_action_result["status"] == "no-op":
-                        logs.append(f"[INFO] VM {vm_action_result['vm_name']} is already in desired state. Reason: {vm_action_result['reason']}")
-                        if "already stopped" in vm_action_result["reason"].lower():
-                            no_op_vms["already_stopped"].append(f"{vm_action_result['vm_name']} (Status: STOPPED)")
-                        else:
-                            no_op_vms["already_stopped"].append(f"{vm_action_result['vm_name']} ({vm_action_result['reason']})")
-                    else:
-                        logs.append(f"[WARN] Failed to scale down VM {vm_action_result['vm_name']}. Reason: {vm_action_result['reason']}")
-                        failed_vms.append({"vm_name": vm_action_result["vm_name"], "reason": vm_action_result["reason"]})
-                        
-        elif action == "START":
-            # Initialize NoSQL client and table variables for START actions
-            nosql_client = oci.nosql.NosqlClient(config={}, signer=signer)
-            
-            # Check stage dependency: Stage 2+ can only run if previous stage was started
-            if int(stage) > 1:
-                previous_stage = str(int(stage) - 1)
-                previous_stage_record = get_last_scale_action(nosql_client, table_name, auto_scale_env, previous_stage, table_compartment_id)
-                
-                if not previous_stage_record or previous_stage_record.get("Action") != "START":
-                    logs.append(f"[ERROR] Stage {stage} cannot be triggered. Previous stage {previous_stage} has not been started yet.")
-                    log_it(f"Stage {stage} cannot be triggered. Previous stage {previous_stage} has not been started yet", "ERROR", "STAGE_VALIDATION")
-                    return response.Response(ctx, response_data=json.dumps({
-                        "error": f"Stage dependency not met. Stage {previous_stage} must be started before Stage {stage}",
-                        "logs": logs, 
-                        "output": []
-                    }), headers={"Content-Type": "application/json"})
-
-                logs.append(f"[INFO] Stage dependency validated. Previous stage {previous_stage} was started. Proceeding with Stage {stage}.")
-                log_it(f"Stage dependency validated. Previous stage {previous_stage} was started. Proceeding with Stage {stage}", "INFO", "STAGE_VALIDATION")
-            
-            # Check for recent START operations for the current stage to prevent concurrent operations
-            last_record = get_last_scale_action(nosql_client, table_name, auto_scale_env, stage, table_compartment_id)
-            last_action = last_record.get("Action") if last_record else None
-            last_timestamp = last_record.get("Timestamp") if last_record else None
-            
-            if last_action == "START" and last_timestamp:
-                try:
-                    # Try parsing with fractional seconds; adjust format as needed
-                    parsed_ts = datetime.strptime(last_timestamp, "%Y-%m-%dT%H:%M:%S.%fZ")
-                except ValueError:
-                    parsed_ts = datetime.strptime(last_timestamp, "%Y-%m-%dT%H:%M:%SZ")
-                
-                # Check if START was performed within the last hour to prevent concurrent operations
-                concurrent_prevention_hours = float(os.environ.get("CONCURRENT_PREVENTION_HOURS", "1"))  # Configurable prevention window
-                if (datetime.utcnow() - parsed_ts) < timedelta(hours=concurrent_prevention_hours):
-                    logs.append(f"[INFO] Recent START action for Stage {stage} was performed within the last {concurrent_prevention_hours} hour(s). Skipping to avoid concurrent operations.")
-                    log_it(f"Recent START action for Stage {stage} was performed within the last {concurrent_prevention_hours} hour(s). Skipping to avoid concurrent operations", "INFO", "STAGE_VALIDATION")
-                    return response.Response(ctx, response_data=json.dumps({"logs": logs, "output": []}), headers={"Content-Type": "application/json"})
-            
-            # Process each VM for scale-up if no recent START action was recorded
-            for vm in vm_list:
-                try:
-                    # Validate VM properties
-                    required_vm_props = ['ocid', 'name', 'lb_ocid', 'backend', 'port']
-                    missing_props = [prop for prop in required_vm_props if not vm.get(prop)]
-                    if missing_props:
-                        error_msg = f"VM {vm.get('name', 'Unknown')} missing required properties: {', '.join(missing_props)}"
-                        failed_vms.append({"vm_name": vm.get('name', 'Unknown'), "reason": error_msg})
-                        logs.append(f"[ERROR] {error_msg}")
-                        continue
-                    
-                    # Perform the start operation
-                    vm_action_result = start_stop_vm(vm['ocid'], vm['name'], action)
-                    output.append(vm_action_result)
-                    
-                    pre_status = vm_action_result.get("pre_status", "").upper()
-                    post_status = vm_action_result.get("post_status", "").upper()
-                    status_message = vm_action_result.get("status", "").lower()
-                    error_message = vm_action_result.get("error")
-                    
-                    vm_needs_lb_operation = False
-                    
-                    if error_message:
-                        # VM operation failed due to error
-                        failed_vms.append({"vm_name": vm['name'], "reason": error_message})
-                        logs.append(f"[WARN] Failed to start VM {vm['name']}. Error: {error_message}")
-                        continue  # Skip adding to the load balancer if start fails
-                    elif action == "START" and pre_status == "RUNNING":
-                        # VM was already running - still need to check LB status
-                        logs.append(f"[INFO] VM {vm['name']} is already running. Checking Load Balancer status.")
-                        no_op_vms["already_running"].append(f"{vm['name']} (Status: {post_status})")
-                        vm_needs_lb_operation = True
-                    elif "successfully" in status_message:
-                        # VM was started successfully - definitely needs LB operation
-                        logs.append(f"[INFO] VM {vm['name']} started successfully.")
-                        success_vms_state.append(vm['name'])
-                        vm_needs_lb_operation = True
-                    elif "already" in status_message and "running" in status_message:
-                        # Additional check for "already running" message from start_stop_vm
-                        logs.append(f"[INFO] VM {vm['name']} is already in desired state. Checking Load Balancer status.")
-                        no_op_vms["already_running"].append(f"{vm['name']} (Status: {post_status})")
-                        vm_needs_lb_operation = True
-                    else:
-                        # Unexpected status - treat as failure
-                        failed_vms.append({"vm_name": vm['name'], "reason": f"Unexpected status: {status_message}"})
-                        logs.append(f"[WARN] Failed to start VM {vm['name']}. Unexpected status: {status_message}")
-                        continue  # Skip adding to the load balancer if start fails
-                        
-                    # Add instance to Load Balancer only if VM is running (successfully started or already running)
-                    if vm_needs_lb_operation:
-                        out_lb_add = add_instance_to_lb(vm['lb_ocid'], vm['backend'], vm['ocid'], compartment_id, vm['port'])
-                        output.append(out_lb_add)
-                        if "success" in out_lb_add.lower():
-                            logs.append(f"[INFO] VM {vm['name']} added to Load Balancer successfully.")
-                            success_vms_lb.append(f"{vm['name']} (LB: {vm['backend']}, Port: {vm['port']})")
-                        elif "already in the backend set" in out_lb_add.lower():
-                            logs.append(f"[INFO] VM {vm['name']} is already part of the Load Balancer.")
-                            no_op_lb.append(f"{vm['name']} (LB: {vm['backend']}, Port: {vm['port']})")
-                        else:
-                            # LB operation failed - this should be treated as a partial failure
-                            failed_vms.append({"vm_name": vm['name'], "reason": f"VM started but LB operation failed: {out_lb_add}"})
-                            logs.append(f"[WARN] VM {vm['name']} started successfully but failed to add to Load Balancer: {out_lb_add}")
-                except Exception as vm_error:
-                    failed_vms.append({"vm_name": vm['name'], "reason": str(vm_error)})
-                    logs.append(f"[ERROR] Failed to process VM {vm['name']}. Error: {str(vm_error)}")
-
-        # Schedule follow-up function
-        if success_vms_lb and vm_list and vm_list[0].get('lb_ocid'):
-            schedule_follow_up(auto_scale_env, vm_list[0]['lb_ocid'], compartment_id, function_id, schedule_id)
-
-        # After processing all VMs
-        total_vms = len(vm_list)
-        success_count = len(success_vms_state)
-        no_op_count = len(no_op_vms["already_running"]) + len(no_op_vms["already_stopped"]) + len(no_op_lb)
-        
-        # Get names of VMs that are in no-op state
-        no_op_vm_names = set()
-        no_op_vm_names.update([vm.split(" (")[0] for vm in no_op_vms["already_running"]])  # Extract VM name from "VM (Status: ...)"
-        no_op_vm_names.update([vm.split(" (")[0] for vm in no_op_vms["already_stopped"]])  # Extract VM name from "VM (Status: ...)"
-        no_op_vm_names.update([vm.split(" (")[0] for vm in no_op_lb])  # Extract VM name from "VM (LB: ...)"
-        
-        # Count only actual failures (exclude no-op VMs from failed_vms)
-        actual_failures = [vm for vm in failed_vms if vm["vm_name"] not in no_op_vm_names]
-        failure_count = len(actual_failures)
-
-        # Enhanced overall status determination with better logic
-        effective_no_op_count = no_op_count
-        effective_failure_count = failure_count
-        
-        # For START actions, consider load balancer results in overall status
-        if action == "START":
-            # If all VMs are already running AND already in LB, it's truly "No Operation"
-            vm_count = len(no_op_vms["already_running"])
-            lb_count = len(no_op_lb)
-            
-            # Determine overall status for START action
-            if effective_failure_count == 0 and success_count == 0 and vm_count > 0 and lb_count > 0 and vm_count == lb_count == total_vms:
-                # Perfect no-op: all VMs already running and already in LB
-                overall_status = "No Operation"
-            elif effective_failure_count == 0 and (success_count > 0 or len(success_vms_lb) > 0):
-                # Some actual work was done successfully
-                overall_status = "Success"
-            elif effective_failure_count > 0 and (success_count > 0 or len(success_vms_lb) > 0 or effective_no_op_count > 0):
-                # Mixed results
-                overall_status = "Partial Success"
-            elif effective_failure_count == total_vms:
-                # All operations failed
-                overall_status = "Failure"
-            elif effective_failure_count == 0 and success_count == 0 and effective_no_op_count > 0:
-                # Some no-ops but not perfect alignment (e.g., VM running but not in LB)
-                overall_status = "No Operation"
-            else:
-                overall_status = "Failure"  # Fallback
-        else:
-            # For STOP actions, use simpler logic
-            if effective_no_op_count == total_vms and effective_failure_count == 0:
-                overall_status = "No Operation"
-            elif effective_failure_count == 0 and success_count > 0:
-                overall_status = "Success"
-            elif effective_failure_count > 0 and (success_count > 0 or effective_no_op_count > 0):
-                overall_status = "Partial Success"
-            elif effective_failure_count == total_vms:
-                overall_status = "Failure"
-            else:
-                overall_status = "No Operation" if effective_no_op_count > 0 else "Failure"
-
-        # Enhanced logging with detailed metrics
-        operation_metrics = {
-            "total_vms": total_vms,
-            "vm_successes": success_count,
-            "vm_failures": len([vm for vm in failed_vms if vm["vm_name"] not in no_op_vm_names]),
-            "vm_no_ops": len(no_op_vms["already_running"]) + len(no_op_vms["already_stopped"]),
-            "lb_successes": len(success_vms_lb),
-            "lb_no_ops": len(no_op_lb),
-            "lb_failures": len([vm for vm in failed_vms if "LB operation failed" in vm.get("reason", "")]),
-            "overall_status": overall_status,
-            "optimization_applied": False
-        }
-        
-        log_it(f"Operation completed - Metrics: {operation_metrics}", "INFO", "METRICS")
-        
-        # Log ALL operations to NoSQL for complete audit trail
-        # This includes successes, failures, and no-operations for tracking and debugging
-        log_summary_to_nosql(
-            nosql_client,
-            table_name,
-            table_compartment_id,
-            action=action,
-            environment=auto_scale_env,
-            stage=stage,
-            total_vms=total_vms,
-            success_count=success_count,
-            failure_count=failure_count,
-            no_op_count=no_op_count,
-            overall_status=overall_status
-        )
-        log_it(f"NoSQL operation logged for {action} with status: {overall_status}", "INFO", "NOSQL")
+        # Bring every intermediate stage up (or down) in this invocation; scale_stage applies the
+        # stage-dependency rules for each stage against the records written by the previous one
+        stage_results = {}
+        follow_up = {}  # Backends added across all stages per Load Balancer, watched by one follow-up
+        for stage in stages:
+            result, proceed = scale_stage(action, stage, auto_scale_env, compartment_id, table_name, table_compartment_id, function_id, schedule_id, body, logs, follow_up)
+            stage_results[stage] = {key: value for key, value in result.items() if key != "logs"}
+            if not proceed:
+                logs.append(f"[WARN] Multi-stage {action} halted at Stage {stage}. Remaining stages were not processed.")
+                log_it(f"Multi-stage {action} halted at Stage {stage}", "WARN", "HANDLER")
+                break
 
-        # Construct email content
-        notification_topic_id = os.environ.get("wlsc_email_notification_topic_id")
-        if notification_topic_id:
-            # Only send email if there are actual operations performed or failures occurred
-            # Skip email for cases where function was optimized/skipped entirely
-            if success_vms_state or success_vms_lb or failed_vms:
-                subject = f"Auto Scale {action} - Stage {stage} - {auto_scale_env} - {overall_status}"
-                
-                # Generate enhanced email content with better formatting
-                email_body = email_message(
-                    alarm_payload=body,
-                    environment=auto_scale_env,
-                    stage=stage,
-                    action=action,
-                    total_vms=total_vms,
-                    success_count=success_count,
-                    failure_count=failure_count,
-                    no_op_count=no_op_count,
-                    overall_status=overall_status
-                )
-                
-                # Add execution summary
-                email_body += f"\n\n=== EXECUTION SUMMARY ==="
-                email_body += f"\nVM Operations: {success_count} successful, {failure_count} failed, {len(no_op_vms['already_running']) + len(no_op_vms['already_stopped'])} no-op"
-                if action == "START":
-                    email_body += f"\nLoad Balancer Operations: {len(success_vms_lb)} successful, {len(no_op_lb)} no-op"
-                
-                # Add detailed operation breakdown
-                if success_vms_state or success_vms_lb:
-                    email_body += "\n\n=== SUCCESSFUL OPERATIONS ==="
-                    if success_vms_state:
-                        email_body += f"\nVM State Changes ({len(success_vms_state)}):"
-                        for i, vm_name in enumerate(success_vms_state, 1):
-                            email_body += f"\n  {i}. {vm_name} - {action}ED successfully"
-                    
-                    if success_vms_lb:
-                        email_body += f"\nLoad Balancer Operations ({len(success_vms_lb)}):"
-                        for i, vm_info in enumerate(success_vms_lb, 1):
-                            email_body += f"\n  {i}. {vm_info} - Added to Load Balancer"
-                
-                # Include no-op details only when there are also actual operations (for context)
-                if no_op_vms["already_running"] or no_op_vms["already_stopped"] or no_op_lb:
-                    email_body += "\n\n=== NO-OPERATION (ALREADY IN DESIRED STATE) ==="
-                    if no_op_vms["already_running"]:
-                        email_body += f"\nVMs Already Running ({len(no_op_vms['already_running'])}):"
-                        for i, vm_info in enumerate(no_op_vms["already_running"], 1):
-                            email_body += f"\n  {i}. {vm_info}"
-                    
-                    if no_op_vms["already_stopped"]:
-                        email_body += f"\nVMs Already Stopped ({len(no_op_vms['already_stopped'])}):"
-                        for i, vm_info in enumerate(no_op_vms["already_stopped"], 1):
-                            email_body += f"\n  {i}. {vm_info}"
-                    
-                    if no_op_lb:
-                        email_body += f"\nVMs Already in Load Balancer ({len(no_op_lb)}):"
-                        for i, vm_info in enumerate(no_op_lb, 1):
-                            email_body += f"\n  {i}. {vm_info}"
-                
-                if failed_vms:
-                    email_body += "\n\n=== FAILED OPERATIONS ==="
-                    email_body += f"\nFailed Operations ({len(failed_vms)}):"
-                    for i, failure in enumerate(failed_vms, 1):
-                        vm_name = failure.get('vm_name', 'Unknown')
-                        reason = failure.get('reason', 'No specific reason provided')
-                        # Truncate very long error messages for email readability
-                        if len(reason) > 200:
-                            reason = reason[:200] + "... (truncated)"
-                        email_body += f"\n  {i}. {vm_name}: {reason}"
-                    
-                    email_body += "\n\nACTION REQUIRED:"
-                    email_body += "\n• Check Oracle Functions logs for detailed error information"
-                    email_body += "\n• Verify VM and Load Balancer accessibility"
-                    email_body += "\n• Consider manual intervention if errors persist"
-                
-                send_email(
-                    signer=signer,
-                    topic_id=notification_topic_id,
-                    email_body=email_body,
-                    subject=subject
-                )
+        # One follow-up per Load Balancer; the configured schedule is reused only once so it is not overwritten
+        for index, (lb_id, new_backends) in enumerate(follow_up.items()):
+            schedule_follow_up(auto_scale_env, lb_id, compartment_id, function_id, schedule_id if index == 0 else None, new_backends)
 
-        return response.Response(ctx, response_data=json.dumps({"output": output, "logs": logs}), headers={"Content-Type": "application/json"})
+        multi_stage_response = {"target_stage": target_stage, "stages": stage_results, "logs": logs}
+        errors = [f"Stage {stage_name}: {result['error']}" for stage_name, result in stage_results.items() if result.get("error")]
+        if errors:
+            multi_stage_response["error"] = "; ".join(errors)
+        return response.Response(ctx, response_data=json.dumps(multi_stage_response), headers={"Content-Type": "application/json"})
 
     except Exception as e:
         error_msg = f"Unexpected error in Stage {stage if 'stage' in locals() else 'Unknown'} {action if 'action' in locals() else 'operation'}: {str(e)}"
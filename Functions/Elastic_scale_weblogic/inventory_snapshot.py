@@ -0,0 +1,168 @@
+"""
+Inventory snapshot shared by the functions and the Disaster Recovery scripts.
+
+Each section is a versioned JSON object in INVENTORY_BUCKET named inventory/<compartment_ocid>/<section>.json.
+A section is served from the warm process, then from the bucket, and only rebuilt once it is older than its TTL.
+Writes carry an etag precondition, so a refresh never overwrites a newer one stored concurrently.
+Without INVENTORY_BUCKET sections are only kept in the warm process.
+
+Canonical copy: Functions/common/inventory_snapshot.py. Each deployable unit carries a copy;
+run Functions/common/sync_copies.py after editing this file.
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from pagination import list_all
+except ImportError:
+    # Imported as common.inventory_snapshot by functions that are not built from their own directory
+    from .pagination import list_all
+
+INVENTORY_SCHEMA_VERSION = 1
+cache = {}  # Warm processes reuse the last snapshot per (compartment, section)
+
+
+def snapshot_configured():
+    return bool(os.environ.get("INVENTORY_BUCKET"))
+
+
+class SnapshotStore:
+    """
+    Reads and writes snapshot sections in INVENTORY_BUCKET through the given ObjectStorageClient.
+    """
+    def __init__(self, object_storage_client, bucket=None):
+        self.client = object_storage_client
+        self.bucket = bucket or os.environ.get("INVENTORY_BUCKET")
+
+    def namespace(self):
+        # Looked up once per process
+        if "namespace" not in cache:
+            cache["namespace"] = os.environ.get("INVENTORY_NAMESPACE") or self.client.get_namespace().data
+        return cache["namespace"]
+
+    def load(self, compartment_id, section):
+        """
+        :return: (snapshot, etag), or (None, None) when no compatible snapshot is stored
+        """
+        try:
+            stored = self.client.get_object(self.namespace(), self.bucket, f"inventory/{compartment_id}/{section}.json")
+            snapshot = json.loads(stored.data.content)
+        except Exception as e:
+            if getattr(e, "status", None) != 404:
+                logging.error(f"[ERROR] Failed to read {section} snapshot for {compartment_id}. Error: {str(e)}")
+            return None, None
+        if snapshot.get("version") != INVENTORY_SCHEMA_VERSION:
+            logging.warning(f"[WARN] Ignoring {section} snapshot with schema version {snapshot.get('version')}")
+            return None, None
+        return snapshot, stored.headers.get("etag")
+
+    def save(self, compartment_id, section, snapshot, etag=None):
+        """
+        Stores the section only if nobody replaced the version it was refreshed from.
+        """
+        try:
+            self.client.put_object(
+                self.namespace(), self.bucket, f"inventory/{compartment_id}/{section}.json",
+                json.dumps(snapshot, separators=(",", ":")),
+                content_type="application/json",
+                if_match=etag,
+                if_none_match=None if etag else "*")
+            logging.info(f"[INFO] Stored {section} snapshot revision {snapshot['revision']} for {compartment_id}")
+        except Exception as e:
+            if getattr(e, "status", None) in (409, 412):
+                logging.info(f"[INFO] A newer {section} snapshot was stored concurrently for {compartment_id}. Keeping it")
+            else:
+                logging.error(f"[ERROR] Failed to store {section} snapshot for {compartment_id}. Error: {str(e)}")
+
+
+def new_snapshot(compartment_id, previous=None, **sections):
+    return dict({
+        "version": INVENTORY_SCHEMA_VERSION,
+        "revision": (previous or {}).get("revision", 0) + 1,
+        "compartment_id": compartment_id,
+        "refreshed_at": time.time()
+    }, **sections)
+
+
+def get_section(compartment_id, section, refresh, store=None, ttl=None, save=True):
+    """
+    Returns a snapshot section, rebuilding it with refresh(previous) once older than ttl
+    (INVENTORY_TTL_SECONDS by default).
+    :param store: SnapshotStore to share the section through, or None to keep it in this process only
+    :param save: False for read-only consumers, whose refresh is not stored for others
+    """
+    ttl = ttl if ttl is not None else int(os.environ.get("INVENTORY_TTL_SECONDS", "300"))
+    cached = cache.get((compartment_id, section))
+    if cached and time.time() - cached["refreshed_at"] < ttl:
+        return cached
+    snapshot, etag = store.load(compartment_id, section) if store else (None, None)
+    if snapshot and time.time() - snapshot["refreshed_at"] < ttl:
+        cache[(compartment_id, section)] = snapshot
+        return snapshot
+    refreshed = refresh(snapshot or cached)
+    if store and save:
+        store.save(compartment_id, section, refreshed, etag)
+    cache[(compartment_id, section)] = refreshed
+    return refreshed
+
+
+def refresh_instances(compute_client, network_client, compartment_id, previous=None, resolve_ips=True, max_workers=10):
+    """
+    Builds the instances section: name, state and tags per instance, plus VNIC IPs with resolve_ips.
+    IP resolution lists the VNIC attachments and looks up only the VNICs missing from the previous
+    snapshot, since a VNIC keeps its private IP for its lifetime. Without it only list_instances runs.
+    """
+    instances = {}
+    for instance in list_all(compute_client.list_instances, compartment_id=compartment_id):
+        instances[instance.id] = {
+            "name": instance.display_name,
+            "state": instance.lifecycle_state,
+            "tags": instance.freeform_tags or {},
+            "availability_domain": instance.availability_domain,
+            "compartment_id": instance.compartment_id,
+            "vnics": {}
+        }
+    if not resolve_ips:
+        return new_snapshot(compartment_id, previous, instances=instances)
+
+    known_vnics = {
+        vnic_id: vnic
+        for record in ((previous or {}).get("instances") or {}).values()
+        for vnic_id, vnic in record.get("vnics", {}).items()
+        if vnic.get("ip")
+    }
+    attachments = [
+        attachment for attachment in list_all(compute_client.list_vnic_attachments, compartment_id=compartment_id)
+        if attachment.lifecycle_state == "ATTACHED" and attachment.instance_id in instances
+    ]
+
+    def resolve_vnic(vnic_id):
+        try:
+            vnic = network_client.get_vnic(vnic_id).data
+            return {"ip": vnic.private_ip, "primary": bool(vnic.is_primary)}
+        except Exception as e:
+            logging.warning(f"[WARN] Failed to get VNIC {vnic_id}. Error: {str(e)}")
+            return {"ip": None, "primary": False}
+
+    new_vnic_ids = [attachment.vnic_id for attachment in attachments if attachment.vnic_id not in known_vnics]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        resolved = dict(zip(new_vnic_ids, executor.map(resolve_vnic, new_vnic_ids)))
+    for attachment in attachments:
+        instances[attachment.instance_id]["vnics"][attachment.vnic_id] = known_vnics.get(attachment.vnic_id) or resolved[attachment.vnic_id]
+    logging.info(f"[INFO] Refreshed instance inventory for {compartment_id}: {len(instances)} instances, "
+                 f"{len(new_vnic_ids)} of {len(attachments)} VNICs looked up")
+    return new_snapshot(compartment_id, previous, instances=instances)
+
+
+def get_primary_ip(instance_record):
+    """
+    Returns the private IP of the instance's primary VNIC (or its first VNIC) from an inventory record.
+    """
+    vnics = list((instance_record or {}).get("vnics", {}).values())
+    for vnic in vnics:
+        if vnic.get("primary") and vnic.get("ip"):
+            return vnic["ip"]
+    return next((vnic["ip"] for vnic in vnics if vnic.get("ip")), None)
@@ -0,0 +1,162 @@
+"""
+Notification digest shared by the scaling and health check functions.
+
+Reports are grouped per environment into fixed NOTIFICATION_DIGEST_MINUTES windows in the NoSQL table named by
+NOTIFICATION_TABLE_NAME. The first report of a window is published immediately, later ones are buffered and
+published as one digest once the window has closed. Closed windows are flushed by the next report of the
+environment, or by a scheduled flush (the health check function in mode=flush) when no report follows.
+Every send is claimed with a conditional insert first, so concurrent invocations never send a report twice.
+
+Canonical copy: Functions/common/notification_digest.py. Each function directory is its own build context and
+carries a copy; run Functions/common/sync_copies.py after editing this file.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+EPOCH = datetime(1970, 1, 1)
+
+
+def digest_window():
+    return timedelta(minutes=float(os.environ.get("NOTIFICATION_DIGEST_MINUTES", "10")))
+
+
+def window_start(moment, window):
+    """
+    Returns the start of the fixed window containing moment. Windows are aligned to the epoch,
+    so every invocation places a report in the same window regardless of when it started.
+    """
+    return EPOCH + ((moment - EPOCH) // window) * window
+
+
+def claim(nosql_client, table_name, compartment_id, environment, marker):
+    """
+    Inserts the marker row only if it does not exist yet. Returns True for the single caller whose insert won.
+    """
+    from oci.nosql.models import UpdateRowDetails
+    result = nosql_client.update_row(
+        table_name_or_id=table_name,
+        update_row_details=UpdateRowDetails(
+            compartment_id=compartment_id,
+            option="IF_ABSENT",
+            value={
+                "Environment": environment,
+                "Id": marker,
+                "Kind": "DIGEST",
+                "Timestamp": datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+            },
+            ttl=int(os.environ.get("NOTIFICATION_RETENTION_DAYS", "1")))).data
+    return result.version is not None
+
+
+def buffer_report(nosql_client, table_name, compartment_id, environment, email_body, subject, now):
+    from oci.nosql.models import UpdateRowDetails
+    nosql_client.update_row(
+        table_name_or_id=table_name,
+        update_row_details=UpdateRowDetails(
+            compartment_id=compartment_id,
+            value={
+                "Environment": environment,
+                "Id": f"{now.strftime('%Y%m%d%H%M%S%f')}-{os.getpid()}",
+                "Kind": "REPORT",
+                "Timestamp": now.strftime(TIMESTAMP_FORMAT),
+                "Subject": subject,
+                "Body": email_body
+            },
+            ttl=int(os.environ.get("NOTIFICATION_RETENTION_DAYS", "1"))))
+
+
+def get_buffered_reports(nosql_client, table_name, compartment_id, before, environment=None):
+    """
+    Returns the reports buffered before the given time, for one environment or all of them, oldest first.
+    """
+    from oci.nosql.models import QueryDetails
+    statement = (
+        f"SELECT Environment, Id, Timestamp, Subject, Body FROM {table_name} "
+        f"WHERE Kind = 'REPORT' AND Timestamp < '{before.strftime(TIMESTAMP_FORMAT)}'"
+    )
+    if environment:
+        statement += f" AND Environment = '{environment}'"
+    reports = []
+    page = None
+    while True:
+        query_response = nosql_client.query(
+            query_details=QueryDetails(compartment_id=compartment_id, statement=statement),
+            page=page
+        )
+        reports.extend(query_response.data.items or [])
+        page = query_response.next_page
+        if not page:
+            break
+    return sorted(reports, key=lambda x: x.get("Timestamp", ""))
+
+
+def render_digest(environment, reports):
+    """
+    Returns (subject, body) for the reports of one closed window.
+    """
+    if len(reports) == 1:
+        return reports[0].get("Subject", ""), reports[0].get("Body", "")
+    body = f"Notification Digest for {environment}: {len(reports)} reports since {reports[0].get('Timestamp', '')[:19]} UTC"
+    for i, report in enumerate(reports, 1):
+        body += f"\n\n=== {i}. {report.get('Subject', '')} ({report.get('Timestamp', '')[:19]}) ===\n{report.get('Body', '')}"
+    return f"Auto Scale Digest - {environment} - {len(reports)} reports", body
+
+
+def flush_closed_windows(nosql_client, table_name, compartment_id, send, environment=None, now=None):
+    """
+    Publishes the buffered reports of every window that closed at least NOTIFICATION_FLUSH_GRACE_SECONDS ago,
+    for one environment or all of them, and deletes them. Returns the number of messages sent.
+    :param send: Callable taking (email_body, subject) that publishes one message
+    """
+    now = now or datetime.utcnow()
+    window = digest_window()
+    grace = timedelta(seconds=float(os.environ.get("NOTIFICATION_FLUSH_GRACE_SECONDS", "60")))
+    # A window is only flushed after the grace period, so a report written at the window end is not missed
+    cutoff = window_start(now - grace, window)
+    windows = {}
+    for report in get_buffered_reports(nosql_client, table_name, compartment_id, cutoff, environment):
+        started = window_start(datetime.strptime(report["Timestamp"], TIMESTAMP_FORMAT), window)
+        windows.setdefault((report["Environment"], started), []).append(report)
+    sent = 0
+    for (report_environment, started), reports in sorted(windows.items()):
+        # Only the invocation whose claim wins publishes the window; the others leave it alone
+        if not claim(nosql_client, table_name, compartment_id, report_environment, f"FLUSH#{started.strftime('%Y%m%d%H%M%S')}"):
+            continue
+        subject, body = render_digest(report_environment, reports)
+        send(body, subject)
+        sent += 1
+        for report in reports:
+            try:
+                nosql_client.delete_row(table_name_or_id=table_name,
+                                        key=[f"Environment:{report_environment}", f"Id:{report['Id']}"],
+                                        compartment_id=compartment_id)
+            except Exception as e:
+                # The flush marker keeps the report from being sent again; the row expires with its TTL
+                logging.warning(f"[WARN] Failed to delete flushed report {report['Id']} for {report_environment}. Error: {str(e)}")
+    return sent
+
+
+def notify(nosql_client, table_name, compartment_id, environment, email_body, subject, send):
+    """
+    Publishes a non-critical report through the digest: flushes the environment's closed windows, then sends the
+    report now if it is the first of the current window, or buffers it for that window's digest.
+    :param send: Callable taking (email_body, subject) that publishes one message
+    """
+    now = datetime.utcnow()
+    try:
+        flush_closed_windows(nosql_client, table_name, compartment_id, send, environment, now)
+    except Exception as e:
+        logging.error(f"[ERROR] Failed to flush notification digests for {environment}. Error: {str(e)}")
+    try:
+        started = window_start(now, digest_window())
+        if claim(nosql_client, table_name, compartment_id, environment, f"FIRST#{started.strftime('%Y%m%d%H%M%S')}"):
+            send(email_body, subject)
+            return
+        buffer_report(nosql_client, table_name, compartment_id, environment, email_body, subject, now)
+        logging.info(f"[INFO] Report buffered for environment {environment}. Next digest after {(started + digest_window()).strftime('%H:%M:%S')} UTC")
+    except Exception as e:
+        # Never lose a report because the buffer is unavailable
+        logging.error(f"[ERROR] Notification aggregation failed for {environment}, sending report directly. Error: {str(e)}")
+        send(email_body, subject)
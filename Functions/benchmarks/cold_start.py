@@ -0,0 +1,126 @@
+######################################################################################################
+# Cold-start benchmark for the Fn functions: module import time and time to first response.
+#
+# Every sample runs in a fresh interpreter so nothing is cached between samples. The first response
+# comes from a payload the handler answers without changing anything in the tenancy (input validation
+# or authentication failure outside OCI), which covers the import, the fdk response path and whatever
+# the handler loads before its first SDK call.
+#
+# Usage  : python3 Functions/benchmarks/cold_start.py [--runs 5] [--json]
+# Requires the functions' requirements (fdk, oci, requests) to be installed.
+#
+######################################################################################################
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Function name -> (path to func.py, payload for the first invocation)
+FUNCTIONS = {
+    "Elastic_scale_weblogic": (
+        os.path.join(FUNCTIONS_DIR, "Elastic_scale_weblogic", "func.py"),
+        {"body": json.dumps({"action": "START"})}
+    ),
+    "check_load_balancer_health": (
+        os.path.join(FUNCTIONS_DIR, "check_load_balancer_health", "func.py"),
+        {"auto_scale_env": "benchmark", "lb_id": "ocid1.loadbalancer.oc1..benchmark", "compartment_id": "ocid1.compartment.oc1..benchmark"}
+    ),
+}
+
+
+class FakeContext:
+    """
+    Minimal stand-in for the fdk invocation context.
+    """
+    def Config(self):
+        return {}
+
+    def SetResponseHeaders(self, headers, status_code):
+        self.headers = headers
+        self.status_code = status_code
+
+
+class FakeData:
+    def __init__(self, payload):
+        self._value = json.dumps(payload).encode()
+
+    def getvalue(self):
+        return self._value
+
+
+def measure_once(func_path, payload):
+    """
+    Imports func.py and invokes its handler once. Runs inside the child interpreter.
+    """
+    start = time.perf_counter()
+    # The function imports its sibling modules, as it does from /function in the Fn image
+    sys.path.insert(0, os.path.dirname(func_path))
+    spec = importlib.util.spec_from_file_location("func", func_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    imported = time.perf_counter()
+    module.handler(FakeContext(), FakeData(payload))
+    responded = time.perf_counter()
+    return {
+        "import_ms": (imported - start) * 1000,
+        "first_response_ms": (responded - start) * 1000,
+        "oci_modules_loaded": len([name for name in sys.modules if name == "oci" or name.startswith("oci.")]),
+    }
+
+
+def run_sample(name):
+    """
+    Runs one cold-start sample for a function in a fresh interpreter.
+    """
+    env = dict(os.environ)
+    # Never publish notifications from a benchmark run
+    env.pop("wlsc_email_notification_topic_id", None)
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", name],
+        capture_output=True, text=True, env=env, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start latency of the Fn functions.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh-interpreter samples per function.")
+    parser.add_argument("--function", choices=sorted(FUNCTIONS), action="append", help="Function to measure (default: all).")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        func_path, payload = FUNCTIONS[args.child]
+        print(json.dumps(measure_once(func_path, payload)))
+        return
+
+    results = {}
+    for name in args.function or sorted(FUNCTIONS):
+        samples = [run_sample(name) for _ in range(args.runs)]
+        results[name] = {
+            "runs": args.runs,
+            "import_ms_median": statistics.median(s["import_ms"] for s in samples),
+            "first_response_ms_median": statistics.median(s["first_response_ms"] for s in samples),
+            "first_response_ms_max": max(s["first_response_ms"] for s in samples),
+            "oci_modules_loaded": samples[-1]["oci_modules_loaded"],
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'Function':<30} {'Import (ms)':>12} {'First resp (ms)':>16} {'Max (ms)':>10} {'oci modules':>12}")
+    for name, result in results.items():
+        print(f"{name:<30} {result['import_ms_median']:>12.1f} {result['first_response_ms_median']:>16.1f} "
+              f"{result['first_response_ms_max']:>10.1f} {result['oci_modules_loaded']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+######################################################################################################
+# In-memory stand-ins for the OCI clients used by the Fn functions, for local benchmarks.
+#
+# The stand-ins answer from generated data, count every call and can add a fixed latency per call,
+# so a benchmark measures the function's own behavior against a predictable service.
+#
+######################################################################################################
+
+import threading
+import time
+from types import SimpleNamespace
+
+
+class CallCounter:
+    """
+    Counts calls per method across the stand-ins and applies the injected latency. Thread safe.
+    """
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000.0
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, method):
+        with self._lock:
+            self.counts[method] = self.counts.get(method, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def total(self):
+        return sum(self.counts.values())
+
+
+class FakeMonitoringClient:
+    """
+    Stand-in for the telemetry-ingestion MonitoringClient. Records the size of every post_metric_data request
+    and rejects requests over the service limit, as the real endpoint does.
+    """
+    MAX_METRIC_STREAMS = 50
+
+    def __init__(self, counter=None):
+        self.counter = counter or CallCounter()
+        self.batch_sizes = []
+        self._lock = threading.Lock()
+
+    def post_metric_data(self, post_metric_data_details, **kwargs):
+        self.counter.record("post_metric_data")
+        batch = post_metric_data_details.metric_data
+        if len(batch) > self.MAX_METRIC_STREAMS:
+            raise ValueError(f"post_metric_data received {len(batch)} metric streams, the limit is {self.MAX_METRIC_STREAMS}")
+        with self._lock:
+            self.batch_sizes.append(len(batch))
+        return SimpleNamespace(data=SimpleNamespace(failed_metrics_count=0, failed_metrics=[]))
+
+
+class FakeServiceError(Exception):
+    """
+    Stand-in for oci.exceptions.ServiceError.
+    """
+    def __init__(self, status, message=""):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def page_of(items, page, page_size):
+    """
+    Returns one page of a list call the way the SDK does: data, has_next_page and next_page.
+    """
+    start = int(page or 0)
+    end = start + page_size
+    return SimpleNamespace(data=items[start:end], has_next_page=end < len(items), next_page=str(end) if end < len(items) else None)
+
+
+def private_ip(i):
+    return f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+
+
+class SyntheticTenancy:
+    """
+    Generated compartment with one load balancer. Every instance has one VNIC in a single subnet; the first `backends`
+    instances are the load balancer backends, spread over `backend_sets` sets, and every
+    `unhealthy_every`-th backend is CRITICAL.
+    """
+    def __init__(self, backends, instances, backend_sets=2, unhealthy_every=50, page_size=100):
+        self.compartment_id = "ocid1.compartment.oc1..synthetic"
+        self.lb_id = "ocid1.loadbalancer.oc1..synthetic"
+        self.page_size = page_size
+        self.instances = [
+            SimpleNamespace(
+                id=f"ocid1.instance.oc1..{i}", display_name=f"wls-{i}", lifecycle_state="RUNNING", freeform_tags={},
+                availability_domain="AD-1", compartment_id=self.compartment_id
+            )
+            for i in range(max(instances, backends))
+        ]
+        self.attachments = [
+            SimpleNamespace(instance_id=instance.id, vnic_id=f"ocid1.vnic.oc1..{i}", subnet_id="ocid1.subnet.oc1..synthetic", lifecycle_state="ATTACHED")
+            for i, instance in enumerate(self.instances)
+        ]
+        self.vnics = {f"ocid1.vnic.oc1..{i}": SimpleNamespace(private_ip=private_ip(i), is_primary=True) for i in range(len(self.instances))}
+        self.vnic_ids_by_ip = {vnic.private_ip: vnic_id for vnic_id, vnic in self.vnics.items()}
+        self.backend_sets = {f"bs{s}": SimpleNamespace(policy="ROUND_ROBIN", backends=[]) for s in range(backend_sets)}
+        self.backend_status = {}
+        for i in range(backends):
+            backend = SimpleNamespace(name=f"{private_ip(i)}:7001", ip_address=private_ip(i), port=7001, offline=False, weight=1)
+            self.backend_sets[f"bs{i % backend_sets}"].backends.append(backend)
+            self.backend_status[backend.name] = "CRITICAL" if unhealthy_every and i % unhealthy_every == unhealthy_every - 1 else "OK"
+
+
+class FakeLoadBalancerClient:
+    def __init__(self, tenancy, counter):
+        self.tenancy = tenancy
+        self.counter = counter
+
+    def get_load_balancer(self, load_balancer_id, **kwargs):
+        self.counter.record("get_load_balancer")
+        return SimpleNamespace(data=SimpleNamespace(
+            id=load_balancer_id, display_name="synthetic-lb", compartment_id=self.tenancy.compartment_id,
+            backend_sets=self.tenancy.backend_sets
+        ))
+
+    def get_load_balancer_health(self, load_balancer_id, **kwargs):
+        self.counter.record("get_load_balancer_health")
+        unhealthy = any(status != "OK" for status in self.tenancy.backend_status.values())
+        return SimpleNamespace(data=SimpleNamespace(status="WARNING" if unhealthy else "OK"))
+
+    def get_backend_set_health(self, load_balancer_id, backend_set_name, **kwargs):
+        self.counter.record("get_backend_set_health")
+        critical = [backend.name for backend in self.tenancy.backend_sets[backend_set_name].backends
+                    if self.tenancy.backend_status[backend.name] == "CRITICAL"]
+        return SimpleNamespace(data=SimpleNamespace(
+            status="CRITICAL" if critical else "OK",
+            unknown_state_backend_names=[], warning_state_backend_names=[], critical_state_backend_names=critical
+        ))
+
+    def get_backend_health(self, load_balancer_id, backend_set_name, backend_name, **kwargs):
+        self.counter.record("get_backend_health")
+        status = self.tenancy.backend_status[backend_name]
+        return SimpleNamespace(data=SimpleNamespace(
+            status=status, health_check_results=[SimpleNamespace(health_check_status="CONNECT_FAILED" if status != "OK" else "OK")]
+        ))
+
+    def list_load_balancers(self, compartment_id, page=None, **kwargs):
+        self.counter.record("list_load_balancers")
+        return page_of([SimpleNamespace(id=self.tenancy.lb_id, freeform_tags={})], page, self.tenancy.page_size)
+
+
+class FakeComputeClient:
+    def __init__(self, tenancy, counter):
+        self.tenancy = tenancy
+        self.counter = counter
+
+    def list_instances(self, compartment_id, page=None, **kwargs):
+        self.counter.record("list_instances")
+        return page_of(self.tenancy.instances, page, self.tenancy.page_size)
+
+    def list_vnic_attachments(self, compartment_id, page=None, **kwargs):
+        self.counter.record("list_vnic_attachments")
+        return page_of(self.tenancy.attachments, page, self.tenancy.page_size)
+
+
+class FakeVirtualNetworkClient:
+    def __init__(self, tenancy, counter):
+        self.tenancy = tenancy
+        self.counter = counter
+
+    def get_vnic(self, vnic_id, **kwargs):
+        self.counter.record("get_vnic")
+        if vnic_id not in self.tenancy.vnics:
+            raise FakeServiceError(404, f"VNIC {vnic_id} not found")
+        return SimpleNamespace(data=self.tenancy.vnics[vnic_id])
+
+    def list_private_ips(self, subnet_id=None, ip_address=None, **kwargs):
+        self.counter.record("list_private_ips")
+        vnic_id = self.tenancy.vnic_ids_by_ip.get(ip_address)
+        return SimpleNamespace(data=[SimpleNamespace(ip_address=ip_address, vnic_id=vnic_id)] if vnic_id else [])
+
+
+def fake_oci(tenancy, counter, monitoring_client=None):
+    """
+    Returns an object that stands in for the oci package inside a function module, with every client
+    bound to the synthetic tenancy and the shared call counter.
+    """
+    monitoring_client = monitoring_client or FakeMonitoringClient(counter)
+    return SimpleNamespace(
+        auth=SimpleNamespace(signers=SimpleNamespace(
+            get_resource_principals_signer=lambda: SimpleNamespace(region="us-phoenix-1")
+        )),
+        load_balancer=SimpleNamespace(LoadBalancerClient=lambda config=None, signer=None, **kwargs: FakeLoadBalancerClient(tenancy, counter)),
+        core=SimpleNamespace(
+            ComputeClient=lambda config=None, signer=None, **kwargs: FakeComputeClient(tenancy, counter),
+            VirtualNetworkClient=lambda config=None, signer=None, **kwargs: FakeVirtualNetworkClient(tenancy, counter)
+        ),
+        monitoring=SimpleNamespace(
+            MonitoringClient=lambda config=None, signer=None, **kwargs: monitoring_client,
+            models=SimpleNamespace(
+                MetricDataDetails=lambda **kwargs: SimpleNamespace(**kwargs),
+                Datapoint=lambda **kwargs: SimpleNamespace(**kwargs),
+                PostMetricDataDetails=lambda **kwargs: SimpleNamespace(**kwargs)
+            )
+        ),
+        exceptions=SimpleNamespace(ServiceError=FakeServiceError)
+    )
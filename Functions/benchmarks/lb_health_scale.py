@@ -0,0 +1,116 @@
+######################################################################################################
+# Scalability benchmark for check_load_balancer_health.handler.
+#
+# Runs the handler end to end against in-memory LoadBalancer, Compute and VirtualNetwork stand-ins
+# (fake_clients.py) for synthetic load balancers of growing size. Each SDK call sleeps for the injected
+# latency. Every case runs in a freshly loaded module so the inventory cache starts empty, once for the
+# API call counts and wall-clock time and once under tracemalloc for peak memory. A second invocation in
+# the same module measures a warm container, which reuses the cached inventory.
+#
+# Usage  : python3 Functions/benchmarks/lb_health_scale.py [--backends 10 100 1000] [--instances 5000]
+#                                                          [--latency-ms 5] [--metrics] [--json]
+# Requires fdk to be installed; the oci package is replaced by the stand-ins.
+#
+######################################################################################################
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from cold_start import FakeContext, FakeData
+from fake_clients import CallCounter, FakeMonitoringClient, SyntheticTenancy, fake_oci
+
+FUNC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "check_load_balancer_health", "func.py")
+
+# Settings that would make the handler reach real services or change what it reports
+ISOLATED_ENV = [
+    "wlsc_email_notification_topic_id", "INVENTORY_BUCKET", "HEALTH_HISTORY_TABLE_NAME", "METRICS_NAMESPACE", "PROBE_BACKENDS"
+]
+
+
+def load_function(tenancy, counter, monitoring_client):
+    # The function imports its sibling modules, as it does from /function in the Fn image
+    sys.path.insert(0, os.path.dirname(FUNC_PATH))
+    # A fresh copy of the shared modules too, so every case starts without their warm caches
+    for name in ("inventory_snapshot", "notification_digest", "pagination"):
+        sys.modules.pop(name, None)
+    spec = importlib.util.spec_from_file_location("func", FUNC_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.oci = fake_oci(tenancy, counter, monitoring_client)
+    return module
+
+
+def run_case(backends, instances, latency_ms, trace_memory=False):
+    """
+    Invokes the handler for a synthetic load balancer, cold and then warm, and returns its measurements.
+    """
+    tenancy = SyntheticTenancy(backends, instances)
+    counter = CallCounter(latency_ms)
+    monitoring_client = FakeMonitoringClient(counter)
+    func = load_function(tenancy, counter, monitoring_client)
+    payload = {"auto_scale_env": "benchmark", "lb_id": tenancy.lb_id, "compartment_id": tenancy.compartment_id}
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    func.handler(FakeContext(), FakeData(payload))
+    elapsed = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    cold_calls = counter.total()
+    warm_start = time.perf_counter()
+    func.handler(FakeContext(), FakeData(payload))
+    warm_elapsed = time.perf_counter() - warm_start
+    return {
+        "backends": backends,
+        "instances": len(tenancy.instances),
+        "api_calls": cold_calls,
+        "calls": dict(sorted(counter.counts.items())),
+        "wall_ms": elapsed * 1000,
+        "warm_api_calls": counter.total() - cold_calls,
+        "warm_wall_ms": warm_elapsed * 1000,
+        "peak_mib": peak / (1024 * 1024) if peak is not None else None,
+        "metric_requests": len(monitoring_client.batch_sizes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how the LB health function scales with backends and VNICs.")
+    parser.add_argument("--backends", type=int, nargs="+", default=[10, 100, 1000], help="Backend counts to run.")
+    parser.add_argument("--instances", type=int, default=5000, help="Instances (one VNIC each) in the compartment.")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Latency injected into every SDK call.")
+    parser.add_argument("--metrics", action="store_true", help="Also publish custom metrics to the Monitoring stand-in.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    for name in ISOLATED_ENV:
+        os.environ.pop(name, None)
+    if args.metrics:
+        os.environ["METRICS_NAMESPACE"] = "custom_lb_health_benchmark"
+
+    results = []
+    for backends in args.backends:
+        result = run_case(backends, args.instances, args.latency_ms)
+        result["peak_mib"] = run_case(backends, args.instances, 0, trace_memory=True)["peak_mib"]
+        results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'Backends':>9} {'Instances':>10} {'API calls':>10} {'Wall (ms)':>10} {'Warm calls':>11} {'Warm (ms)':>10} "
+          f"{'Peak (MiB)':>11}  Calls (cold + warm)")
+    for result in results:
+        calls = ", ".join(f"{method}={count}" for method, count in result["calls"].items())
+        print(f"{result['backends']:>9} {result['instances']:>10} {result['api_calls']:>10} {result['wall_ms']:>10.1f} "
+              f"{result['warm_api_calls']:>11} {result['warm_wall_ms']:>10.1f} {result['peak_mib']:>11.1f}  {calls}")
+
+
+if __name__ == "__main__":
+    main()
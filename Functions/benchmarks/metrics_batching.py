@@ -0,0 +1,94 @@
+######################################################################################################
+# Checks how check_load_balancer_health batches its custom metrics against a local Monitoring stand-in.
+#
+# Builds the health of a synthetic load balancer, publishes its metrics to FakeMonitoringClient and
+# verifies that every post_metric_data request stays within the service limit and that the metrics fit
+# in the fewest requests the limit allows.
+#
+# Usage  : python3 Functions/benchmarks/metrics_batching.py [--backends 1000] [--probed] [--json]
+# Requires the functions' requirements (fdk, oci) to be installed.
+#
+######################################################################################################
+
+import argparse
+import importlib.util
+import json
+import math
+import os
+import sys
+
+from fake_clients import FakeMonitoringClient
+
+FUNC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "check_load_balancer_health", "func.py")
+
+
+def load_function():
+    # The function imports its sibling modules, as it does from /function in the Fn image
+    sys.path.insert(0, os.path.dirname(FUNC_PATH))
+    spec = importlib.util.spec_from_file_location("func", FUNC_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_lb_health(backends, backend_sets=2, probed=False):
+    """
+    Returns collect_lb_health shaped data for one load balancer with the given number of backends.
+    """
+    lb_health = {
+        "lb_id": "ocid1.loadbalancer.oc1..benchmark",
+        "name": "benchmark-lb",
+        "compartment_id": "ocid1.compartment.oc1..benchmark",
+        "status": "OK",
+        "backend_sets": [{"name": f"bs{i}", "policy": "ROUND_ROBIN", "status": "OK", "backends": []} for i in range(backend_sets)]
+    }
+    for i in range(backends):
+        backend = {
+            "name": f"10.0.{i // 250}.{i % 250 + 1}:7001",
+            "ip_address": f"10.0.{i // 250}.{i % 250 + 1}",
+            "port": 7001,
+            "vm_name": f"wls-{i}",
+            "status": "CRITICAL" if i % 97 == 0 else "OK",
+            "health_check_status": None,
+            "offline": False,
+            "weight": 1
+        }
+        if probed:
+            backend["latency"] = {"p50": 2.0, "p95": 5.0, "p99": 9.0, "samples": 5, "errors": 0}
+            backend["slow"] = False
+        lb_health["backend_sets"][i % backend_sets]["backends"].append(backend)
+    return lb_health
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify custom metric batching of the LB health function.")
+    parser.add_argument("--backends", type=int, default=1000, help="Backends in the synthetic load balancer.")
+    parser.add_argument("--probed", action="store_true", help="Include probe latency metrics.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    func = load_function()
+    metric_data = func.build_health_metrics("benchmark", [synthetic_lb_health(args.backends, probed=args.probed)], "custom_lb_health")
+    monitoring_client = FakeMonitoringClient()
+    published = func.publish_health_metrics(monitoring_client, metric_data)
+
+    expected_requests = math.ceil(len(metric_data) / FakeMonitoringClient.MAX_METRIC_STREAMS)
+    result = {
+        "metrics": len(metric_data),
+        "requests": monitoring_client.counter.counts.get("post_metric_data", 0),
+        "expected_requests": expected_requests,
+        "largest_batch": max(monitoring_client.batch_sizes, default=0),
+        "all_metrics_posted": sum(monitoring_client.batch_sizes) == len(metric_data) == published["metrics"],
+    }
+    ok = result["all_metrics_posted"] and result["requests"] == expected_requests
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"Metrics: {result['metrics']}, requests: {result['requests']} (minimum {expected_requests}), "
+              f"largest batch: {result['largest_batch']}, all posted: {result['all_metrics_posted']}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
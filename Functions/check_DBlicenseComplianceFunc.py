@@ -1,49 +1,41 @@
 import io
 import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import oci
 
 from fdk import response
 
+from common import inventory_snapshot
+from common.pagination import list_all
+
 def handler(ctx, data: io.BytesIO = None):
     signer = oci.auth.signers.InstancePrincipalsSecurityTokenSigner()
 
-    # Create a Database Client
-    database_client = oci.database.DatabaseClient(config={}, signer=signer)
-
-    # Fetch OCPUs for specified compartments
-    compartments = ["ocid1.compartment.oc1..aaaaaaaag7i5udfevx5ken6cizlvmaxavs4bwowhu5uju525gjng6bv7java",
-                    "ocid1.compartment.oc1..aaaaaaaazj7knskadrghyj3u5ydzfpqtxdbhijbh5nbukpkhl2mx46a6wada",
-                    "ocid1.compartment.oc1..aaaaaaaaeuw5rxabf4gquj3v3f6fnznxcs4otnckkvm6tdjuyuf3uouplq6q"]
-
-    total_dbsc_ocpus = 0
-    total_exacs_ocpus = 0
-    total_ecpu = 0
+    # Fetch OCPUs for every active compartment of the tenancy, or of LICENSE_ROOT_COMPARTMENT_OCID and its subtree,
+    # in every subscribed region
+    compartments = get_compartments(signer, os.environ.get("LICENSE_ROOT_COMPARTMENT_OCID"))
 
-    for compartment_id in compartments:
-        dbsc_ocpus, exacs_ocpus, ecpu = fetch_ocpus(database_client, compartment_id)
-        total_dbsc_ocpus += dbsc_ocpus
-        total_exacs_ocpus += exacs_ocpus
-        total_ecpu += ecpu
-
-    total_ocpus = total_dbsc_ocpus + total_exacs_ocpus + total_ecpu
+    if os.environ.get("LICENSE_USAGE_TABLE_NAME") and os.environ.get("LICENSE_USAGE_TABLE_COMPARTMENT_OCID"):
+        totals = track_license_usage(compartments, signer)
+    else:
+        totals = collect_regions(compartments, signer)
+    total_ocpus = totals["dbsc_ocpus"] + totals["exacs_ocpus"] + totals["ecpu"]
 
     # Capture the latest DB License Count from Table
     nosql_client = oci.nosql.NosqlClient(config={}, signer=signer)
-    query_statement = "SELECT * FROM BYOL_TRACKING"
-    query_details = oci.nosql.models.QueryDetails(
-        statement=query_statement,
-        compartment_id="ocid1.compartment.oc1..aaaaaaaaf224un52mucus6itsvarcqqcekwwfp2rrgfpqyntm3k37u3kcs3q"
-    )
-    query_response = nosql_client.query(query_details)
-    sorted_data = sorted(query_response.data.items, key=lambda x: x['Date'], reverse=True)
-    Db_LicenseCount = sorted_data[0]['OCPU_Count']
+    Db_LicenseCount = get_license_count(nosql_client)
 
     # Check if the total OCPUs exceed the licensed count
     if total_ocpus > Db_LicenseCount:
         # Publish a message to the specified topic if there is a violation
         ons_client = oci.ons.NotificationDataPlaneClient(config={}, signer=signer)
         topic_ocid = "ocid1.onstopic.oc1.phx.aaaaaaaams3o5atjlwu6xshjaap6difh7njz54dh52gsnw33hkhdkpkfx6za"
-        message = "Hello team,\n\nCurrent OCPU and ECPU Count is {} , which is greater than the actual License Count {}.\n\nThanks".format(total_ocpus, Db_LicenseCount)
+        region_counts = "\n".join("  {}: {}".format(region, usage["dbsc_ocpus"] + usage["exacs_ocpus"] + usage["ecpu"])
+                                  for region, usage in sorted(totals["regions"].items()))
+        message = "Hello team,\n\nCurrent OCPU and ECPU Count is {} , which is greater than the actual License Count {}.\n\nPer region:\n{}\n\nThanks".format(total_ocpus, Db_LicenseCount, region_counts)
         publish_message_response = ons_client.publish_message(
             topic_id=topic_ocid,
             message_details=oci.ons.models.MessageDetails(
@@ -57,45 +49,419 @@ def handler(ctx, data: io.BytesIO = None):
             print("Error publishing message. Status code:", publish_message_response.status)
 
     # Return a JSON response
-    resp = {"total_ocpus": total_ocpus}
+    resp = {"total_ocpus": total_ocpus, "compartments": len(compartments), "failed_compartments": totals["failed_compartments"],
+            "mode": totals.get("mode", "full"), "regions": totals["regions"], "license_models": totals["license_models"]}
     return response.Response(
         ctx,
         response_data=json.dumps(resp),
         headers={"Content-Type": "application/json"}
     )
 
-def fetch_ocpus(database_client, compartment):
-    dbsc_ocpus = 0
-    exacs_ocpus = 0
-    ecpu = 0
-
-    # Fetching OCPUs of base database
-    list_db_systems_response = database_client.list_db_systems(
-        compartment_id=compartment)
-    for db_system in list_db_systems_response.data:
-        # Check for the license type
-        if db_system.license_model == "BRING_YOUR_OWN_LICENSE":
-            dbsc_ocpus += db_system.cpu_core_count
-    
-    # Fetching OCPUs of Exa VMCluster database
-    list_cloud_vm_clusters_response = database_client.list_cloud_vm_clusters(
-        compartment_id=compartment)
-    for vm_cluster in list_cloud_vm_clusters_response.data:
-        # Check for the license type
-        if vm_cluster.license_model == "BRING_YOUR_OWN_LICENSE":
-            exacs_ocpus += vm_cluster.cpu_core_count
-    
-    # Fetching OCPUs of Autonomous Databases
-    list_autonomous_databases_response = database_client.list_autonomous_databases(
-        compartment_id=compartment)
-    for autonomous_db in list_autonomous_databases_response.data:
-        if autonomous_db.license_model == "BRING_YOUR_OWN_LICENSE":
-            if autonomous_db.is_auto_scaling_enabled:
-                # If autoscaling is enabled, use current OCPU and multiply by 3
-                ecpu += autonomous_db.cpu_core_count * 3
-            else:
-                # If autoscaling is not enabled, use the specified CPU core count
-                ecpu += autonomous_db.cpu_core_count
-    return dbsc_ocpus, exacs_ocpus, ecpu
+# Latest BYOL_TRACKING row, kept in the warm container for LICENSE_CACHE_SECONDS
+license_cache = {}
+
+def get_license_count(nosql_client):
+    cached = license_cache.get("count")
+    if cached and time.time() - cached["fetched_at"] < int(os.environ.get("LICENSE_CACHE_SECONDS", "300")):
+        return cached["value"]
+    # The service sorts and returns only the newest row, so the cost does not grow with the stored history.
+    # ORDER BY needs Date to be the primary key or indexed: CREATE INDEX idx_date ON BYOL_TRACKING(Date)
+    table_name = os.environ.get("BYOL_TABLE_NAME", "BYOL_TRACKING")
+    query_details = oci.nosql.models.QueryDetails(
+        statement="SELECT OCPU_Count, Date FROM {} ORDER BY Date DESC LIMIT 1".format(table_name),
+        compartment_id=os.environ.get("BYOL_TABLE_COMPARTMENT_OCID", "ocid1.compartment.oc1..aaaaaaaaf224un52mucus6itsvarcqqcekwwfp2rrgfpqyntm3k37u3kcs3q")
+    )
+    page = None
+    while True:
+        # A query page can come back empty with more to read, so keep paging until the row arrives
+        query_response = nosql_client.query(query_details, page=page)
+        if query_response.data.items:
+            license_count = query_response.data.items[0]["OCPU_Count"]
+            break
+        page = query_response.next_page
+        if not page:
+            raise ValueError("No license count found in {}".format(table_name))
+    license_cache["count"] = {"value": license_count, "fetched_at": time.time()}
+    return license_count
+
+def get_snapshot_store(signer):
+    # Inventory sections are shared through INVENTORY_BUCKET when it is set (see common/inventory_snapshot.py)
+    if not inventory_snapshot.snapshot_configured():
+        return None
+    return inventory_snapshot.SnapshotStore(oci.object_storage.ObjectStorageClient(config={}, signer=signer))
+
+def refresh_database_inventory(database_client, compartment, previous=None):
+    def summarize(resource):
+        return {
+            "name": resource.display_name,
+            "license_model": resource.license_model,
+            "cpu_core_count": resource.cpu_core_count,
+            "is_auto_scaling_enabled": getattr(resource, "is_auto_scaling_enabled", None)
+        }
+
+    def collect(list_method):
+        return {resource.id: summarize(resource) for resource in list_all(list_method, compartment_id=compartment)}
+
+    # The three resource types are listed concurrently, each paging through all of its results
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        db_systems = executor.submit(collect, database_client.list_db_systems)
+        cloud_vm_clusters = executor.submit(collect, database_client.list_cloud_vm_clusters)
+        autonomous_databases = executor.submit(collect, database_client.list_autonomous_databases)
+        return inventory_snapshot.new_snapshot(
+            compartment, previous,
+            db_systems=db_systems.result(),
+            cloud_vm_clusters=cloud_vm_clusters.result(),
+            autonomous_databases=autonomous_databases.result())
+
+def get_database_inventory(database_client, compartment, signer, region):
+    # Served from the warm container or the shared snapshot; the list calls only run once it is older than the TTL
+    return inventory_snapshot.get_section(
+        compartment, "databases-{}".format(region),
+        lambda previous: refresh_database_inventory(database_client, compartment, previous),
+        get_snapshot_store(signer))
+
+def resource_contribution(resource_type, record):
+    # Returns the total the resource counts towards and its BYOL OCPUs
+    category = {"db_systems": "dbsc_ocpus", "cloud_vm_clusters": "exacs_ocpus", "autonomous_databases": "ecpu"}[resource_type]
+    if record["license_model"] != "BRING_YOUR_OWN_LICENSE":
+        return category, 0
+    if resource_type == "autonomous_databases" and record["is_auto_scaling_enabled"]:
+        # If autoscaling is enabled, use current OCPU and multiply by 3
+        return category, record["cpu_core_count"] * 3
+    return category, record["cpu_core_count"]
+
+def contribution_record(resource_type, record, compartment, region):
+    category, ocpus = resource_contribution(resource_type, record)
+    return {"type": resource_type, "compartment_id": compartment, "region": region, "category": category, "ocpus": ocpus,
+            "license_model": record["license_model"], "cpu_core_count": record["cpu_core_count"]}
+
+def fetch_contributions(database_client, compartment, signer, region):
+    # Per resource BYOL OCPUs of base databases, Exa VM clusters and Autonomous Databases in the compartment
+    inventory = get_database_inventory(database_client, compartment, signer, region)
+    contributions = {}
+    for resource_type in ("db_systems", "cloud_vm_clusters", "autonomous_databases"):
+        for resource_id, record in inventory[resource_type].items():
+            contributions[resource_id] = contribution_record(resource_type, record, compartment, region)
+    return contributions
+
+def collect_ocpus(database_client, compartments, signer, region, contributions=None):
+    # Compartments are collected concurrently and each one is added to the totals as soon as it completes.
+    # Per resource contributions are also added to the contributions dict when one is passed in
+    totals = {"dbsc_ocpus": 0, "exacs_ocpus": 0, "ecpu": 0, "failed_compartments": []}
+    with ThreadPoolExecutor(max_workers=int(os.environ.get("OCPU_MAX_WORKERS", "8"))) as executor:
+        futures = {executor.submit(fetch_contributions, database_client, compartment, signer, region): compartment for compartment in compartments}
+        for future in as_completed(futures):
+            try:
+                compartment_contributions = future.result()
+            except Exception as e:
+                # Reported in the response so a partial count is never mistaken for a full one
+                print("Failed to collect OCPUs for {} in {}: {}".format(futures[future], region, e))
+                totals["failed_compartments"].append(futures[future])
+                continue
+            for contribution in compartment_contributions.values():
+                totals[contribution["category"]] += contribution["ocpus"]
+            if contributions is not None:
+                contributions.update(compartment_contributions)
+    return totals
+
+def collect_regions(compartments, signer, contributions=None):
+    # Every region is collected concurrently with its own region-bound DatabaseClient, and its totals are added
+    # as soon as it completes. Failures are (region, compartment) pairs, "*" when the whole region failed
+    totals = {"dbsc_ocpus": 0, "exacs_ocpus": 0, "ecpu": 0, "failed_compartments": []}
+    found = {}
+    seconds = {}
+
+    def collect_region(region):
+        started = time.monotonic()
+        database_client = oci.database.DatabaseClient(config={"region": region}, signer=signer)
+        region_contributions = {}
+        region_totals = collect_ocpus(database_client, compartments, signer, region, region_contributions)
+        return region_totals, region_contributions, round(time.monotonic() - started, 2)
+
+    regions = get_regions(signer)
+    with ThreadPoolExecutor(max_workers=max(1, len(regions))) as executor:
+        futures = {executor.submit(collect_region, region): region for region in regions}
+        for future in as_completed(futures):
+            region = futures[future]
+            try:
+                region_totals, region_contributions, seconds[region] = future.result()
+            except Exception as e:
+                print("Failed to collect OCPUs in {}: {}".format(region, e))
+                totals["failed_compartments"].append([region, "*"])
+                continue
+            for category in ("dbsc_ocpus", "exacs_ocpus", "ecpu"):
+                totals[category] += region_totals[category]
+            totals["failed_compartments"].extend([region, compartment] for compartment in region_totals["failed_compartments"])
+            found.update(region_contributions)
+    if contributions is not None:
+        contributions.update(found)
+    totals["regions"], totals["license_models"] = summarize_usage(found.values(), seconds)
+    return totals
+
+def summarize_usage(contributions, seconds):
+    # Per region totals with their license model split and collection time, and the tenancy-wide license model split
+    regions = {region: {"dbsc_ocpus": 0, "exacs_ocpus": 0, "ecpu": 0, "license_models": {}, "seconds": region_seconds}
+               for region, region_seconds in seconds.items()}
+    license_models = {}
+    for contribution in contributions:
+        add_usage(regions, license_models, contribution)
+    return regions, license_models
+
+def add_usage(regions, license_models, contribution, sign=1):
+    # Adds one resource's contribution to the per region and license model breakdowns, or removes it with sign=-1
+    usage = regions.setdefault(contribution["region"], {"dbsc_ocpus": 0, "exacs_ocpus": 0, "ecpu": 0, "license_models": {}, "seconds": None})
+    usage[contribution["category"]] += sign * contribution["ocpus"]
+    model = contribution["license_model"]
+    usage["license_models"][model] = usage["license_models"].get(model, 0) + sign * (contribution["cpu_core_count"] or 0)
+    license_models[model] = license_models.get(model, 0) + sign * (contribution["cpu_core_count"] or 0)
+
+def get_tenancy_id(signer):
+    return os.environ.get("TENANCY_OCID") or signer.tenancy_id
+
+def get_regions(signer):
+    # LICENSE_REGIONS limits the audit, otherwise every region the tenancy is subscribed to is covered
+    if os.environ.get("LICENSE_REGIONS"):
+        return [region.strip() for region in os.environ["LICENSE_REGIONS"].split(",") if region.strip()]
+    cached = inventory_snapshot.cache.get("regions")
+    if cached and time.time() - cached["refreshed_at"] < int(os.environ.get("COMPARTMENT_TTL_SECONDS", "3600")):
+        return cached["regions"]
+    identity_client = oci.identity.IdentityClient(config={}, signer=signer)
+    regions = [subscription.region_name for subscription in identity_client.list_region_subscriptions(get_tenancy_id(signer)).data
+               if subscription.status == "READY"]
+    inventory_snapshot.cache["regions"] = {"regions": regions, "refreshed_at": time.time()}
+    return regions
+
+def get_compartments(signer, root_compartment=None):
+    # The tenancy tree comes from one paged list_compartments call on the root with compartment_id_in_subtree,
+    # and is kept in the warm container and the shared snapshot for COMPARTMENT_TTL_SECONDS
+    tenancy_id = get_tenancy_id(signer)
+
+    def refresh_compartments(previous):
+        identity_client = oci.identity.IdentityClient(config={}, signer=signer)
+        return inventory_snapshot.new_snapshot(tenancy_id, previous, compartments={
+            compartment.id: {"name": compartment.name, "parent": compartment.compartment_id}
+            for compartment in list_all(identity_client.list_compartments, compartment_id=tenancy_id,
+                                        compartment_id_in_subtree=True, access_level="ACCESSIBLE",
+                                        lifecycle_state="ACTIVE")
+        })
+
+    tree = inventory_snapshot.get_section(tenancy_id, "compartments", refresh_compartments, get_snapshot_store(signer),
+                                          ttl=int(os.environ.get("COMPARTMENT_TTL_SECONDS", "3600")))
+
+    # Resources can also live in the root compartment itself
+    root = root_compartment or tenancy_id
+    children = {}
+    for compartment_id, compartment in tree["compartments"].items():
+        children.setdefault(compartment["parent"], []).append(compartment_id)
+    compartments = []
+    pending = [root]
+    while pending:
+        compartment_id = pending.pop()
+        compartments.append(compartment_id)
+        pending.extend(children.get(compartment_id, []))
+    return compartments
+
+# Incremental license usage tracking. LICENSE_USAGE_TABLE_NAME holds one row per database resource with its BYOL
+# OCPU contribution and a WATERMARK row with the totals and their per region and license model breakdowns:
+#   CREATE TABLE <name> (ResourceId STRING, ResourceType STRING, CompartmentId STRING, Region STRING,
+#                        LicenseModel STRING, CpuCoreCount NUMBER, Category STRING, Ocpus NUMBER,
+#                        UpdatedAt STRING, Details JSON, PRIMARY KEY(ResourceId))
+SEARCH_RESOURCE_TYPES = {"DbSystem": "db_systems", "CloudVmCluster": "cloud_vm_clusters", "AutonomousDatabase": "autonomous_databases"}
+
+def search_database_resources(signer, region, updated_since):
+    # One paged structured search across the tenancy instead of three list calls per compartment, returning the
+    # resources created, scaled, moved or terminated since updated_since. Search only covers its own region,
+    # so each region is searched with a region-bound client
+    search_client = oci.resource_search.ResourceSearchClient(config={"region": region}, signer=signer)
+    search_details = oci.resource_search.models.StructuredSearchDetails(
+        type="Structured",
+        query="query dbsystem, cloudvmcluster, autonomousdatabase resources where timeUpdated >= '{}'".format(
+            updated_since.strftime("%Y-%m-%dT%H:%M:%SZ")),
+        matching_context_type="NONE")
+    return list_all(search_client.search_resources, search_details, limit=1000)
+
+def get_database_resource(database_client, resource_type, resource_id):
+    get_method = {"db_systems": database_client.get_db_system,
+                  "cloud_vm_clusters": database_client.get_cloud_vm_cluster,
+                  "autonomous_databases": database_client.get_autonomous_database}[resource_type]
+    resource = get_method(resource_id).data
+    return {
+        "license_model": resource.license_model,
+        "cpu_core_count": resource.cpu_core_count,
+        "is_auto_scaling_enabled": getattr(resource, "is_auto_scaling_enabled", None)
+    }
+
+def load_usage_rows(nosql_client, table_name, compartment):
+    rows = {}
+    page = None
+    while True:
+        query_response = nosql_client.query(
+            query_details=oci.nosql.models.QueryDetails(
+                compartment_id=compartment,
+                statement="SELECT ResourceId, ResourceType, CompartmentId, Region, LicenseModel, CpuCoreCount, Category, Ocpus, Details FROM {}".format(table_name)),
+            page=page)
+        for row in query_response.data.items or []:
+            rows[row["ResourceId"]] = row
+        page = query_response.next_page
+        if not page:
+            return rows
+
+def get_usage_rows(nosql_client, table_name, compartment, resource_ids):
+    # Reads only the stored rows of the given resources, concurrently
+    def get(resource_id):
+        return nosql_client.get_row(table_name_or_id=table_name, key=["ResourceId:{}".format(resource_id)], compartment_id=compartment).data.value
+
+    resource_ids = list(resource_ids)
+    with ThreadPoolExecutor(max_workers=int(os.environ.get("OCPU_MAX_WORKERS", "8"))) as executor:
+        return {resource_id: row for resource_id, row in zip(resource_ids, executor.map(get, resource_ids)) if row}
+
+def write_usage_rows(nosql_client, table_name, compartment, upserts, deletes):
+    def upsert(value):
+        nosql_client.update_row(
+            table_name_or_id=table_name,
+            update_row_details=oci.nosql.models.UpdateRowDetails(compartment_id=compartment, value=value))
+
+    def delete(resource_id):
+        nosql_client.delete_row(table_name_or_id=table_name, key=["ResourceId:{}".format(resource_id)], compartment_id=compartment)
+
+    with ThreadPoolExecutor(max_workers=int(os.environ.get("OCPU_MAX_WORKERS", "8"))) as executor:
+        list(executor.map(upsert, upserts))
+        list(executor.map(delete, deletes))
+
+def row_contribution(row):
+    return {"region": row.get("Region"), "category": row["Category"], "ocpus": row["Ocpus"],
+            "license_model": row.get("LicenseModel"), "cpu_core_count": row.get("CpuCoreCount") or 0}
+
+def usage_row(resource_id, contribution, now):
+    return {
+        "ResourceId": resource_id,
+        "ResourceType": contribution["type"],
+        "CompartmentId": contribution["compartment_id"],
+        "Region": contribution["region"],
+        "LicenseModel": contribution["license_model"],
+        "CpuCoreCount": contribution["cpu_core_count"],
+        "Category": contribution["category"],
+        "Ocpus": contribution["ocpus"],
+        "UpdatedAt": now
+    }
+
+def parse_utc(timestamp):
+    return datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+def track_license_usage(compartments, signer):
+    """
+    Returns the license totals kept up to date in LICENSE_USAGE_TABLE_NAME.
+    Every LICENSE_RECONCILE_HOURS a full reconcile recounts all resources and rewrites the table. Runs in between
+    are incremental: Resource Search returns the resources whose timeUpdated is at or after the previous run
+    (less LICENSE_SEARCH_OVERLAP_MINUTES for search index lag), so creations, OCPU scale-ups and scale-downs,
+    moves and terminations are all picked up. Only those resources and their stored rows are read, and the totals
+    and breakdowns in the WATERMARK row are adjusted by the difference.
+    Between reconciles the totals can be stale by changes Search has not indexed within the overlap, and by
+    changes in a region that could not be searched (the watermark is not advanced until every region answers).
+    A full reconcile bounds that staleness to LICENSE_RECONCILE_HOURS.
+    """
+    table_name = os.environ["LICENSE_USAGE_TABLE_NAME"]
+    table_compartment = os.environ["LICENSE_USAGE_TABLE_COMPARTMENT_OCID"]
+    nosql_client = oci.nosql.NosqlClient(config={}, signer=signer)
+    started = datetime.now(timezone.utc)
+    now = started.strftime("%Y-%m-%dT%H:%M:%SZ")
+    watermark = (get_usage_rows(nosql_client, table_name, table_compartment, ["WATERMARK"]).get("WATERMARK") or {}).get("Details") or {}
+    reconcile_every = timedelta(hours=float(os.environ.get("LICENSE_RECONCILE_HOURS", "24")))
+    last_reconcile = watermark.get("last_full_reconcile")
+
+    # Watermarks written before the breakdowns were kept in it also need a full reconcile
+    if not last_reconcile or "regions" not in watermark or started - parse_utc(last_reconcile) >= reconcile_every:
+        # Full reconcile: recount everything and replace the stored contributions
+        stored = load_usage_rows(nosql_client, table_name, table_compartment)
+        stored.pop("WATERMARK", None)
+        contributions = {}
+        totals = collect_regions(compartments, signer, contributions)
+        upserts = [usage_row(resource_id, contribution, now) for resource_id, contribution in contributions.items()
+                   if resource_id not in stored or stored[resource_id].get("Ocpus") != contribution["ocpus"]
+                   or stored[resource_id].get("CpuCoreCount") != contribution["cpu_core_count"]]
+        # Rows of failed compartments and regions are kept, their resources were not seen
+        failed = {tuple(failure) for failure in totals["failed_compartments"]}
+        deletes = [resource_id for resource_id, row in stored.items()
+                   if resource_id not in contributions and (row.get("Region"), row.get("CompartmentId")) not in failed
+                   and (row.get("Region"), "*") not in failed]
+        totals["mode"] = "full"
+        # A reconcile with failed compartments is repeated on the next run
+        reconciled_at = last_reconcile if totals["failed_compartments"] else now
+        searched_at = now
+    else:
+        # Incremental: only resources Search reports as updated since the watermark are read again
+        since = parse_utc(watermark["timestamp"]) - timedelta(minutes=float(os.environ.get("LICENSE_SEARCH_OVERLAP_MINUTES", "10")))
+        wanted = set(compartments)
+
+        def track_region(region):
+            started = time.monotonic()
+            database_client = oci.database.DatabaseClient(config={"region": region}, signer=signer)
+            changed = [resource for resource in search_database_resources(signer, region, since)
+                       if resource.resource_type in SEARCH_RESOURCE_TYPES]
+
+            def contribution_of(resource):
+                # Terminated resources and resources moved out of the audited compartments no longer count
+                if resource.lifecycle_state in ("TERMINATING", "TERMINATED") or resource.compartment_id not in wanted:
+                    return resource.identifier, None
+                resource_type = SEARCH_RESOURCE_TYPES[resource.resource_type]
+                record = get_database_resource(database_client, resource_type, resource.identifier)
+                return resource.identifier, contribution_record(resource_type, record, resource.compartment_id, region)
+
+            with ThreadPoolExecutor(max_workers=int(os.environ.get("OCPU_MAX_WORKERS", "8"))) as executor:
+                contributions = dict(executor.map(contribution_of, changed))
+            return contributions, round(time.monotonic() - started, 2)
+
+        totals = dict(watermark["totals"], failed_compartments=[], mode="incremental")
+        regions_usage = watermark["regions"]
+        license_models = watermark.get("license_models") or {}
+        contributions = {}
+        regions = get_regions(signer)
+        with ThreadPoolExecutor(max_workers=max(1, len(regions))) as executor:
+            futures = {executor.submit(track_region, region): region for region in regions}
+            for future in as_completed(futures):
+                region = futures[future]
+                try:
+                    region_contributions, seconds = future.result()
+                except Exception as e:
+                    print("Failed to track license usage in {}: {}".format(region, e))
+                    totals["failed_compartments"].append([region, "*"])
+                    continue
+                contributions.update(region_contributions)
+                regions_usage.setdefault(region, {"dbsc_ocpus": 0, "exacs_ocpus": 0, "ecpu": 0, "license_models": {}})["seconds"] = seconds
 
+        # Each changed resource replaces its stored contribution, so reading a resource twice is harmless
+        stored = get_usage_rows(nosql_client, table_name, table_compartment, contributions)
+        upserts = []
+        deletes = []
+        for resource_id, contribution in contributions.items():
+            previous = stored.get(resource_id)
+            if previous:
+                totals[previous["Category"]] -= previous["Ocpus"]
+                add_usage(regions_usage, license_models, row_contribution(previous), -1)
+            if contribution is None:
+                if previous:
+                    deletes.append(resource_id)
+                continue
+            totals[contribution["category"]] += contribution["ocpus"]
+            add_usage(regions_usage, license_models, contribution)
+            upserts.append(usage_row(resource_id, contribution, now))
+        totals["changed_resources"] = len(upserts) + len(deletes)
+        totals["regions"], totals["license_models"] = regions_usage, license_models
+        reconciled_at = last_reconcile
+        # Changes in a region that could not be searched are picked up once it answers again
+        searched_at = watermark["timestamp"] if totals["failed_compartments"] else now
 
+    upserts.append({
+        "ResourceId": "WATERMARK",
+        "ResourceType": "WATERMARK",
+        "UpdatedAt": now,
+        "Details": {
+            "timestamp": searched_at,
+            "last_full_reconcile": reconciled_at,
+            "totals": {category: totals[category] for category in ("dbsc_ocpus", "exacs_ocpus", "ecpu")},
+            "regions": totals["regions"],
+            "license_models": totals["license_models"]
+        }
+    })
+    write_usage_rows(nosql_client, table_name, table_compartment, upserts, deletes)
+    return totals
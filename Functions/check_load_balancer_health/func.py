@@ -1,14 +1,55 @@
+import http.client
+import importlib
 import io
 import json
 import logging
+import math
 import os
-import oci
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from fdk import response
 
+import inventory_snapshot
+import notification_digest
+from pagination import list_all
+
+# Keep oci/__init__ from importing every service package; LazyModule imports the ones a code path uses
+os.environ.setdefault("OCI_PYTHON_SDK_NO_SERVICE_IMPORTS", "true")
+
+
+class LazyModule:
+    """
+    Stands in for a module and imports it, and any sub-package it does not import itself, on first use.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        try:
+            return getattr(self._module, attr)
+        except AttributeError:
+            return importlib.import_module(f"{self._name}.{attr}")
+
+
+oci = LazyModule("oci")
+
 
 def handler(ctx, data: io.BytesIO = None):
     """
     Entry point for the OCI Function. Performs the load balancer health check and sends an email with the health report.
+    Checks the single lb_id in the payload, or sweeps every load balancer listed in lb_ids or found in
+    lb_compartment_id (optionally filtered by lb_freeform_tags) into one consolidated report.
+    With mode=flush it only publishes the notification digests of closed windows (schedule it every digest window).
+    With mode=watch it polls lb_id until the listed backends are healthy and escalates past the deadline.
+    With probe=true (or PROBE_BACKENDS) it also measures backend latency directly and flags slow backends.
+    With HEALTH_HISTORY_TABLE_NAME set, reports only carry backend state changes and are skipped when nothing changed,
+    except for a reminder every HEALTH_RENOTIFY_MINUTES (default 60, 0 disables) while backends stay not OK.
+    With METRICS_NAMESPACE set, backend health, latency and counts are also published as custom metrics.
     """
     logs = []
     try:
@@ -16,62 +57,745 @@ def handler(ctx, data: io.BytesIO = None):
         body = json.loads(data.getvalue())
         auto_scale_env = body.get("auto_scale_env")
         lb_id = body.get("lb_id")
-        vm_compartment_id = body.get("compartment_id")
+        # VM names are looked up in compartment_id; sweeps of a compartment default to the load balancers' one
+        vm_compartment_id = body.get("compartment_id") or body.get("lb_compartment_id")
 
-        # Initialize the Load Balancer client
         signer = oci.auth.signers.get_resource_principals_signer()
-        lb_client = oci.load_balancer.LoadBalancerClient(config={}, signer=signer)
+        if body.get("mode") == "flush":
+            # Flush mode: publish the digests of closed notification windows that no later report flushed.
+            # Schedule it every NOTIFICATION_DIGEST_MINUTES so buffered reports always go out.
+            sent = flush_notifications(signer, os.environ.get("wlsc_email_notification_topic_id"))
+            logs.append(f"[INFO] Notification digests sent: {sent}")
+            return response.Response(ctx, response_data=json.dumps({"digests_sent": sent, "logs": logs}), headers={"Content-Type": "application/json"})
 
-        # Fetch the load balancer health
-        health = lb_client.get_load_balancer_health(lb_id).data
-        logs.append(f"[INFO] Load Balancer Health Status: {health.status}")
+        # Initialize the Load Balancer client
+        lb_client = oci.load_balancer.LoadBalancerClient(config={}, signer=signer)
 
-        # Generate the health report
-        health_report = f"Load Balancer Health Report for {auto_scale_env}:\n"
-        health_report += f"Load Balancer Health Status: {health.status}\n\n"
-        # Fetch the load balancer details for backend information
-        load_balancer = lb_client.get_load_balancer(lb_id).data
-        logs.append(f"[INFO] Load Balancer Retrieved: {load_balancer.display_name}")
-        health_report += f"Load Balancer Name: {load_balancer.display_name}\n\n"
-
-# Log backend health details
-        if hasattr(load_balancer, 'backend_sets') and load_balancer.backend_sets:
-            for backend_set_name, backend_set in load_balancer.backend_sets.items():
-                health_report += f"Backend Set: {backend_set_name}, Policy: {backend_set.policy}\n"
-                for backend in backend_set.backends:
-                    # Fetch the VM display name using the backend IP address
-                    vm_display_name = get_vm_display_name_by_ip(backend.ip_address, vm_compartment_id, signer)
-                    vm_info = f"({vm_display_name})" if vm_display_name else "VM: Not Found"
-                    # Fetch backend health details
-                    backend_health = lb_client.get_backend_health(
-                        load_balancer_id=lb_id,
-                        backend_set_name=backend_set_name,
-                        backend_name=backend.name
-                    ).data
-                    # Add backend health details to the report
-                    health_report += f"  - Backend: {backend.ip_address}{vm_info}:{backend.port}, Health: {backend_health.status}, Offline: {backend.offline}, Weight: {backend.weight}\n"
+        # Collect the load balancer and backend health, then render the report from the collected data
+        if not vm_compartment_id:
+            logs.append("[WARN] No compartment_id in the payload. Backends are reported without VM names.")
+        result = {"logs": logs}
+        # Direct latency probes need the function's subnet to reach the backend ports
+        probe_enabled = str(body.get("probe", os.environ.get("PROBE_BACKENDS", "false"))).lower() == "true"
+        slow_backends = []
+        # With a history table only the changes since the previous check are reported
+        history_enabled = bool(os.environ.get("HEALTH_HISTORY_TABLE_NAME") and os.environ.get("HEALTH_HISTORY_TABLE_COMPARTMENT_OCID"))
+        nosql_client = oci.nosql.NosqlClient(config={}, signer=signer) if history_enabled else None
+        send_report = True
+        if body.get("mode") == "watch":
+            # Watch mode: poll until the new backends converge instead of checking once at a fixed time
+            deadline_seconds = float(body.get("deadline_seconds") or os.environ.get("WATCH_DEADLINE_SECONDS", "240"))
+            # The report still has to be collected and sent after the watch, within the function timeout
+            max_deadline_seconds = float(os.environ.get("FUNCTION_TIMEOUT_SECONDS", "300")) - float(os.environ.get("WATCH_TIMEOUT_MARGIN_SECONDS", "60"))
+            if deadline_seconds > max_deadline_seconds:
+                logs.append(f"[WARN] Watch deadline {deadline_seconds}s capped to {max_deadline_seconds}s to stay within the function timeout.")
+                deadline_seconds = max(0.0, max_deadline_seconds)
+            watch = watch_lb_health(lb_client, lb_id, body.get("backends"), deadline_seconds, body.get("scaled_at"))
+            for backend_name, seconds in watch["time_to_healthy_seconds"].items():
+                logs.append(f"[INFO] Backend {backend_name}: {watch['statuses'].get(backend_name)}, time to healthy: {seconds}s")
+            for backend_name in watch["missing_backends"]:
+                logs.append(f"[WARN] Watched backend {backend_name} not found in load balancer {lb_id}.")
+            lb_health = collect_lb_health(lb_client, lb_id)
+            add_vm_names([lb_health], vm_compartment_id, signer)
+            logs.append(f"[INFO] Load Balancer Health Status: {lb_health['status']}")
+            if probe_enabled:
+                slow_backends = probe_lb_backends([lb_health])
+            health_report = render_watch_summary(auto_scale_env, watch) + render_health_report(auto_scale_env, lb_health)
+            if watch["healthy"]:
+                overall_status = lb_health["status"]
+                subject = f"Load Balancer Health Report - {auto_scale_env}"
+            else:
+                overall_status = "CRITICAL"
+                subject = f"Load Balancer Health ESCALATION - {auto_scale_env}"
+                logs.append(f"[ERROR] Backends not healthy after {watch['elapsed_seconds']}s. Escalating.")
+            result["watch"] = watch
+            collected = [lb_health]
+        elif body.get("lb_ids") or body.get("lb_compartment_id"):
+            # Sweep mode: check every matching load balancer concurrently and send one consolidated report
+            lb_ids = resolve_sweep_lb_ids(lb_client, body)
+            logs.append(f"[INFO] Sweep mode: checking {len(lb_ids)} load balancers.")
+            lb_healths, failures = sweep_lb_health(lb_client, lb_ids)
+            add_vm_names(lb_healths, vm_compartment_id, signer)
+            for lb_id_failed, error in failures.items():
+                logs.append(f"[ERROR] Failed to check load balancer {lb_id_failed}. Error: {error}")
+            if probe_enabled:
+                slow_backends = probe_lb_backends(lb_healths)
+            overall_status = worst_status([lb_health["status"] for lb_health in lb_healths] + (["CRITICAL"] if failures else []))
+            logs.append(f"[INFO] Sweep Health Status: {overall_status}")
+            deltas = {}
+            for lb_health in lb_healths:
+                delta = record_health_history(nosql_client, lb_health)
+                if delta:
+                    deltas[lb_health["lb_id"]] = delta
+            health_report = render_sweep_report(auto_scale_env, lb_healths, failures, deltas)
+            send_report = bool(failures) or len(deltas) < len(lb_healths) or any(transitions for transitions, _, _ in deltas.values())
+            subject = f"Load Balancer Sweep Report - {auto_scale_env} - {overall_status}"
+            collected = lb_healths
+            result["load_balancers"] = [{"lb_id": lb_health["lb_id"], "name": lb_health["name"], "status": lb_health["status"]} for lb_health in lb_healths]
         else:
-            health_report += "No backend sets found for this load balancer.\n"
-            logs.append("[WARN] No backend sets found for this load balancer.")
+            lb_health = collect_lb_health(lb_client, lb_id)
+            add_vm_names([lb_health], vm_compartment_id, signer)
+            logs.append(f"[INFO] Load Balancer Health Status: {lb_health['status']}")
+            logs.append(f"[INFO] Load Balancer Retrieved: {lb_health['name']}")
+            if not lb_health["backend_sets"]:
+                logs.append("[WARN] No backend sets found for this load balancer.")
+            if probe_enabled:
+                slow_backends = probe_lb_backends([lb_health])
+            overall_status = lb_health["status"]
+            delta = record_health_history(nosql_client, lb_health)
+            if delta:
+                transitions, history, previous_timestamp = delta
+                logs.append(f"[INFO] {len(transitions)} backend state changes since {previous_timestamp}.")
+                health_report = render_delta_report(auto_scale_env, lb_health, transitions, history, previous_timestamp)
+                send_report = bool(transitions)
+            else:
+                health_report = render_health_report(auto_scale_env, lb_health)
+            subject = f"Load Balancer Health Report - {auto_scale_env}"
+            collected = [lb_health]
+
+        if probe_enabled:
+            logs.append(f"[INFO] Latency probes flagged {len(slow_backends)} slow backends.")
+            health_report += render_slow_backends(slow_backends)
+            result["slow_backends"] = slow_backends
+            send_report = send_report or bool(slow_backends)
+
+        if os.environ.get("METRICS_NAMESPACE"):
+            try:
+                metric_data = build_health_metrics(auto_scale_env, collected, os.environ["METRICS_NAMESPACE"], os.environ.get("METRICS_COMPARTMENT_OCID"))
+                result["metrics"] = publish_health_metrics(get_telemetry_client(signer), metric_data)
+                logs.append(f"[INFO] Published {result['metrics']['metrics']} health metrics in {result['metrics']['requests']} requests.")
+            except Exception as e:
+                logs.append(f"[ERROR] Failed to publish health metrics. Error: {str(e)}")
 
-        # Send the health report via email
+        # Send the health report via email; an unhealthy load balancer is reported immediately
         notification_topic_id = os.environ.get("wlsc_email_notification_topic_id")
-        if notification_topic_id:
-            subject = f"Load Balancer Health Report - {auto_scale_env}"
-            send_email(
+        if not send_report:
+            logs.append("[INFO] No backend state changes since the previous check. Report not sent.")
+        elif notification_topic_id:
+            notify(
                 signer=signer,
                 topic_id=notification_topic_id,
+                environment=auto_scale_env,
                 email_body=health_report,
-                subject=subject
+                subject=subject,
+                critical=overall_status in ["CRITICAL", "WARNING"]
             )
             logs.append("[INFO] Health report email sent successfully.")
 
-        return response.Response(ctx, response_data=json.dumps({"logs": logs}), headers={"Content-Type": "application/json"})
+        return response.Response(ctx, response_data=json.dumps(result), headers={"Content-Type": "application/json"})
     except Exception as e:
         logs.append(f"[ERROR] Failed to check load balancer health or send email. Error: {str(e)}")
         return response.Response(ctx, response_data=json.dumps({"logs": logs}), headers={"Content-Type": "application/json"})
 
 
+def backend_statuses_from_set_health(set_health):
+    """
+    Maps backend names to their status from a backend set health summary. Backends it does not list are OK.
+    """
+    backend_status = {}
+    for status, backend_names in (("UNKNOWN", set_health.unknown_state_backend_names),
+                                  ("WARNING", set_health.warning_state_backend_names),
+                                  ("CRITICAL", set_health.critical_state_backend_names)):
+        for backend_name in backend_names or []:
+            backend_status[backend_name] = status
+    return backend_status
+
+
+def collect_lb_health(lb_client, lb_id, max_workers=10):
+    """
+    Collects the health of a load balancer and its backends. VM names are filled in afterwards by add_vm_names.
+    Backend status comes from one get_backend_set_health call per backend set. get_backend_health is only
+    called, concurrently, for backends the set reports as not OK, so SDK calls grow with backend sets, not backends.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        health_future = executor.submit(lb_client.get_load_balancer_health, lb_id)
+        load_balancer = lb_client.get_load_balancer(lb_id).data
+        backend_sets = getattr(load_balancer, "backend_sets", None) or {}
+        set_health_futures = {
+            backend_set_name: executor.submit(lb_client.get_backend_set_health, lb_id, backend_set_name)
+            for backend_set_name in backend_sets
+        }
+        lb_health = {
+            "lb_id": lb_id,
+            "name": load_balancer.display_name,
+            "compartment_id": load_balancer.compartment_id,
+            "status": health_future.result().data.status,
+            "backend_sets": []
+        }
+        detail_futures = {}
+        for backend_set_name, backend_set in backend_sets.items():
+            set_health = set_health_futures[backend_set_name].result().data
+            backend_status = backend_statuses_from_set_health(set_health)
+            backends = []
+            for backend in backend_set.backends:
+                record = {
+                    "name": backend.name,
+                    "ip_address": backend.ip_address,
+                    "port": backend.port,
+                    "vm_name": None,
+                    "status": backend_status.get(backend.name, "OK"),
+                    "health_check_status": None,
+                    "offline": backend.offline,
+                    "weight": backend.weight
+                }
+                if record["status"] != "OK":
+                    detail_futures[executor.submit(lb_client.get_backend_health, lb_id, backend_set_name, backend.name)] = record
+                backends.append(record)
+            lb_health["backend_sets"].append({
+                "name": backend_set_name,
+                "policy": backend_set.policy,
+                "status": set_health.status,
+                "backends": backends
+            })
+        for future, record in detail_futures.items():
+            try:
+                backend_health = future.result().data
+                record["status"] = backend_health.status
+                if backend_health.health_check_results:
+                    record["health_check_status"] = backend_health.health_check_results[0].health_check_status
+            except Exception as e:
+                logging.warning(f"[WARN] Failed to fetch health details for backend {record['name']}. Error: {str(e)}")
+    return lb_health
+
+
+def render_health_report(auto_scale_env, lb_health):
+    """
+    Renders the health report email body from the data returned by collect_lb_health.
+    """
+    health_report = f"Load Balancer Health Report for {auto_scale_env}:\n"
+    health_report += f"Load Balancer Health Status: {lb_health['status']}\n\n"
+    health_report += f"Load Balancer Name: {lb_health['name']}\n\n"
+    if not lb_health["backend_sets"]:
+        health_report += "No backend sets found for this load balancer.\n"
+    for backend_set in lb_health["backend_sets"]:
+        set_latency = f", {format_latency(backend_set['latency'])}" if backend_set.get("latency") else ""
+        health_report += f"Backend Set: {backend_set['name']}, Policy: {backend_set['policy']}{set_latency}\n"
+        for backend in backend_set["backends"]:
+            vm_info = f"({backend['vm_name']})" if backend["vm_name"] else "VM: Not Found"
+            check_info = f", Check: {backend['health_check_status']}" if backend["health_check_status"] else ""
+            latency_info = f", {format_latency(backend['latency'])}" if backend.get("latency") else ""
+            slow_info = " [SLOW]" if backend.get("slow") else ""
+            health_report += (f"  - Backend: {backend['ip_address']}{vm_info}:{backend['port']}, Health: {backend['status']}{check_info}, "
+                              f"Offline: {backend['offline']}, Weight: {backend['weight']}{latency_info}{slow_info}\n")
+    return health_report
+
+
+def watch_lb_health(lb_client, lb_id, backend_names=None, deadline_seconds=240, scaled_at=None):
+    """
+    Polls backend set health until every watched backend is OK or the deadline passes.
+    Only the backend sets holding watched backends are polled. The interval starts at WATCH_INITIAL_INTERVAL_SECONDS,
+    resets whenever a watched backend changes state and otherwise backs off 1.5x up to WATCH_MAX_INTERVAL_SECONDS.
+    :param backend_names: Backends (ip:port) to watch; all backends of the load balancer when empty
+    :param scaled_at: Scale-up time (%Y-%m-%dT%H:%M:%SZ); time to healthy is measured from it when given
+    :return: dict with the healthy flag, per backend status, time_to_healthy_seconds (None while not OK) and poll stats
+    """
+    initial_interval = float(os.environ.get("WATCH_INITIAL_INTERVAL_SECONDS", "5"))
+    max_interval = float(os.environ.get("WATCH_MAX_INTERVAL_SECONDS", "30"))
+    start = time.monotonic()
+    offset = 0.0
+    if scaled_at:
+        try:
+            offset = max(0.0, (datetime.utcnow() - datetime.strptime(scaled_at, "%Y-%m-%dT%H:%M:%SZ")).total_seconds())
+        except (TypeError, ValueError):
+            logging.warning(f"[WARN] Ignoring unparsable scaled_at {scaled_at!r}. Time to healthy is measured from the watch start.")
+
+    load_balancer = lb_client.get_load_balancer(lb_id).data
+    backend_set_of = {
+        backend.name: backend_set_name
+        for backend_set_name, backend_set in (getattr(load_balancer, "backend_sets", None) or {}).items()
+        for backend in backend_set.backends
+    }
+    watched = [name for name in backend_names if name in backend_set_of] if backend_names else list(backend_set_of)
+    missing = [name for name in backend_names or [] if name not in backend_set_of]
+    backend_set_names = sorted({backend_set_of[name] for name in watched})
+
+    statuses = {}
+    time_to_healthy = {name: None for name in watched}
+    interval = initial_interval
+    polls = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(10, len(backend_set_names)))) as executor:
+        while watched:
+            polls += 1
+            current = {}
+            for set_health in executor.map(lambda name: lb_client.get_backend_set_health(lb_id, name).data, backend_set_names):
+                current.update(backend_statuses_from_set_health(set_health))
+            elapsed = time.monotonic() - start
+            changed = False
+            for name in watched:
+                status = current.get(name, "OK")
+                changed = changed or status != statuses.get(name)
+                statuses[name] = status
+                if status != "OK":
+                    # A backend that flips back to unhealthy has not converged yet
+                    time_to_healthy[name] = None
+                elif time_to_healthy[name] is None:
+                    time_to_healthy[name] = round(offset + elapsed, 1)
+            if all(status == "OK" for status in statuses.values()):
+                break
+            interval = initial_interval if changed else min(max_interval, interval * 1.5)
+            if elapsed + interval > deadline_seconds:
+                break
+            time.sleep(interval)
+    return {
+        "healthy": bool(watched) and all(status == "OK" for status in statuses.values()),
+        "statuses": statuses,
+        "time_to_healthy_seconds": time_to_healthy,
+        "missing_backends": missing,
+        "polls": polls,
+        "elapsed_seconds": round(time.monotonic() - start, 1)
+    }
+
+
+def render_watch_summary(auto_scale_env, watch):
+    """
+    Renders the convergence summary of a watch run, placed above the regular health report.
+    """
+    outcome = "All watched backends are healthy" if watch["healthy"] else "ESCALATION: backends still unhealthy at the deadline"
+    watch_summary = f"Backend Watch Summary for {auto_scale_env}: {outcome}\n"
+    watch_summary += f"Polls: {watch['polls']}, Watch Duration: {watch['elapsed_seconds']}s\n"
+    for backend_name, status in watch["statuses"].items():
+        seconds = watch["time_to_healthy_seconds"].get(backend_name)
+        time_info = f"healthy after {seconds}s" if seconds is not None else "not healthy"
+        watch_summary += f"  - Backend: {backend_name}, Health: {status}, {time_info}\n"
+    for backend_name in watch["missing_backends"]:
+        watch_summary += f"  - Backend: {backend_name}, not found in any backend set\n"
+    return watch_summary + "\n"
+
+
+def percentile(values, pct):
+    """
+    Returns the nearest-rank percentile of the values, None when there are none.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))]
+
+
+def latency_summary(samples, errors=0):
+    """
+    Summarizes latency samples (milliseconds) as p50/p95/p99.
+    """
+    return {
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+        "samples": len(samples),
+        "errors": errors
+    }
+
+
+def probe_backend(ip_address, port, samples=5, timeout=2.0, interval=0.2, http_path=None):
+    """
+    Measures how fast a backend answers, bypassing the load balancer.
+    Opens a TCP connection per sample, or sends a GET for http_path when it is given. HTTP 5xx responses and
+    connection failures count as errors and are left out of the latency samples.
+    :return: (latencies in milliseconds, error count)
+    """
+    latencies = []
+    errors = 0
+    for sample in range(samples):
+        if sample:
+            time.sleep(interval)
+        start = time.perf_counter()
+        try:
+            if http_path:
+                connection = http.client.HTTPConnection(ip_address, port, timeout=timeout)
+                try:
+                    connection.request("GET", http_path, headers={"Connection": "close"})
+                    probe_response = connection.getresponse()
+                    probe_response.read()
+                    if probe_response.status >= 500:
+                        errors += 1
+                        continue
+                finally:
+                    connection.close()
+            else:
+                socket.create_connection((ip_address, port), timeout=timeout).close()
+            latencies.append(round((time.perf_counter() - start) * 1000, 2))
+        except (OSError, http.client.HTTPException):
+            errors += 1
+    return latencies, errors
+
+
+def probe_lb_backends(lb_healths):
+    """
+    Probes every backend of the collected load balancers concurrently and adds a latency summary to each
+    backend and backend set. A backend the load balancer reports OK is flagged slow when its p95 is above
+    PROBE_SLOW_P95_MS, or above both PROBE_SLOW_MIN_MS and PROBE_SLOW_FACTOR times the median p50 of its backend set.
+    :return: list of slow backends ({lb_name, backend_set, backend, vm_name, p95}), candidates for draining
+    """
+    samples = int(os.environ.get("PROBE_SAMPLES", "5"))
+    timeout = float(os.environ.get("PROBE_TIMEOUT_SECONDS", "2"))
+    interval = float(os.environ.get("PROBE_INTERVAL_MS", "200")) / 1000
+    http_path = os.environ.get("PROBE_HTTP_PATH", "/") if os.environ.get("PROBE_MODE", "tcp").lower() == "http" else None
+    slow_p95_ms = float(os.environ.get("PROBE_SLOW_P95_MS", "500"))
+    slow_factor = float(os.environ.get("PROBE_SLOW_FACTOR", "3"))
+    # Below this p95 a backend is never slow relative to its peers; sub-millisecond jitter is not worth draining
+    slow_floor_ms = float(os.environ.get("PROBE_SLOW_MIN_MS", "50"))
+    max_workers = int(os.environ.get("PROBE_MAX_WORKERS", "20"))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for lb_health in lb_healths:
+            for backend_set in lb_health["backend_sets"]:
+                for backend in backend_set["backends"]:
+                    # Samples of one backend are spaced out; backends are probed in parallel
+                    futures[id(backend)] = executor.submit(
+                        probe_backend, backend["ip_address"], backend["port"], samples, timeout, interval, http_path
+                    )
+
+        slow_backends = []
+        for lb_health in lb_healths:
+            for backend_set in lb_health["backend_sets"]:
+                set_samples = []
+                set_errors = 0
+                for backend in backend_set["backends"]:
+                    latencies, errors = futures[id(backend)].result()
+                    backend["latency"] = latency_summary(latencies, errors)
+                    set_samples.extend(latencies)
+                    set_errors += errors
+                backend_set["latency"] = latency_summary(set_samples, set_errors)
+                set_median = percentile([backend["latency"]["p50"] for backend in backend_set["backends"] if backend["latency"]["p50"] is not None], 50)
+                for backend in backend_set["backends"]:
+                    p95 = backend["latency"]["p95"]
+                    backend["slow"] = backend["status"] == "OK" and p95 is not None and (
+                        p95 > slow_p95_ms
+                        or (len(backend_set["backends"]) > 1 and set_median and p95 > max(slow_floor_ms, slow_factor * set_median))
+                    )
+                    if backend["slow"]:
+                        slow_backends.append({
+                            "lb_name": lb_health["name"],
+                            "backend_set": backend_set["name"],
+                            "backend": backend["name"],
+                            "vm_name": backend["vm_name"],
+                            "p95": p95
+                        })
+    return slow_backends
+
+
+def format_latency(latency):
+    """
+    Formats a latency summary for the report.
+    """
+    if not latency["samples"]:
+        return f"Latency: no response ({latency['errors']} errors)"
+    error_info = f", {latency['errors']} errors" if latency["errors"] else ""
+    return f"Latency p50/p95/p99: {latency['p50']}/{latency['p95']}/{latency['p99']} ms{error_info}"
+
+
+def render_slow_backends(slow_backends):
+    """
+    Renders the list of backends that are OK for the load balancer but answer slowly.
+    """
+    if not slow_backends:
+        return ""
+    slow_report = "\nSlow backends reported OK by the load balancer (candidates to drain):\n"
+    for slow in slow_backends:
+        vm_info = f" ({slow['vm_name']})" if slow["vm_name"] else ""
+        slow_report += f"  - {slow['lb_name']} / {slow['backend_set']}: {slow['backend']}{vm_info}, p95 {slow['p95']} ms\n"
+    return slow_report
+
+
+# Severity order used to summarize several load balancers into one status
+HEALTH_STATUS_SEVERITY = {"OK": 0, "UNKNOWN": 1, "INCOMPLETE": 1, "PENDING": 1, "WARNING": 2, "CRITICAL": 3}
+
+
+def worst_status(statuses):
+    """
+    Returns the most severe of the given health statuses, OK when there are none.
+    """
+    return max(statuses, key=lambda status: HEALTH_STATUS_SEVERITY.get(status, 1), default="OK")
+
+
+def resolve_sweep_lb_ids(lb_client, body):
+    """
+    Returns the load balancers to check in sweep mode.
+    Uses the explicit lb_ids list when given, otherwise every ACTIVE load balancer in lb_compartment_id
+    whose freeform tags match lb_freeform_tags ("*" matches any value).
+    """
+    if body.get("lb_ids"):
+        return list(dict.fromkeys(body["lb_ids"]))
+    tag_filters = body.get("lb_freeform_tags") or {}
+    lb_ids = []
+    for load_balancer in list_all(lb_client.list_load_balancers, compartment_id=body["lb_compartment_id"], lifecycle_state="ACTIVE"):
+        freeform_tags = load_balancer.freeform_tags or {}
+        if all(freeform_tags.get(k) == v or (v == "*" and k in freeform_tags) for k, v in tag_filters.items()):
+            lb_ids.append(load_balancer.id)
+    return lb_ids
+
+
+def sweep_lb_health(lb_client, lb_ids):
+    """
+    Collects the health of several load balancers concurrently.
+    :return: (list of collect_lb_health results in lb_ids order, {lb_id: error} for load balancers that failed)
+    """
+    lb_healths = []
+    failures = {}
+    max_workers = int(os.environ.get("SWEEP_MAX_WORKERS", "8"))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {lb_id: executor.submit(collect_lb_health, lb_client, lb_id) for lb_id in lb_ids}
+        for lb_id, future in futures.items():
+            try:
+                lb_healths.append(future.result())
+            except Exception as e:
+                failures[lb_id] = str(e)
+    return lb_healths, failures
+
+
+def render_sweep_report(auto_scale_env, lb_healths, failures, deltas=None):
+    """
+    Renders one consolidated report for a sweep: a status summary followed by each load balancer's report.
+    Load balancers in deltas ({lb_id: record_health_history result}) get a change report, or none when unchanged.
+    """
+    deltas = deltas or {}
+    counts = {}
+    for lb_health in lb_healths:
+        counts[lb_health["status"]] = counts.get(lb_health["status"], 0) + 1
+    summary = " | ".join(f"{status}: {count}" for status, count in sorted(counts.items(), key=lambda item: -HEALTH_STATUS_SEVERITY.get(item[0], 1)))
+    sweep_report = f"Load Balancer Sweep Report for {auto_scale_env}:\n"
+    sweep_report += f"Load Balancers Checked: {len(lb_healths) + len(failures)}" + (f" | {summary}" if summary else "") + (f" | Failed: {len(failures)}" if failures else "") + "\n"
+    for lb_id, error in failures.items():
+        sweep_report += f"\n=== Check failed for {lb_id} ===\n{error}\n"
+    # Unhealthy load balancers first
+    for lb_health in sorted(lb_healths, key=lambda lb: -HEALTH_STATUS_SEVERITY.get(lb["status"], 1)):
+        if lb_health["lb_id"] in deltas:
+            transitions, history, previous_timestamp = deltas[lb_health["lb_id"]]
+            if transitions:
+                sweep_report += f"\n=== {lb_health['name']} ({lb_health['status']}) ===\n"
+                sweep_report += render_delta_report(auto_scale_env, lb_health, transitions, history, previous_timestamp)
+            continue
+        sweep_report += f"\n=== {lb_health['name']} ({lb_health['status']}) ===\n"
+        sweep_report += render_health_report(auto_scale_env, lb_health)
+    unchanged = sum(1 for transitions, _, _ in deltas.values() if not transitions)
+    if unchanged:
+        sweep_report += f"\n{unchanged} load balancers unchanged since their previous check.\n"
+    return sweep_report
+
+
+def load_health_history(nosql_client, table_name, compartment_id, lb_id):
+    """
+    Returns the stored health history row of a load balancer, or None on its first run.
+    """
+    try:
+        row = nosql_client.get_row(
+            table_name_or_id=table_name,
+            key=[f"LbId:{lb_id}"],
+            compartment_id=compartment_id
+        ).data
+        return row.value if row and row.value else None
+    except oci.exceptions.ServiceError as e:
+        if e.status != 404:
+            logging.error(f"[ERROR] Failed to read health history for {lb_id}. Error: {str(e)}")
+        return None
+
+
+def update_health_history(previous, lb_health, now, max_samples=96, renotify_minutes=0):
+    """
+    Folds the collected health of a load balancer into its history and returns the state transitions.
+    The history keeps one row per load balancer. Each backend has its current status, the time it entered that
+    status and a bitstring of its last max_samples checks (1 = OK), so the row size does not grow over time.
+    Unchanged states are only reported once, so a load balancer stuck in a non-OK state would go quiet. With
+    renotify_minutes, backends still not OK that long after the last report come back as reminder transitions
+    (from == to). NotifiedAt in the row keeps the time of the last reported change or reminder.
+    :return: (new history value, list of transitions {backend_set, backend, vm_name, from, to, since})
+    """
+    timestamp = now.strftime("%Y-%m-%dT%H:%M:%S")
+    previous_backends = (previous or {}).get("Backends") or {}
+    backends = {}
+    transitions = []
+    for backend_set in lb_health["backend_sets"]:
+        for backend in backend_set["backends"]:
+            name = backend["name"]
+            before = previous_backends.get(name)
+            status = backend["status"]
+            if before and before["status"] == status:
+                since = before["since"]
+            else:
+                since = timestamp
+                transitions.append({
+                    "backend_set": backend_set["name"],
+                    "backend": name,
+                    "vm_name": backend["vm_name"],
+                    "from": before["status"] if before else None,
+                    "to": status,
+                    "since": before["since"] if before else None
+                })
+            history = ((before or {}).get("history", "") + ("1" if status == "OK" else "0"))[-max_samples:]
+            backends[name] = {"status": status, "since": since, "history": history}
+    if previous and previous.get("Status") != lb_health["status"]:
+        transitions.insert(0, {"backend_set": None, "backend": "Load Balancer", "vm_name": None, "from": previous.get("Status"), "to": lb_health["status"], "since": previous.get("Timestamp")})
+    for name, before in previous_backends.items():
+        if name not in backends:
+            transitions.append({"backend_set": None, "backend": name, "vm_name": None, "from": before["status"], "to": "REMOVED", "since": before["since"]})
+    notified_at = (previous or {}).get("NotifiedAt") or (previous or {}).get("Timestamp")
+    if transitions or not previous:
+        notified_at = timestamp
+    elif renotify_minutes and now - datetime.strptime(notified_at, "%Y-%m-%dT%H:%M:%S") >= timedelta(minutes=renotify_minutes):
+        for backend_set in lb_health["backend_sets"]:
+            for backend in backend_set["backends"]:
+                status = backends[backend["name"]]["status"]
+                if status != "OK":
+                    transitions.append({"backend_set": backend_set["name"], "backend": backend["name"], "vm_name": backend["vm_name"],
+                                        "from": status, "to": status, "since": backends[backend["name"]]["since"]})
+        if lb_health["status"] != "OK":
+            transitions.insert(0, {"backend_set": None, "backend": "Load Balancer", "vm_name": None, "from": lb_health["status"], "to": lb_health["status"], "since": None})
+        if transitions:
+            notified_at = timestamp
+    return {
+        "LbId": lb_health["lb_id"],
+        "Timestamp": timestamp,
+        "Status": lb_health["status"],
+        "NotifiedAt": notified_at,
+        "Backends": backends
+    }, transitions
+
+
+def save_health_history(nosql_client, table_name, compartment_id, history):
+    """
+    Writes the health history row of a load balancer.
+    """
+    nosql_client.update_row(
+        table_name_or_id=table_name,
+        update_row_details=oci.nosql.models.UpdateRowDetails(compartment_id=compartment_id, value=history)
+    )
+
+
+def record_health_history(nosql_client, lb_health):
+    """
+    Stores the collected health of a load balancer in HEALTH_HISTORY_TABLE_NAME.
+    :return: (transitions, history, previous snapshot time), or None when history is off, the load balancer has
+             no previous snapshot or the table could not be used; the full report is sent in those cases
+    """
+    if nosql_client is None:
+        return None
+    try:
+        table_name = os.environ.get("HEALTH_HISTORY_TABLE_NAME")
+        compartment_id = os.environ.get("HEALTH_HISTORY_TABLE_COMPARTMENT_OCID")
+        previous = load_health_history(nosql_client, table_name, compartment_id, lb_health["lb_id"])
+        history, transitions = update_health_history(previous, lb_health, datetime.utcnow(), int(os.environ.get("HEALTH_HISTORY_SAMPLES", "96")),
+                                                     float(os.environ.get("HEALTH_RENOTIFY_MINUTES", "60")))
+        save_health_history(nosql_client, table_name, compartment_id, history)
+        return (transitions, history, previous["Timestamp"]) if previous else None
+    except Exception as e:
+        logging.error(f"[ERROR] Failed to update health history for {lb_health['lb_id']}. Error: {str(e)}")
+        return None
+
+
+def availability(history):
+    """
+    Returns the share of OK samples in a backend's history bitstring, as a percentage.
+    """
+    return round(100.0 * history.count("1") / len(history), 1) if history else None
+
+
+def render_delta_report(auto_scale_env, lb_health, transitions, history, previous_timestamp):
+    """
+    Renders a report of the transitions since the previous snapshot and rolling availability.
+    Only the HEALTH_HISTORY_REPORT_WORST least available backends are listed, so the report size does not depend
+    on the number of backends.
+    """
+    worst_count = int(os.environ.get("HEALTH_HISTORY_REPORT_WORST", "5"))
+    delta_report = f"Load Balancer Health Changes for {auto_scale_env}:\n"
+    delta_report += f"Load Balancer Name: {lb_health['name']}, Health Status: {lb_health['status']}\n"
+    reminders = [transition for transition in transitions if transition["from"] == transition["to"]]
+    delta_report += f"Changes since {previous_timestamp} UTC: {len(transitions) - len(reminders)}\n"
+    if reminders:
+        delta_report += f"Reminder: {len(reminders)} still not OK since the last report\n"
+    for transition in transitions:
+        vm_info = f" ({transition['vm_name']})" if transition["vm_name"] else ""
+        set_info = f"{transition['backend_set']} / " if transition["backend_set"] else ""
+        if transition in reminders:
+            since_info = f" since {transition['since']}" if transition["since"] else ""
+            delta_report += f"  - {set_info}{transition['backend']}{vm_info}: still {transition['to']}{since_info}\n"
+            continue
+        since_info = f", was {transition['from']} since {transition['since']}" if transition["since"] else ""
+        delta_report += f"  - {set_info}{transition['backend']}{vm_info}: {transition['from'] or 'NEW'} -> {transition['to']}{since_info}\n"
+    availabilities = sorted((availability(backend["history"]), name) for name, backend in history["Backends"].items())
+    if availabilities:
+        average = round(sum(value for value, _ in availabilities) / len(availabilities), 1)
+        delta_report += f"\nRolling Availability ({len(availabilities)} backends): average {average}%, lowest {availabilities[0][0]}%\n"
+        for value, name in availabilities[:worst_count]:
+            if value < 100:
+                backend = history["Backends"][name]
+                delta_report += f"  - {name}: {value}% of last {len(backend['history'])} checks, {backend['status']} since {backend['since']}\n"
+    return delta_report
+
+
+# post_metric_data accepts at most 50 metric streams per request
+METRICS_BATCH_SIZE = 50
+
+
+def get_telemetry_client(signer):
+    """
+    Returns a Monitoring client bound to the telemetry-ingestion endpoint, which post_metric_data requires.
+    """
+    region = os.environ.get("OCI_RESOURCE_PRINCIPAL_REGION") or signer.region
+    return oci.monitoring.MonitoringClient(
+        config={}, signer=signer, service_endpoint=f"https://telemetry-ingestion.{region}.oraclecloud.com"
+    )
+
+
+def build_health_metrics(auto_scale_env, lb_healths, namespace, compartment_id=None):
+    """
+    Turns collected load balancer health into custom metric streams, one datapoint each.
+    Per backend: BackendHealthy (1/0) and, when probed, BackendLatencyP50/P95/P99 in milliseconds.
+    Per load balancer: LoadBalancerHealthy, BackendCount, UnhealthyBackendCount and, when probed, SlowBackendCount.
+    :param compartment_id: Compartment for the metrics; each load balancer's own compartment when not given
+    """
+    timestamp = datetime.now(timezone.utc)
+    metric_data = []
+
+    def add(lb_health, name, value, dimensions):
+        metric_data.append(oci.monitoring.models.MetricDataDetails(
+            namespace=namespace,
+            compartment_id=compartment_id or lb_health["compartment_id"],
+            name=name,
+            dimensions={k: str(v) for k, v in dimensions.items() if v},
+            datapoints=[oci.monitoring.models.Datapoint(timestamp=timestamp, value=float(value))]
+        ))
+
+    for lb_health in lb_healths:
+        lb_dimensions = {"environment": auto_scale_env, "lbId": lb_health["lb_id"], "lbName": lb_health["name"]}
+        backends = [(backend_set, backend) for backend_set in lb_health["backend_sets"] for backend in backend_set["backends"]]
+        probed = any("latency" in backend for _, backend in backends)
+        add(lb_health, "LoadBalancerHealthy", lb_health["status"] == "OK", lb_dimensions)
+        add(lb_health, "BackendCount", len(backends), lb_dimensions)
+        add(lb_health, "UnhealthyBackendCount", sum(1 for _, backend in backends if backend["status"] != "OK"), lb_dimensions)
+        if probed:
+            add(lb_health, "SlowBackendCount", sum(1 for _, backend in backends if backend.get("slow")), lb_dimensions)
+        for backend_set, backend in backends:
+            dimensions = dict(lb_dimensions, backendSet=backend_set["name"], backend=backend["name"], vmName=backend["vm_name"])
+            add(lb_health, "BackendHealthy", backend["status"] == "OK", dimensions)
+            latency = backend.get("latency")
+            if latency and latency["samples"]:
+                for pct in ("p50", "p95", "p99"):
+                    add(lb_health, f"BackendLatency{pct.upper()}", latency[pct], dimensions)
+    return metric_data
+
+
+def publish_health_metrics(monitoring_client, metric_data, batch_size=METRICS_BATCH_SIZE, max_workers=4):
+    """
+    Publishes metric streams with as few post_metric_data calls as the per-request limit allows, posting the
+    batches concurrently.
+    :return: dict with the number of metrics, requests and metrics the service rejected
+    """
+    batches = [metric_data[i:i + batch_size] for i in range(0, len(metric_data), batch_size)]
+
+    def post(batch):
+        return monitoring_client.post_metric_data(
+            post_metric_data_details=oci.monitoring.models.PostMetricDataDetails(metric_data=batch)
+        ).data
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for posted in executor.map(post, batches):
+            failed += posted.failed_metrics_count or 0
+            for failed_metric in (posted.failed_metrics or [])[:5]:
+                logging.warning(f"[WARN] Metric rejected: {failed_metric.message}")
+    return {"metrics": len(metric_data), "requests": len(batches), "failed": failed}
+
+
 def send_email(signer, topic_id, email_body=None, subject=""):
     """
     Sends an email to the notification topic.
@@ -88,25 +812,129 @@ def send_email(signer, topic_id, email_body=None, subject=""):
         logging.error(f"[ERROR] Failed to send email. Error: {str(e)}")
 
 
-def get_vm_display_name_by_ip(ip_address, compartment_id, signer):
+def notify(signer, topic_id, environment, email_body, subject, critical=False):
     """
-    Fetches the VM display name using the IP address.
+    Publishes a report through the notification digest shared with the scaling function (see notification_digest.py).
+    Critical reports are sent immediately, others are grouped per environment in NOTIFICATION_TABLE_NAME
+    into NOTIFICATION_DIGEST_MINUTES windows.
     """
-    try:
-        # Initialize the Compute and Virtual Network clients
+    table_name = os.environ.get("NOTIFICATION_TABLE_NAME")
+    compartment_id = os.environ.get("NOTIFICATION_TABLE_COMPARTMENT_OCID")
+
+    def send(body, title):
+        send_email(signer=signer, topic_id=topic_id, email_body=body, subject=title)
+
+    if critical or not table_name or not compartment_id:
+        send(email_body, subject)
+        return
+    nosql_client = oci.nosql.NosqlClient(config={}, signer=signer)
+    notification_digest.notify(nosql_client, table_name, compartment_id, environment, email_body, subject, send)
+
+
+def flush_notifications(signer, topic_id):
+    """
+    Publishes the digests of every closed notification window, for all environments.
+    Returns the number of messages sent, or None without a notification table.
+    """
+    table_name = os.environ.get("NOTIFICATION_TABLE_NAME")
+    compartment_id = os.environ.get("NOTIFICATION_TABLE_COMPARTMENT_OCID")
+    if not table_name or not compartment_id or not topic_id:
+        return None
+    nosql_client = oci.nosql.NosqlClient(config={}, signer=signer)
+    return notification_digest.flush_closed_windows(
+        nosql_client, table_name, compartment_id,
+        lambda body, title: send_email(signer=signer, topic_id=topic_id, email_body=body, subject=title))
+
+
+def get_instance_inventory(compartment_id, signer):
+    """
+    Returns the instances section of the inventory (see inventory_snapshot.py), with VNIC IPs only when the
+    section is shared through INVENTORY_BUCKET. Without it a single paged list_instances builds it.
+    """
+    store = None
+    if inventory_snapshot.snapshot_configured():
+        store = inventory_snapshot.SnapshotStore(oci.object_storage.ObjectStorageClient(config={}, signer=signer))
+
+    def refresh(previous):
         compute_client = oci.core.ComputeClient(config={}, signer=signer)
         network_client = oci.core.VirtualNetworkClient(config={}, signer=signer)
-        # List all VNIC attachments in the compartment
-        vnic_attachments = compute_client.list_vnic_attachments(compartment_id=compartment_id).data
-        for vnic_attachment in vnic_attachments:
-            # Get the VNIC details
-            vnic = network_client.get_vnic(vnic_attachment.vnic_id).data
-            # Check if the VNIC's private IP matches the given IP address
-            if vnic.private_ip == ip_address:
-                # Fetch the instance details
-                instance = compute_client.get_instance(vnic_attachment.instance_id).data
-                return instance.display_name
-        return None  # Return None if no matching VM is found
-    except Exception as e:
-        logging.error(f"[ERROR] Failed to fetch VM display name for IP {ip_address}. Error: {str(e)}")
+        return inventory_snapshot.refresh_instances(compute_client, network_client, compartment_id, previous, resolve_ips=store is not None)
+
+    return inventory_snapshot.get_section(compartment_id, "instances", refresh, store)
+
+
+instance_by_ip_cache = {}  # Warm invocations reuse resolved IPs for INVENTORY_TTL_SECONDS
+
+
+def resolve_instances_by_ip(compartment_id, signer, ip_addresses, max_workers=10):
+    """
+    Maps the given private IPs to instance OCIDs without reading every VNIC in the compartment.
+    The VNIC attachments give the subnets in use, and each IP is looked up in them with list_private_ips,
+    so SDK calls grow with the IPs asked for, not with the instances in the compartment.
+    """
+    ttl = int(os.environ.get("INVENTORY_TTL_SECONDS", "300"))
+    resolved = {}
+    for ip in ip_addresses:
+        cached = instance_by_ip_cache.get((compartment_id, ip))
+        if cached and time.time() - cached["resolved_at"] < ttl:
+            resolved[ip] = cached["instance_id"]
+    pending = sorted(set(ip_addresses) - set(resolved))
+    if not pending:
+        return {ip: instance_id for ip, instance_id in resolved.items() if instance_id}
+
+    compute_client = oci.core.ComputeClient(config={}, signer=signer)
+    network_client = oci.core.VirtualNetworkClient(config={}, signer=signer)
+    instance_by_vnic = {}
+    subnet_ids = set()
+    for attachment in list_all(compute_client.list_vnic_attachments, compartment_id=compartment_id):
+        if attachment.lifecycle_state == "ATTACHED":
+            instance_by_vnic[attachment.vnic_id] = attachment.instance_id
+            subnet_ids.add(attachment.subnet_id)
+
+    def find_instance(ip_address):
+        for subnet_id in sorted(subnet_ids):
+            private_ips = network_client.list_private_ips(subnet_id=subnet_id, ip_address=ip_address).data
+            if private_ips:
+                return instance_by_vnic.get(private_ips[0].vnic_id)
         return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for ip, instance_id in zip(pending, executor.map(find_instance, pending)):
+            instance_by_ip_cache[(compartment_id, ip)] = {"instance_id": instance_id, "resolved_at": time.time()}
+            resolved[ip] = instance_id
+    return {ip: instance_id for ip, instance_id in resolved.items() if instance_id}
+
+
+def get_vm_names_by_ip(compartment_id, signer, ip_addresses):
+    """
+    Returns a mapping of the given private IP addresses to VM display names for the compartment.
+    """
+    if not compartment_id or not ip_addresses:
+        return {}
+    try:
+        instances = get_instance_inventory(compartment_id, signer)["instances"]
+        if inventory_snapshot.snapshot_configured():
+            return {
+                vnic["ip"]: instance["name"]
+                for instance in instances.values()
+                for vnic in instance.get("vnics", {}).values()
+                if vnic.get("ip") in ip_addresses
+            }
+        return {
+            ip: instances[instance_id]["name"]
+            for ip, instance_id in resolve_instances_by_ip(compartment_id, signer, ip_addresses).items()
+            if instance_id in instances
+        }
+    except Exception as e:
+        logging.error(f"[ERROR] Failed to map backend IPs to VMs for compartment {compartment_id}. Error: {str(e)}")
+        return {}
+
+
+def add_vm_names(lb_healths, compartment_id, signer):
+    """
+    Fills in the VM name of every backend in collected load balancer health, resolving only their IPs.
+    """
+    backends = [backend for lb_health in lb_healths for backend_set in lb_health["backend_sets"] for backend in backend_set["backends"]]
+    vm_names_by_ip = get_vm_names_by_ip(compartment_id, signer, {backend["ip_address"] for backend in backends})
+    for backend in backends:
+        backend["vm_name"] = vm_names_by_ip.get(backend["ip_address"])
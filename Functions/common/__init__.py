@@ -0,0 +1 @@
+# Modules shared by the functions. See sync_copies.py for how the function directories receive them.
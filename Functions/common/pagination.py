@@ -0,0 +1,26 @@
+"""
+Pagination helper shared by the functions and the Disaster Recovery scripts.
+
+Canonical copy: Functions/common/pagination.py. Each deployable unit carries a copy;
+run Functions/common/sync_copies.py after editing this file.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+
+def list_all(list_method, *args, **kwargs):
+    """
+    Yields every item of a paginated OCI list call, page by page.
+    The next page is requested in the background while the caller processes the current one,
+    so large compartments are neither truncated to the first page nor held in memory at once.
+    :param list_method: Bound SDK list method (e.g. compute_client.list_instances)
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        next_response = executor.submit(list_method, *args, **kwargs)
+        while next_response is not None:
+            page_response = next_response.result()
+            next_response = None
+            if page_response.has_next_page:
+                next_response = executor.submit(list_method, *args, page=page_response.next_page, **kwargs)
+            # Search responses wrap their page in a collection
+            for item in getattr(page_response.data, "items", page_response.data):
+                yield item
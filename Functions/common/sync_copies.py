@@ -0,0 +1,62 @@
+"""
+Copies the shared modules in Functions/common into every deployable unit that uses them.
+
+Each function directory is built as its own context, so a shared module cannot be imported from a parent
+directory at runtime. The files here are the canonical copies; edit them, then run
+
+    python Functions/common/sync_copies.py          # write the copies
+    python Functions/common/sync_copies.py --check  # exit 1 if any copy differs
+"""
+import argparse
+import os
+import shutil
+import sys
+
+COMMON_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(COMMON_DIR))
+
+# Shared module -> directories (relative to the repository root) that carry a copy
+COPIES = {
+    "notification_digest.py": ["Functions/Elastic_scale_weblogic", "Functions/check_load_balancer_health"],
+    "inventory_snapshot.py": ["Functions/Elastic_scale_weblogic", "Functions/check_load_balancer_health", "Disaster Recovery"],
+    "pagination.py": ["Functions/Elastic_scale_weblogic", "Functions/check_load_balancer_health", "Disaster Recovery"],
+}
+
+
+def copy_targets():
+    for module, directories in COPIES.items():
+        for directory in directories:
+            yield os.path.join(COMMON_DIR, module), os.path.join(REPO_ROOT, directory, module)
+
+
+def stale_copies():
+    stale = []
+    for source, target in copy_targets():
+        with open(source, "rb") as source_file:
+            expected = source_file.read()
+        if not os.path.exists(target):
+            stale.append(target)
+            continue
+        with open(target, "rb") as target_file:
+            if target_file.read() != expected:
+                stale.append(target)
+    return stale
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync the shared modules into the function directories")
+    parser.add_argument("--check", action="store_true", help="Only report copies that differ from Functions/common")
+    args = parser.parse_args()
+    stale = stale_copies()
+    if args.check:
+        for target in stale:
+            print(f"Out of date: {os.path.relpath(target, REPO_ROOT)}")
+        sys.exit(1 if stale else 0)
+    for source, target in copy_targets():
+        if target in stale:
+            shutil.copyfile(source, target)
+            print(f"Updated {os.path.relpath(target, REPO_ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import importlib.util
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_module(relative_path, name=None):
+    # Loads a script or function module by path, with its own directory importable for sibling modules
+    path = os.path.join(REPO_ROOT, relative_path)
+    directory = os.path.dirname(path)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    name = name or os.path.splitext(relative_path.replace(os.sep, "_").replace(" ", "_").replace("-", "_"))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("fdk")
+
+from loader import load_module
+
+func = load_module("Functions/check_load_balancer_health/func.py")
+
+START = datetime(2025, 6, 1, 10, 0, 0)
+
+
+def lb_health(backend_status, lb_status=None):
+    return {
+        "lb_id": "ocid1.loadbalancer.oc1..test",
+        "name": "test-lb",
+        "status": lb_status or ("OK" if backend_status == "OK" else "CRITICAL"),
+        "backend_sets": [{"name": "bs", "backends": [{"name": "10.0.0.1:7001", "vm_name": "wls-1", "status": backend_status}]}]
+    }
+
+
+def check(previous, health, minutes, renotify_minutes=60):
+    return func.update_health_history(previous, health, START + timedelta(minutes=minutes), renotify_minutes=renotify_minutes)
+
+
+def test_transitions_are_reported_once():
+    history, transitions = check(None, lb_health("OK"), 0)
+    assert [(t["from"], t["to"]) for t in transitions] == [(None, "OK")]
+    history, transitions = check(history, lb_health("CRITICAL"), 5)
+    assert [(t["backend"], t["from"], t["to"]) for t in transitions] == [("Load Balancer", "OK", "CRITICAL"), ("10.0.0.1:7001", "OK", "CRITICAL")]
+    history, transitions = check(history, lb_health("CRITICAL"), 10)
+    assert transitions == []
+
+
+def test_stuck_state_is_reported_again_after_the_renotify_interval():
+    history, _ = check(None, lb_health("OK"), 0)
+    history, _ = check(history, lb_health("CRITICAL"), 5)
+    history, transitions = check(history, lb_health("CRITICAL"), 64)
+    assert transitions == []
+    history, transitions = check(history, lb_health("CRITICAL"), 65)
+    assert [(t["backend"], t["from"], t["to"]) for t in transitions] == [("Load Balancer", "CRITICAL", "CRITICAL"), ("10.0.0.1:7001", "CRITICAL", "CRITICAL")]
+    assert history["NotifiedAt"] == "2025-06-01T11:05:00"
+    history, transitions = check(history, lb_health("CRITICAL"), 70)
+    assert transitions == []
+    history, transitions = check(history, lb_health("CRITICAL"), 125)
+    report = func.render_delta_report("test", lb_health("CRITICAL"), transitions, history, "2025-06-01T11:10:00")
+    assert "Reminder: 2 still not OK" in report
+    assert "10.0.0.1:7001 (wls-1): still CRITICAL since 2025-06-01T10:05:00" in report
+
+
+def test_healthy_state_and_disabled_interval_stay_quiet():
+    history, _ = check(None, lb_health("OK"), 0)
+    assert check(history, lb_health("OK"), 600)[1] == []
+    history, _ = check(history, lb_health("CRITICAL"), 5)
+    assert check(history, lb_health("CRITICAL"), 600, renotify_minutes=0)[1] == []
@@ -0,0 +1,43 @@
+import math
+
+import pytest
+
+pytest.importorskip("fdk")
+pytest.importorskip("oci")
+
+from loader import load_module
+
+func = load_module("Functions/check_load_balancer_health/func.py")
+metrics_batching = load_module("Functions/benchmarks/metrics_batching.py")
+fake_clients = load_module("Functions/benchmarks/fake_clients.py")
+
+
+def test_metrics_per_backend_and_load_balancer():
+    lb_health = metrics_batching.synthetic_lb_health(10, probed=True)
+    metric_data = func.build_health_metrics("test", [lb_health], "custom_lb_health")
+    names = [metric.name for metric in metric_data]
+    # Four load balancer metrics, then BackendHealthy and three latency percentiles per backend
+    assert len(metric_data) == 4 + 10 * 4
+    assert names.count("BackendHealthy") == 10
+    assert names.count("SlowBackendCount") == 1
+    unhealthy = next(metric for metric in metric_data if metric.name == "UnhealthyBackendCount")
+    assert unhealthy.datapoints[0].value == 1.0
+    assert all(metric.compartment_id == lb_health["compartment_id"] for metric in metric_data)
+
+
+def test_unprobed_backends_only_report_health():
+    metric_data = func.build_health_metrics("test", [metrics_batching.synthetic_lb_health(10)], "custom_lb_health", "ocid1.compartment.oc1..metrics")
+    assert len(metric_data) == 3 + 10
+    assert {metric.compartment_id for metric in metric_data} == {"ocid1.compartment.oc1..metrics"}
+
+
+@pytest.mark.parametrize("backends", [1, 47, 1000])
+def test_publish_uses_the_fewest_requests_within_the_limit(backends):
+    metric_data = func.build_health_metrics("test", [metrics_batching.synthetic_lb_health(backends)], "custom_lb_health")
+    monitoring_client = fake_clients.FakeMonitoringClient()
+    published = func.publish_health_metrics(monitoring_client, metric_data)
+    assert published["metrics"] == len(metric_data)
+    assert published["requests"] == math.ceil(len(metric_data) / func.METRICS_BATCH_SIZE)
+    assert max(monitoring_client.batch_sizes) <= fake_clients.FakeMonitoringClient.MAX_METRIC_STREAMS
+    assert sum(monitoring_client.batch_sizes) == len(metric_data)
+    assert published["failed"] == 0
@@ -0,0 +1,105 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from loader import load_module
+
+inventory_snapshot = load_module("Functions/common/inventory_snapshot.py")
+fake_clients = load_module("Functions/benchmarks/fake_clients.py")
+
+
+class FakeObjectStorageClient:
+    """
+    Keeps objects in memory with an etag per object, and honours the if_match/if_none_match preconditions.
+    """
+    def __init__(self):
+        self.objects = {}
+        self.puts = 0
+
+    def get_namespace(self):
+        return SimpleNamespace(data="namespace")
+
+    def get_object(self, namespace, bucket, name):
+        if name not in self.objects:
+            raise fake_clients.FakeServiceError(404)
+        content, etag = self.objects[name]
+        return SimpleNamespace(data=SimpleNamespace(content=content), headers={"etag": etag})
+
+    def put_object(self, namespace, bucket, name, body, content_type=None, if_match=None, if_none_match=None):
+        current = self.objects.get(name)
+        if (if_none_match == "*" and current) or (if_match and (not current or current[1] != if_match)):
+            raise fake_clients.FakeServiceError(412)
+        self.puts += 1
+        self.objects[name] = (body, f"etag-{self.puts}")
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(inventory_snapshot, "cache", {})
+    monkeypatch.setenv("INVENTORY_BUCKET", "inventory")
+
+
+def clients(instances):
+    tenancy = fake_clients.SyntheticTenancy(0, instances)
+    counter = fake_clients.CallCounter()
+    return tenancy, counter, fake_clients.FakeComputeClient(tenancy, counter), fake_clients.FakeVirtualNetworkClient(tenancy, counter)
+
+
+def test_refresh_without_ips_only_lists_instances():
+    tenancy, counter, compute_client, network_client = clients(250)
+    snapshot = inventory_snapshot.refresh_instances(compute_client, network_client, tenancy.compartment_id, resolve_ips=False)
+    assert len(snapshot["instances"]) == 250
+    assert counter.counts == {"list_instances": 3}
+
+
+def test_refresh_only_looks_up_vnics_missing_from_the_previous_snapshot():
+    tenancy, counter, compute_client, network_client = clients(20)
+    previous = inventory_snapshot.refresh_instances(compute_client, network_client, tenancy.compartment_id)
+    assert counter.counts["get_vnic"] == 20
+    refreshed = inventory_snapshot.refresh_instances(compute_client, network_client, tenancy.compartment_id, previous)
+    assert counter.counts["get_vnic"] == 20
+    assert refreshed["revision"] == previous["revision"] + 1
+    record = refreshed["instances"]["ocid1.instance.oc1..3"]
+    assert inventory_snapshot.get_primary_ip(record) == fake_clients.private_ip(3)
+
+
+def test_get_section_is_served_from_the_store_until_it_expires():
+    store = inventory_snapshot.SnapshotStore(FakeObjectStorageClient())
+    refreshes = []
+
+    def refresh(previous):
+        refreshes.append(previous)
+        return inventory_snapshot.new_snapshot("ocid1.compartment", previous, instances={})
+
+    first = inventory_snapshot.get_section("ocid1.compartment", "instances", refresh, store, ttl=300)
+    inventory_snapshot.cache.clear()
+    assert inventory_snapshot.get_section("ocid1.compartment", "instances", refresh, store, ttl=300) == first
+    assert refreshes == [None]
+
+    inventory_snapshot.cache.clear()
+    second = inventory_snapshot.get_section("ocid1.compartment", "instances", refresh, store, ttl=0)
+    assert second["revision"] == 2
+    stored, _ = store.load("ocid1.compartment", "instances")
+    assert stored["revision"] == 2
+
+
+def test_read_only_consumers_do_not_store_their_refresh():
+    client = FakeObjectStorageClient()
+    store = inventory_snapshot.SnapshotStore(client)
+    inventory_snapshot.get_section("ocid1.compartment", "instances",
+                                   lambda previous: inventory_snapshot.new_snapshot("ocid1.compartment", previous, instances={}),
+                                   store, save=False)
+    assert client.objects == {}
+
+
+def test_stale_etag_keeps_the_concurrent_snapshot():
+    client = FakeObjectStorageClient()
+    store = inventory_snapshot.SnapshotStore(client)
+    store.save("ocid1.compartment", "instances", inventory_snapshot.new_snapshot("ocid1.compartment", instances={"a": {}}))
+    _, etag = store.load("ocid1.compartment", "instances")
+    store.save("ocid1.compartment", "instances", inventory_snapshot.new_snapshot("ocid1.compartment", {"revision": 1}, instances={"b": {}}), etag)
+    store.save("ocid1.compartment", "instances", inventory_snapshot.new_snapshot("ocid1.compartment", {"revision": 1}, instances={"c": {}}), etag)
+    stored, _ = store.load("ocid1.compartment", "instances")
+    assert list(stored["instances"]) == ["b"]
+    assert json.loads(client.objects["inventory/ocid1.compartment/instances.json"][0])["revision"] == 2
@@ -0,0 +1,27 @@
+import pytest
+
+pytest.importorskip("fdk")
+
+from loader import load_module
+
+func = load_module("Functions/check_load_balancer_health/func.py")
+
+
+def test_percentile_uses_the_nearest_rank():
+    samples = list(range(1, 11))
+    assert func.percentile(samples, 50) == 5
+    assert func.percentile(samples, 95) == 10
+    assert func.percentile(samples, 10) == 1
+    assert func.percentile(samples, 0) == 1
+    assert func.percentile(samples, 100) == 10
+
+
+def test_percentile_of_unsorted_and_single_samples():
+    assert func.percentile([30.0, 10.0, 20.0], 50) == 20.0
+    assert func.percentile([7], 99) == 7
+    assert func.percentile([], 50) is None
+
+
+def test_latency_summary_reports_nearest_rank_percentiles():
+    summary = func.latency_summary([float(value) for value in range(1, 101)])
+    assert (summary["p50"], summary["p95"], summary["p99"]) == (50.0, 95.0, 99.0)
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("oci")
+
+from loader import load_module
+
+notification_digest = load_module("Functions/common/notification_digest.py")
+
+
+class FakeNosqlClient:
+    """
+    Keeps rows in memory and honours the IF_ABSENT option the way the NoSQL service does.
+    """
+    def __init__(self):
+        self.rows = {}
+
+    def update_row(self, table_name_or_id, update_row_details):
+        value = update_row_details.value
+        key = (value["Environment"], value["Id"])
+        if update_row_details.option == "IF_ABSENT" and key in self.rows:
+            return SimpleNamespace(data=SimpleNamespace(version=None))
+        self.rows[key] = dict(value)
+        return SimpleNamespace(data=SimpleNamespace(version=b"1"))
+
+    def query(self, query_details, page=None):
+        statement = query_details.statement
+        before = statement.split("Timestamp < '")[1].split("'")[0]
+        environment = statement.split("Environment = '")[1].split("'")[0] if "Environment = '" in statement else None
+        items = [row for (row_environment, _), row in self.rows.items()
+                 if row["Kind"] == "REPORT" and row["Timestamp"] < before and environment in (None, row_environment)]
+        return SimpleNamespace(data=SimpleNamespace(items=items), next_page=None)
+
+    def delete_row(self, table_name_or_id, key, compartment_id):
+        self.rows.pop((key[0].split(":", 1)[1], key[1].split(":", 1)[1]), None)
+
+
+def test_window_start_is_aligned_to_the_epoch():
+    window = timedelta(minutes=10)
+    assert notification_digest.window_start(datetime(2025, 6, 1, 10, 17, 42), window) == datetime(2025, 6, 1, 10, 10)
+
+
+def test_first_report_is_sent_and_the_rest_are_flushed_once(monkeypatch):
+    client = FakeNosqlClient()
+    sent = []
+    send = lambda body, subject: sent.append(subject)
+    for i in range(3):
+        notification_digest.notify(client, "notifications", "ocid1.compartment", "prod", f"body {i}", f"report {i}", send)
+    assert sent == ["report 0"]
+
+    later = datetime.utcnow() + timedelta(minutes=30)
+    assert notification_digest.flush_closed_windows(client, "notifications", "ocid1.compartment", send, now=later) == 1
+    # A concurrent or repeated flush of the same window loses the claim and sends nothing
+    assert notification_digest.flush_closed_windows(client, "notifications", "ocid1.compartment", send, now=later) == 0
+    assert sent == ["report 0", "Auto Scale Digest - prod - 2 reports"]
+    assert not [row for row in client.rows.values() if row["Kind"] == "REPORT"]
@@ -0,0 +1,81 @@
+from loader import load_module
+
+partition_backup = load_module("Automation/partition_backup.py")
+
+# The script's sibling module, importable now that the loader added Automation to the path
+import db_access
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_limiter_without_a_cap_never_waits(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(partition_backup, "time", clock)
+    limiter = partition_backup.ThroughputLimiter(0)
+
+    limiter.consume(100 * 1024 * 1024)
+
+    assert clock.sleeps == []
+
+
+def test_limiter_spaces_writes_to_the_cap(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(partition_backup, "time", clock)
+    limiter = partition_backup.ThroughputLimiter(2)
+
+    # The first write goes out at once, each following one waits for the previous one's share of the cap
+    limiter.consume(1024 * 1024)
+    limiter.consume(1024 * 1024)
+    limiter.consume(2 * 1024 * 1024)
+
+    assert clock.sleeps == [0.5, 0.5]
+    assert limiter._next_free == 102.0
+
+
+def test_limiter_does_not_bank_idle_time(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(partition_backup, "time", clock)
+    limiter = partition_backup.ThroughputLimiter(1)
+
+    limiter.consume(1024 * 1024)
+    clock.now += 10
+    limiter.consume(1024 * 1024)
+    limiter.consume(1024 * 1024)
+
+    assert clock.sleeps == [1.0]
+
+
+def test_exchange_creates_and_moves_the_staging_table_into_the_backup_tablespace():
+    driver = db_access.MemoryDriver()
+    # The exchanged segment stays where the partition was until the staging table is moved
+    driver.respond(r"FROM dba_segments", [(1,)])
+    db = db_access.Database(driver, "user", "password", "memory")
+
+    staging_table = partition_backup.exchange_partition(db, "CISADM", "bills", "P2020JAN", "BACKUP_TS")
+
+    assert staging_table == "BKP_BILLS_P2020JAN"
+    assert [sql for sql, _ in driver.statements if not sql.startswith("SELECT")] == [
+        "CREATE TABLE CISADM.BKP_BILLS_P2020JAN TABLESPACE BACKUP_TS FOR EXCHANGE WITH TABLE CISADM.BILLS",
+        "ALTER TABLE CISADM.BILLS EXCHANGE PARTITION P2020JAN WITH TABLE CISADM.BKP_BILLS_P2020JAN WITHOUT VALIDATION UPDATE GLOBAL INDEXES",
+        "ALTER TABLE CISADM.BKP_BILLS_P2020JAN MOVE TABLESPACE BACKUP_TS"]
+
+
+def test_exchange_is_not_repeated_for_an_emptied_partition():
+    driver = db_access.MemoryDriver()
+    driver.respond(r"FROM dba_tables", [(1,)])
+    db = db_access.Database(driver, "user", "password", "memory")
+
+    partition_backup.exchange_partition(db, "CISADM", "bills", "P2020JAN", "BACKUP_TS")
+
+    assert not driver.executed(r"^(CREATE|ALTER)")
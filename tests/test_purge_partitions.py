@@ -0,0 +1,78 @@
+import pytest
+
+pytest.importorskip("pandas")
+
+from loader import load_module
+
+purge = load_module("Automation/Identify_purge_DB_table.py")
+
+# The script's sibling modules, importable now that the loader added Automation to the path
+import db_access
+import purge_plan
+
+TABLESPACES = {"P2020JAN": "TS_2020", "P2020FEB": "TS_2020", "P2020MAR": "USERS"}
+
+
+@pytest.fixture
+def driver(tmp_path, monkeypatch):
+    # The purge writes its logs below the working directory
+    monkeypatch.chdir(tmp_path)
+    driver = db_access.MemoryDriver()
+    driver.respond(r"FROM DBA_TAB_PARTITIONS", TABLESPACES.items())
+    return driver
+
+
+def database(driver):
+    return db_access.Database(driver, "user", "password", "memory")
+
+
+def test_table_drop_mode_drops_all_partitions_in_one_statement(driver):
+    purge.purge_partitions(database(driver), {"BILLS": ["P2020JAN", "P2020FEB"]}, drop_mode="table")
+
+    drops = driver.executed(r"DROP PARTITION")
+    assert [sql for sql, _ in drops] == ["ALTER TABLE CISADM.BILLS DROP PARTITION P2020JAN, P2020FEB UPDATE GLOBAL INDEXES"]
+    # The emptied tablespace is dropped once, not once per partition
+    assert len(driver.executed(r"^DROP TABLESPACE TS_2020 ")) == 1
+
+
+def test_blocked_tablespaces_and_journaled_drops_are_skipped(driver, tmp_path):
+    journal = purge_plan.PurgeJournal(str(tmp_path / "journal.sqlite"))
+    journal.record_partition_drops("BILLS", ["P2020JAN"])
+
+    purge.purge_partitions(database(driver), {"BILLS": ["P2020JAN", "P2020FEB", "P2020MAR"]}, journal=journal)
+
+    assert [sql for sql, _ in driver.executed(r"DROP PARTITION")] == [
+        "ALTER TABLE CISADM.BILLS DROP PARTITION P2020FEB UPDATE GLOBAL INDEXES"]
+    assert journal.dropped_partitions("bills") == {"P2020JAN", "P2020FEB"}
+    assert journal.tablespace_dropped("TS_2020")
+    journal.close()
+
+
+def test_tablespace_with_segments_is_kept(driver, tmp_path):
+    driver.respond(r"FROM dba_segments WHERE tablespace_name", [("BILLS",)])
+
+    purge.purge_partitions(database(driver), {"BILLS": ["P2020JAN"]})
+
+    assert driver.executed(r"DROP PARTITION P2020JAN")
+    assert not driver.executed(r"^DROP TABLESPACE")
+    skipped = next(tmp_path.glob("purge_partition/*/skipped_tablespaces.log")).read_text()
+    assert "TS_2020 for table BILLS was not dropped" in skipped
+
+
+def test_pending_index_maintenance_batches_the_in_list(driver):
+    table_names = [f"T{i}" for i in range(purge.CATALOG_BATCH_SIZE + 1)]
+    driver.respond(r"FROM dba_indexes", lambda binds: [(binds["t0"], "IDX_" + binds["t0"], "UNUSABLE")])
+
+    pending = purge.pending_index_maintenance(database(driver), table_names)
+
+    queries = driver.executed(r"FROM dba_indexes")
+    assert [len(binds) - 1 for _, binds in queries] == [purge.CATALOG_BATCH_SIZE, 1]
+    assert pending == [("T0", "IDX_T0", "UNUSABLE"), (f"T{purge.CATALOG_BATCH_SIZE}", f"IDX_T{purge.CATALOG_BATCH_SIZE}", "UNUSABLE")]
+
+
+def test_validation_checks_the_staging_table_of_an_exchanged_partition(driver):
+    driver.respond(r"FROM dba_tables", [(1,)])
+    driver.respond(r"FROM CISADM\.BKP_BILLS_P2020JAN WHERE ILM_ARCH_SW", [(1,)])
+
+    assert purge.has_unarchived_rows(database(driver), "BILLS", "P2020JAN")
+    assert driver.executed(r"FROM CISADM\.BILLS PARTITION \(P2020JAN\) WHERE ILM_ARCH_SW")
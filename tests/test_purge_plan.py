@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from loader import load_module
+
+purge_plan = load_module("Automation/purge_plan.py")
+
+TABLES = {
+    "BILLS": {"retention_date": "2024-01-31", "partitions": [
+        {"partition_name": "P2020JAN", "tablespace_name": "TS_2020", "bytes": 1024, "high_value": "TO_DATE('2020-02-01')"},
+        {"partition_name": "P2020FEB", "tablespace_name": "TS_2020", "bytes": 2048, "high_value": "TO_DATE('2020-03-01')"}]},
+    "USAGE": {"retention_date": "2024-01-31", "partitions": []}
+}
+
+
+def test_plan_round_trip_keeps_partition_order(tmp_path):
+    plan_file = purge_plan.write_plan(str(tmp_path / "plan.json"), "CDB1", "CISADM", TABLES)
+
+    assert purge_plan.read_plan(plan_file, "CDB1") == {"BILLS": ["P2020JAN", "P2020FEB"], "USAGE": []}
+    # Without an instance name the plan is not checked against one
+    assert purge_plan.read_plan(plan_file) == {"BILLS": ["P2020JAN", "P2020FEB"], "USAGE": []}
+
+
+def test_plan_from_another_instance_is_rejected(tmp_path):
+    plan_file = purge_plan.write_plan(str(tmp_path / "plan.json"), "CDB1", "CISADM", TABLES)
+
+    with pytest.raises(ValueError, match="instance CDB1"):
+        purge_plan.read_plan(plan_file, "CDB2")
+
+
+def test_plan_with_another_version_is_rejected(tmp_path):
+    plan_file = purge_plan.write_plan(str(tmp_path / "plan.json"), "CDB1", "CISADM", TABLES)
+    with open(plan_file) as file:
+        plan = json.load(file)
+    plan["version"] = purge_plan.PLAN_VERSION + 1
+    with open(plan_file, "w") as file:
+        json.dump(plan, file)
+
+    with pytest.raises(ValueError, match="version"):
+        purge_plan.read_plan(plan_file, "CDB1")
+
+
+def test_journal_survives_a_restart(tmp_path):
+    filename = str(tmp_path / "journal.sqlite")
+    journal = purge_plan.PurgeJournal(filename)
+    journal.record_partition_drops("bills", ["P2020JAN", "P2020FEB"])
+    journal.record_backup("bills", "P2020MAR", "export", "oci://bucket/P2020MAR.csv.gz", "abc")
+    journal.record_tablespace_drop("TS_2020", "bills")
+    journal.close()
+
+    journal = purge_plan.PurgeJournal(filename)
+    assert journal.dropped_partitions("BILLS") == {"P2020JAN", "P2020FEB"}
+    assert journal.backed_up_partitions("Bills") == {"P2020MAR"}
+    assert journal.dropped_partitions("USAGE") == set()
+    assert journal.tablespace_dropped("TS_2020")
+    assert not journal.tablespace_dropped("TS_2021")
+    journal.close()
+
+
+def test_journal_records_are_idempotent(tmp_path):
+    journal = purge_plan.PurgeJournal(str(tmp_path / "journal.sqlite"))
+    journal.record_partition_drops("BILLS", ["P2020JAN"])
+    journal.record_partition_drops("BILLS", ["P2020JAN"])
+    journal.record_backup("BILLS", "P2020JAN", "export")
+    journal.record_backup("BILLS", "P2020JAN", "exchange")
+
+    assert journal.dropped_partitions("BILLS") == {"P2020JAN"}
+    assert journal.backed_up_partitions("BILLS") == {"P2020JAN"}
+    journal.close()
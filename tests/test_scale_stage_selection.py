@@ -0,0 +1,68 @@
+import pytest
+
+pytest.importorskip("fdk")
+
+from loader import load_module
+
+func = load_module("Functions/Elastic_scale_weblogic/func.py")
+
+
+@pytest.fixture
+def signals(monkeypatch):
+    # Stage selection with the alarm thresholds 60,75,90 and no LB or WebLogic signal
+    monkeypatch.setenv("AUTO_SCALE_LB_OCID", "ocid1.loadbalancer.oc1..test")
+    monkeypatch.setenv("STAGE_ALARM_THRESHOLDS", "60,75,90")
+    monkeypatch.setattr(func, "get_lb_metric_peak", lambda *args, **kwargs: None)
+    monkeypatch.setattr(func, "get_weblogic_pending_requests", lambda *args, **kwargs: None)
+
+
+def alarm(value):
+    return {"alarmMetaData": [{"metricValues": [{"cpu": value}]}]}
+
+
+def select(payload, action, requested_stage, max_stages=3):
+    target_stage, _ = func.select_target_stage(payload, action, requested_stage, max_stages, "test", "ocid1.compartment.oc1..test", None, None, None)
+    return target_stage
+
+
+def test_stage_for_value_counts_reached_thresholds():
+    thresholds = [60.0, 75.0, 90.0]
+    assert func.stage_for_value(None, thresholds) == 0
+    assert func.stage_for_value(59.9, thresholds) == 0
+    assert func.stage_for_value(60, thresholds) == 1
+    assert func.stage_for_value(89, thresholds) == 2
+    assert func.stage_for_value(95, thresholds) == 3
+    assert func.stage_for_value(95, []) == 0
+
+
+def test_parse_stage_thresholds_sorts_and_skips_invalid(monkeypatch):
+    monkeypatch.setenv("STAGE_TEST_THRESHOLDS", "90, 60,abc,,75")
+    assert func.parse_stage_thresholds("STAGE_TEST_THRESHOLDS") == [60.0, 75.0, 90.0]
+
+
+def test_start_jumps_to_the_stage_the_signals_need(signals):
+    assert select(alarm(80), "START", 1) == 2
+    assert select(alarm(99), "START", 1) == 3
+    assert select(alarm(10), "START", 2) == 2
+    assert select(alarm(99), "START", 1, max_stages=2) == 2
+
+
+def test_stop_keeps_the_base_stage_when_signals_are_low(signals):
+    assert select(alarm(10), "STOP", 2) == 1
+    assert select(alarm(10), "STOP", 4) == 1
+    assert func.plan_stages("STOP", select(alarm(10), "STOP", 4), 3) == ["3", "2"]
+
+
+def test_stop_of_stage_one_is_honoured_when_requested(signals):
+    assert select(alarm(10), "STOP", 1) == 0
+    assert func.plan_stages("STOP", 0, 3) == ["3", "2", "1"]
+
+
+def test_stop_never_keeps_the_requested_stage(signals):
+    assert select(alarm(99), "STOP", 3) == 2
+    assert select(alarm(80), "STOP", 4) == 2
+
+
+def test_plan_stages_orders_start_up_and_stop_down():
+    assert func.plan_stages("START", 3, 3) == ["1", "2", "3"]
+    assert func.plan_stages("STOP", 1, 3) == ["3", "2"]
@@ -0,0 +1,8 @@
+from loader import load_module
+
+sync_copies = load_module("Functions/common/sync_copies.py")
+
+
+def test_function_directories_carry_current_copies():
+    # Run `python Functions/common/sync_copies.py` after editing a module in Functions/common
+    assert sync_copies.stale_copies() == []
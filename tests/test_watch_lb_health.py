@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fdk")
+
+from loader import load_module
+
+func = load_module("Functions/check_load_balancer_health/func.py")
+
+
+class FakeLoadBalancerClient:
+    """
+    One backend set whose backends turn OK after the given number of polls.
+    """
+    def __init__(self, backends, healthy_after_polls):
+        self.backends = backends
+        self.healthy_after_polls = healthy_after_polls
+        self.polls = 0
+
+    def get_load_balancer(self, lb_id):
+        backend_set = SimpleNamespace(backends=[SimpleNamespace(name=name) for name in self.backends])
+        return SimpleNamespace(data=SimpleNamespace(backend_sets={"bs": backend_set}))
+
+    def get_backend_set_health(self, lb_id, backend_set_name):
+        self.polls += 1
+        critical = [] if self.polls > self.healthy_after_polls else list(self.backends)
+        return SimpleNamespace(data=SimpleNamespace(
+            status="CRITICAL" if critical else "OK",
+            unknown_state_backend_names=[], warning_state_backend_names=[], critical_state_backend_names=critical))
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(func.time, "sleep", lambda seconds: None)
+
+
+def test_watch_stops_once_backends_are_healthy():
+    lb_client = FakeLoadBalancerClient(["10.0.0.1:7001"], healthy_after_polls=2)
+    watch = func.watch_lb_health(lb_client, "lb", ["10.0.0.1:7001", "10.0.0.9:7001"], deadline_seconds=240)
+    assert watch["healthy"]
+    assert watch["polls"] == 3
+    assert watch["missing_backends"] == ["10.0.0.9:7001"]
+
+
+def test_unparsable_scaled_at_is_ignored():
+    lb_client = FakeLoadBalancerClient(["10.0.0.1:7001"], healthy_after_polls=0)
+    watch = func.watch_lb_health(lb_client, "lb", None, deadline_seconds=240, scaled_at="yesterday")
+    assert watch["healthy"]
+    assert watch["time_to_healthy_seconds"]["10.0.0.1:7001"] < 1